@@ -4,23 +4,31 @@ localFolder="./"
 todeploy="dossierAdeployer"
 remoteFolder="bgd701eskinazi"
 nameOfTheScript="script_worker.py"
+# options supplémentaires passées à chaque worker, ex. : bash deploy_script.sh --persistant --processus 8
+workerOptions="$*"
 
-# liste des machines
+# liste des workers : une adresse "hote" ou "hote:port" par ligne
 computers=($(cat machines.txt))
+firstHost=${computers[0]%%:*}
 
 # Création du répertoire distant remoteFolder
-command1=("ssh" "-tt" "$login@${computers[0]}" "rm -rf $remoteFolder; mkdir $remoteFolder;wait;")
+command1=("ssh" "-tt" "$login@$firstHost" "rm -rf $remoteFolder; mkdir $remoteFolder;wait;")
 echo ${command1[*]}
 "${command1[@]}";wait;
 
 # Copie des fichiers du dossier todeploy dans le répertoire distant
-command2=("scp" "-r" "$localFolder$todeploy" "$login@${computers[0]}:$remoteFolder")
+command2=("scp" "-r" "$localFolder$todeploy" "$login@$firstHost:$remoteFolder")
 echo ${command2[*]}
 "${command2[@]}";wait;
 
-# Lance script python nameOfTheScript sur chaque machine distante
+# Lance script python nameOfTheScript pour chaque worker (plusieurs workers par machine si les ports diffèrent)
 for c in ${computers[@]}; do
-  command3=("ssh" "-tt" "$login@$c" "cd $remoteFolder/$todeploy; python3 $nameOfTheScript; wait;")
+  host=${c%%:*}
+  options="--nom $host $workerOptions"
+  if [[ $c == *:* ]]; then
+    options="$options --port ${c##*:}"
+  fi
+  command3=("ssh" "-tt" "$login@$host" "cd $remoteFolder/$todeploy; python3 $nameOfTheScript $options; wait;")
   echo ${command3[*]}
   "${command3[@]}" &
 done
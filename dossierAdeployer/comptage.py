@@ -0,0 +1,278 @@
+import mmap
+import multiprocessing
+import queue
+import socket
+from collections import Counter
+from multiprocessing import resource_tracker, shared_memory
+
+from journalisation import journal
+from tokenisation import BLANCS, nettoyer_message
+
+# Module partagé entre les workers et script_master_sequentiel.py.
+# Comptage des mots d'un split (phase MAP/COMBINE), soit dans le processus du
+# worker, soit réparti sur un groupe de processus locaux pour utiliser tous
+# les cœurs de la machine (voir ComptageParallele).
+
+# Taille des blocs lus dans une plage du fichier d'entrée (SPLIT FICHIER)
+TAILLE_BLOC_LECTURE = 4 * 1024 * 1024  # en octets
+
+
+###################################################
+# DECOUPAGE ET COMPTAGE
+###################################################
+
+def aligner_sur_blanc(donnees, position, fin):
+    """
+    Args:
+        donnees (bytes ou mmap): Le texte encodé en UTF-8.
+        position (int): Position de départ de la recherche.
+        fin (int): Position de fin du texte à considérer.
+
+    Returns:
+        int: La position qui suit le premier blanc trouvé à partir de position
+             (ou fin s'il n'y en a pas) : un mot n'y est jamais coupé.
+    """
+    suivants = [i for i in (donnees.find(blanc, position, fin) for blanc in BLANCS) if i >= 0]
+    return min(suivants) + 1 if suivants else fin
+
+
+def decouper_en_parts(donnees, debut, fin, nb_parts):
+    """
+    Découpe un texte en parts de tailles à peu près égales, chaque frontière
+    étant avancée jusqu'au blanc suivant pour ne pas couper de mot.
+
+    Args:
+        donnees (bytes ou mmap): Le texte encodé en UTF-8.
+        debut (int): Début du texte à découper.
+        fin (int): Fin du texte à découper.
+        nb_parts (int): Le nombre de parts souhaité.
+
+    Returns:
+        list: Liste de couples (debut, fin), sans part vide.
+    """
+    frontieres = [debut]
+    for i in range(1, nb_parts):
+        position = max(frontieres[-1], debut + i * (fin - debut) // nb_parts)
+        frontieres.append(aligner_sur_blanc(donnees, position, fin))
+    frontieres.append(fin)
+    return [(a, b) for a, b in zip(frontieres, frontieres[1:]) if b > a]
+
+
+def lire_plage(comptes, chemin, offset, longueur):
+    """
+    Lit une plage d'octets du fichier d'entrée par mmap, la nettoie et l'ajoute
+    aux comptes. La plage est traitée par blocs de TAILLE_BLOC_LECTURE octets
+    coupés sur des blancs, pour ne jamais garder toute la plage en mémoire.
+    Le master aligne les plages sur des blancs : aucun mot n'est coupé entre deux workers.
+
+    Args:
+        comptes (Counter): Comptes accumulés du split {mot: nombre}, mis à jour.
+        chemin (str): Le chemin du fichier d'entrée sur ce worker.
+        offset (int): Début de la plage en octets.
+        longueur (int): Longueur de la plage en octets.
+    """
+    if longueur == 0:
+        return
+    with open(chemin, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            debut = offset
+            fin_plage = offset + longueur
+            while debut < fin_plage:
+                fin = min(debut + TAILLE_BLOC_LECTURE, fin_plage)
+                if fin < fin_plage:
+                    coupure = max(mm.rfind(blanc, debut, fin) for blanc in BLANCS)
+                    if coupure >= debut:
+                        fin = coupure + 1
+                    else:
+                        # Mot plus long qu'un bloc : on le prolonge jusqu'au blanc suivant
+                        fin = aligner_sur_blanc(mm, fin, fin_plage)
+                comptes.update(nettoyer_message(mm[debut:fin].decode('utf-8')))
+                debut = fin
+
+
+def compter_plage(chemin, offset, longueur):
+    """
+    Tâche exécutée par un processus du groupe : compte les mots d'une plage
+    du fichier d'entrée (voir lire_plage).
+
+    Returns:
+        Counter: Les comptes de la plage {mot: nombre}.
+    """
+    comptes = Counter()
+    lire_plage(comptes, chemin, offset, longueur)
+    return comptes
+
+
+def compter_memoire_partagee(nom_memoire, debut, fin, brut=False):
+    """
+    Tâche exécutée par un processus du groupe : compte les mots d'une part
+    d'un texte placé en mémoire partagée, nettoyé au préalable par le master
+    (mots séparés par des blancs) ou brut (nettoyé ici).
+    Seuls le nom du segment et les bornes de la part sont transmis au processus,
+    pas le texte.
+
+    Args:
+        nom_memoire (str): Le nom du segment de mémoire partagée.
+        debut (int): Début de la part en octets.
+        fin (int): Fin de la part en octets.
+        brut (bool): Si True, le texte doit encore être nettoyé (voir nettoyer_message).
+
+    Returns:
+        Counter: Les comptes de la part {mot: nombre}.
+    """
+    memoire = shared_memory.SharedMemory(name=nom_memoire)
+    try:
+        texte = str(memoire.buf[debut:fin], 'utf-8')
+        return Counter(nettoyer_message(texte) if brut else texte.split())
+    finally:
+        memoire.close()
+
+
+###################################################
+# COMPTAGE PARALLELE
+###################################################
+
+class ComptageParallele:
+    """
+    Groupe de processus qui comptent en parallèle les morceaux du split.
+    Chaque morceau est découpé en autant de parts que de processus :
+    - un texte reçu du master est copié une fois en mémoire partagée, et chaque
+      processus n'en reçoit que le nom et les bornes de sa part ;
+    - une plage du fichier d'entrée est découpée en sous-plages que chaque
+      processus lit lui-même par mmap.
+    Les comptes partiels reviennent au worker, qui les fusionne. Les tâches sont
+    asynchrones : la fin d'une tâche écrit un octet sur socket_reveil, que la
+    boucle d'événements du worker surveille (voir recuperer).
+
+    Les processus sont créés par fork dès la construction, avant l'ouverture
+    des connexions du worker, qu'ils n'héritent donc pas. Le suivi des segments
+    de mémoire partagée est démarré avant : les processus le partagent avec le
+    worker, seul à libérer les segments.
+
+    Un worker persistant garde le même groupe d'un job à l'autre : les tâches
+    d'un job abandonné qui se terminent après le début du job suivant sont
+    ignorées (voir nouveau_job).
+
+    Une tâche qui échoue dans le groupe est recomptée dans le processus du
+    worker ; si elle échoue encore, l'erreur est levée par recuperer, pour que
+    le worker signale l'échec au lieu de confirmer un split incomplet.
+    """
+
+    def __init__(self, nb_processus):
+        self.nb_processus = nb_processus
+        resource_tracker.ensure_running()
+        self.groupe = multiprocessing.get_context("fork").Pool(nb_processus)
+        self.socket_reveil, self.socket_signal = socket.socketpair()
+        self.socket_reveil.setblocking(False)
+        self.resultats = queue.SimpleQueue()
+        self.nb_taches_en_cours = 0
+        # Numéro du job en cours : les résultats des tâches des jobs précédents sont ignorés
+        self.numero_job = 0
+        # Segments de mémoire partagée en cours d'utilisation {nom: [segment, nombre de tâches restantes]}
+        self.memoires = {}
+
+    def nouveau_job(self):
+        """
+        Marque le début d'un nouveau job : les résultats des tâches encore en
+        cours ne seront plus fusionnés dans les comptes.
+        """
+        self.numero_job += 1
+
+    def soumettre_texte(self, texte_bytes, brut=False):
+        """
+        Args:
+            texte_bytes (bytes): Un morceau du split : mots nettoyés séparés par des espaces,
+                                 ou texte brut coupé sur un blanc.
+            brut (bool): Si True, chaque processus nettoie sa part avant de la compter.
+        """
+        if not texte_bytes:
+            return
+        parts = decouper_en_parts(texte_bytes, 0, len(texte_bytes), self.nb_processus)
+        memoire = shared_memory.SharedMemory(create=True, size=len(texte_bytes))
+        memoire.buf[:len(texte_bytes)] = texte_bytes
+        self.memoires[memoire.name] = [memoire, len(parts)]
+        for debut, fin in parts:
+            self._soumettre(compter_memoire_partagee, (memoire.name, debut, fin, brut), memoire.name)
+
+    def soumettre_plage(self, chemin, offset, longueur):
+        """
+        Args:
+            chemin (str): Le chemin du fichier d'entrée sur ce worker.
+            offset (int): Début de la plage en octets.
+            longueur (int): Longueur de la plage en octets.
+        """
+        if longueur == 0:
+            return
+        with open(chemin, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                parts = decouper_en_parts(mm, offset, offset + longueur, self.nb_processus)
+        for debut, fin in parts:
+            self._soumettre(compter_plage, (chemin, debut, fin - debut))
+
+    def _soumettre(self, tache, arguments, nom_memoire=None):
+        self.nb_taches_en_cours += 1
+        numero_job = self.numero_job
+        self.groupe.apply_async(tache, arguments,
+                                callback=lambda resultat: self._terminer(resultat, tache, arguments,
+                                                                         nom_memoire, numero_job),
+                                error_callback=lambda erreur: self._terminer(erreur, tache, arguments,
+                                                                             nom_memoire, numero_job))
+
+    def _terminer(self, resultat, tache, arguments, nom_memoire, numero_job):
+        # Appelée par le thread de résultats du groupe : le résultat est remis
+        # à la boucle d'événements, seule à modifier les comptes (la tâche et
+        # ses arguments servent à la recompter si elle a échoué)
+        self.resultats.put((resultat, tache, arguments, nom_memoire, numero_job))
+        self.socket_signal.send(b'\0')
+
+    def recuperer(self, comptes):
+        """
+        Fusionne dans les comptes les résultats des tâches terminées et libère
+        les segments de mémoire partagée qui ne servent plus.
+
+        Args:
+            comptes (Counter): Comptes accumulés du split {mot: nombre}, mis à jour.
+
+        Returns:
+            bool: True si plus aucune tâche n'est en cours.
+
+        Raises:
+            Exception: L'erreur d'une tâche qui a échoué aussi dans le processus du worker.
+        """
+        try:
+            while self.socket_reveil.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        while True:
+            try:
+                resultat, tache, arguments, nom_memoire, numero_job = self.resultats.get_nowait()
+            except queue.Empty:
+                break
+            self.nb_taches_en_cours -= 1
+            try:
+                if numero_job != self.numero_job:
+                    continue
+                if isinstance(resultat, Exception):
+                    # Le segment de mémoire partagée n'est libéré qu'après : la part peut être relue
+                    journal.warning(f"Erreur lors du comptage parallèle : {resultat}. "
+                                    "Part recomptée par le worker.")
+                    resultat = tache(*arguments)
+                comptes.update(resultat)
+            finally:
+                if nom_memoire is not None:
+                    self.memoires[nom_memoire][1] -= 1
+                    if self.memoires[nom_memoire][1] == 0:
+                        memoire = self.memoires.pop(nom_memoire)[0]
+                        memoire.close()
+                        memoire.unlink()
+        return self.nb_taches_en_cours == 0
+
+    def fermer(self):
+        self.groupe.close()
+        self.groupe.join()
+        for memoire, _ in self.memoires.values():
+            memoire.close()
+            memoire.unlink()
+        self.socket_reveil.close()
+        self.socket_signal.close()
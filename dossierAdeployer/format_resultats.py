@@ -0,0 +1,315 @@
+import argparse
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+# Module partagé entre le master et les workers.
+# Formats des fichiers de résultats {mot: nombre} :
+# - JSON indenté (format historique), écrit au fil de l'eau par ecrire_json_en_flux ;
+# - table triée de chaînes (SSTable), lue par mmap sans chargement complet (TableMots) :
+#
+#   en-tête : "TMOT", version (2 octets), mots par bloc (2 octets),
+#             nombre de mots (8 octets), position de l'index (8 octets)
+#   blocs   : les mots triés par octets UTF-8, par blocs de MOTS_PAR_BLOC ; chaque
+#             entrée est (taille du préfixe commun avec le mot précédent, taille
+#             du reste, nombre d'occurrences) en entiers de taille variable
+#             (varint), suivis du reste du mot. Le premier mot d'un bloc est
+#             complet (préfixe commun vide).
+#   index   : la position de chaque bloc (8 octets chacun)
+#
+# Les entiers de taille fixe sont en petit-boutiste. L'ordre des octets UTF-8
+# étant celui des points de code, un mot ou un préfixe est cherché par
+# dichotomie sur les premiers mots des blocs, puis en parcourant un seul bloc.
+
+MAGIQUE = b"TMOT"
+VERSION = 1
+MOTS_PAR_BLOC = 16
+ENTETE = struct.Struct('<4sHHQQ')
+POSITION = struct.Struct('<Q')
+
+
+def cle_frequence(couple):
+    """
+    Clé de l'ordre des fichiers de résultats : nombre décroissant, puis ordre alphabétique.
+    """
+    return -couple[1], couple[0]
+
+
+###################################################
+# JSON
+###################################################
+
+def ecrire_json_en_flux(chemin_fichier, couples):
+    """
+    Ecrit les couples (mot, nombre) au fur et à mesure, au même format que
+    json.dump(..., ensure_ascii=False, indent=4) d'un dictionnaire.
+
+    Args:
+        chemin_fichier (str): Le fichier JSON à écrire.
+        couples (iterable): Les couples (mot, nombre), dans l'ordre du fichier.
+
+    Returns:
+        int: Le nombre de mots écrits.
+    """
+    nb_mots = 0
+    with open(chemin_fichier, "w", encoding="utf-8") as f:
+        f.write("{")
+        for mot, compte in couples:
+            f.write(f"{',' if nb_mots else ''}\n    {json.dumps(mot, ensure_ascii=False)}: {compte}")
+            nb_mots += 1
+        f.write("\n}" if nb_mots else "}")
+    return nb_mots
+
+
+###################################################
+# TABLE BINAIRE
+###################################################
+
+def _ecrire_varint(tampon, valeur):
+    while valeur >= 0x80:
+        tampon.append((valeur & 0x7F) | 0x80)
+        valeur >>= 7
+    tampon.append(valeur)
+
+
+def _lire_varint(donnees, position):
+    valeur = 0
+    decalage = 0
+    while True:
+        octet = donnees[position]
+        position += 1
+        valeur |= (octet & 0x7F) << decalage
+        if octet < 0x80:
+            return valeur, position
+        decalage += 7
+
+
+def ecrire_table(chemin_fichier, couples):
+    """
+    Ecrit une table triée (voir l'en-tête du module) à partir de couples
+    (mot, nombre) dans un ordre quelconque, chaque mot n'apparaissant qu'une fois.
+
+    Args:
+        chemin_fichier (str): Le fichier à écrire.
+        couples (iterable): Les couples (mot, nombre).
+
+    Returns:
+        int: Le nombre de mots écrits.
+    """
+    entrees = sorted((mot.encode('utf-8'), compte) for mot, compte in couples)
+    positions_blocs = array('Q')
+    with open(chemin_fichier, "wb") as f:
+        f.write(bytes(ENTETE.size))
+        position = ENTETE.size
+        precedent = b''
+        tampon = bytearray()
+        for i, (mot, compte) in enumerate(entrees):
+            if i % MOTS_PAR_BLOC == 0:
+                f.write(tampon)
+                position += len(tampon)
+                tampon.clear()
+                positions_blocs.append(position)
+                precedent = b''
+            partage = 0
+            limite = min(len(mot), len(precedent))
+            while partage < limite and mot[partage] == precedent[partage]:
+                partage += 1
+            _ecrire_varint(tampon, partage)
+            _ecrire_varint(tampon, len(mot) - partage)
+            _ecrire_varint(tampon, compte)
+            tampon += mot[partage:]
+            precedent = mot
+        f.write(tampon)
+        debut_index = position + len(tampon)
+        if sys.byteorder != "little":
+            positions_blocs.byteswap()
+        positions_blocs.tofile(f)
+        f.seek(0)
+        f.write(ENTETE.pack(MAGIQUE, VERSION, MOTS_PAR_BLOC, len(entrees), debut_index))
+    return len(entrees)
+
+
+class TableMots:
+    """
+    Lecture d'une table triée de résultats par mmap : seules les pages utiles
+    sont lues, la recherche d'un mot ou d'un préfixe se fait par dichotomie
+    sur les blocs, sans charger ni analyser tout le fichier.
+
+    S'utilise comme un dictionnaire en lecture seule :
+        with TableMots("final_aggregated_results.bin") as table:
+            table["de"], table.get("inconnu", 0), list(table.prefixe("anti"))
+    """
+
+    def __init__(self, chemin_fichier):
+        self.fichier = open(chemin_fichier, "rb")
+        self.mm = mmap.mmap(self.fichier.fileno(), 0, access=mmap.ACCESS_READ)
+        magique, version, _, self.nb_mots, self.debut_index = ENTETE.unpack_from(self.mm, 0)
+        if magique != MAGIQUE or version != VERSION:
+            self.fermer()
+            raise ValueError(f"{chemin_fichier} n'est pas une table de résultats (version {VERSION})")
+        self.nb_blocs = (len(self.mm) - self.debut_index) // POSITION.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    def fermer(self):
+        self.mm.close()
+        self.fichier.close()
+
+    def __len__(self):
+        return self.nb_mots
+
+    def _position_bloc(self, bloc):
+        return POSITION.unpack_from(self.mm, self.debut_index + POSITION.size * bloc)[0]
+
+    def _premier_mot(self, bloc):
+        position = self._position_bloc(bloc)
+        _, position = _lire_varint(self.mm, position)
+        taille, position = _lire_varint(self.mm, position)
+        _, position = _lire_varint(self.mm, position)
+        return self.mm[position:position + taille]
+
+    def _entrees(self, bloc=0):
+        """
+        Yields:
+            tuple: Les couples (mot en octets UTF-8, nombre) à partir du début du bloc.
+        """
+        if bloc >= self.nb_blocs:
+            return
+        position = self._position_bloc(bloc)
+        mot = b''
+        while position < self.debut_index:
+            partage, position = _lire_varint(self.mm, position)
+            taille, position = _lire_varint(self.mm, position)
+            compte, position = _lire_varint(self.mm, position)
+            mot = mot[:partage] + self.mm[position:position + taille]
+            position += taille
+            yield mot, compte
+
+    def _entrees_depuis(self, cle):
+        """
+        Yields:
+            tuple: Les couples (mot en octets UTF-8, nombre) à partir du premier mot
+                   supérieur ou égal à cle.
+        """
+        # Dernier bloc dont le premier mot est inférieur ou égal à cle
+        bas, haut = 0, self.nb_blocs
+        while bas < haut:
+            milieu = (bas + haut) // 2
+            if self._premier_mot(milieu) <= cle:
+                bas = milieu + 1
+            else:
+                haut = milieu
+        for mot, compte in self._entrees(max(bas - 1, 0)):
+            if mot >= cle:
+                yield mot, compte
+
+    def get(self, mot, defaut=None):
+        """
+        Args:
+            mot (str): Le mot cherché.
+            defaut: La valeur rendue si le mot est absent.
+
+        Returns:
+            int: Le nombre d'occurrences du mot, ou defaut.
+        """
+        cle = mot.encode('utf-8')
+        for mot_trouve, compte in self._entrees_depuis(cle):
+            return compte if mot_trouve == cle else defaut
+        return defaut
+
+    def __getitem__(self, mot):
+        compte = self.get(mot)
+        if compte is None:
+            raise KeyError(mot)
+        return compte
+
+    def __contains__(self, mot):
+        return self.get(mot) is not None
+
+    def prefixe(self, prefixe):
+        """
+        Args:
+            prefixe (str): Le début des mots cherchés.
+
+        Yields:
+            tuple: Les couples (mot, nombre) des mots commençant par prefixe, par ordre alphabétique.
+        """
+        cle = prefixe.encode('utf-8')
+        for mot, compte in self._entrees_depuis(cle):
+            if not mot.startswith(cle):
+                break
+            yield mot.decode('utf-8'), compte
+
+    def items(self):
+        """
+        Yields:
+            tuple: Tous les couples (mot, nombre), par ordre alphabétique.
+        """
+        for mot, compte in self._entrees():
+            yield mot.decode('utf-8'), compte
+
+    def par_frequence(self):
+        """
+        Returns:
+            list: Tous les couples (mot, nombre), par nombre décroissant puis par ordre
+                  alphabétique (l'ordre de final_aggregated_results.json).
+        """
+        return sorted(self.items(), key=cle_frequence)
+
+
+###################################################
+# CONVERSIONS
+###################################################
+
+def json_vers_table(chemin_json, chemin_table):
+    """
+    Returns:
+        int: Le nombre de mots convertis.
+    """
+    with open(chemin_json, "r", encoding="utf-8") as f:
+        resultats = json.load(f)
+    return ecrire_table(chemin_table, resultats.items())
+
+
+def table_vers_json(chemin_table, chemin_json):
+    """
+    Returns:
+        int: Le nombre de mots convertis.
+    """
+    with TableMots(chemin_table) as table:
+        return ecrire_json_en_flux(chemin_json, table.par_frequence())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversion et consultation des fichiers de résultats.")
+    commandes = parser.add_subparsers(dest="commande", required=True)
+    commande = commandes.add_parser("vers-binaire", help="Convertit un fichier JSON en table binaire.")
+    commande.add_argument("json")
+    commande.add_argument("table")
+    commande = commandes.add_parser("vers-json", help="Convertit une table binaire en fichier JSON.")
+    commande.add_argument("table")
+    commande.add_argument("json")
+    commande = commandes.add_parser("compte", help="Affiche le nombre d'occurrences de mots.")
+    commande.add_argument("table")
+    commande.add_argument("mots", nargs="+")
+    commande = commandes.add_parser("prefixe", help="Affiche les mots commençant par un préfixe.")
+    commande.add_argument("table")
+    commande.add_argument("prefixe")
+    args = parser.parse_args()
+
+    if args.commande == "vers-binaire":
+        print(f"{json_vers_table(args.json, args.table)} mots convertis dans {args.table}")
+    elif args.commande == "vers-json":
+        print(f"{table_vers_json(args.table, args.json)} mots convertis dans {args.json}")
+    else:
+        with TableMots(args.table) as table:
+            couples = ((mot, table.get(mot, 0)) for mot in args.mots) if args.commande == "compte" \
+                else table.prefixe(args.prefixe)
+            for mot, compte in couples:
+                print(f"{mot} {compte}")
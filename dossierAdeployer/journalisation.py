@@ -0,0 +1,139 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+# Module partagé entre le master et les workers.
+# Journal des scripts (module logging) : chaque message a un niveau, et le
+# niveau choisi au lancement (--niveau-journal) écarte les autres avant même
+# qu'ils soient mis en forme. Les messages retenus sont placés dans une file
+# bornée et écrits sur la console par un thread dédié : les boucles du master
+# et des workers n'attendent jamais le terminal (si la file est pleine, le
+# message est perdu et compté).
+# Les événements par enregistrement (un mot, un lot, une trame) passent par
+# TraceEchantillonnee, qui n'en journalise qu'une partie.
+
+NOM_JOURNAL = "mapreduce"
+NIVEAUX = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "avertissement": logging.WARNING,
+    "erreur": logging.ERROR
+}
+NIVEAU_DEFAUT = "info"
+
+# Messages en attente d'écriture au-delà desquels les nouveaux sont perdus
+TAILLE_FILE_JOURNAL = 10000
+
+# Traces par enregistrement : messages journalisés au plus par seconde
+MAX_TRACES_PAR_SECONDE = 20
+
+journal = logging.getLogger(NOM_JOURNAL)
+
+
+class FileJournal(logging.handlers.QueueHandler):
+    """
+    Dépose les messages dans la file du thread d'écriture sans jamais attendre :
+    un message qui ne trouve pas de place est compté dans nb_perdus.
+    """
+
+    def __init__(self, file):
+        super().__init__(file)
+        self.nb_perdus = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.nb_perdus += 1
+
+
+def configurer_journal(prefixe, niveau=NIVEAU_DEFAUT):
+    """
+    Configure le journal du processus : les messages de niveau inférieur à
+    niveau sont écartés, les autres sont préfixés et écrits sur la sortie
+    standard par un thread dédié, arrêté (après écriture des messages en
+    attente) à la fin du processus.
+    Le thread d'écriture n'existe pas dans les processus créés ensuite par
+    fork : ceux-ci ne journalisent pas (ils renvoient leurs erreurs au parent).
+
+    Args:
+        prefixe (str): Le début de chaque ligne ("[Master] ", "'hote:port' : "...).
+        niveau (str): Une clé de NIVEAUX.
+
+    Returns:
+        logging.Logger: Le journal configuré.
+    """
+    for gestionnaire in list(journal.handlers):
+        journal.removeHandler(gestionnaire)
+    journal.setLevel(NIVEAUX[niveau])
+    journal.propagate = False
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(prefixe.replace('%', '%%') + "%(message)s"))
+    file_journal = FileJournal(queue.Queue(TAILLE_FILE_JOURNAL))
+    journal.addHandler(file_journal)
+    ecrivain = logging.handlers.QueueListener(file_journal.queue, console)
+    ecrivain.start()
+
+    def arreter():
+        ecrivain.stop()
+        if file_journal.nb_perdus:
+            console.handle(logging.makeLogRecord({"msg": f"{file_journal.nb_perdus} message(s) du journal "
+                                                         "perdu(s) (file pleine)"}))
+
+    atexit.register(arreter)
+    return journal
+
+
+class TraceEchantillonnee:
+    """
+    Journalisation des événements par enregistrement (un mot traité, un lot
+    reçu...) : seul un événement sur echantillon est retenu, et au plus
+    max_par_seconde par seconde ; le nombre d'événements écartés est ajouté
+    au message retenu suivant.
+    Dans une boucle, lire active une fois avant la boucle et le tester avant
+    de construire le message : une trace désactivée ne coûte alors qu'un test.
+
+        trace = TraceEchantillonnee(echantillon=100)
+        tracer = trace.active
+        for mot in mots:
+            if tracer:
+                trace("Mot '%s' traité localement", mot)
+    """
+
+    def __init__(self, niveau=logging.DEBUG, echantillon=1, max_par_seconde=MAX_TRACES_PAR_SECONDE):
+        self.niveau = niveau
+        self.echantillon = echantillon
+        self.max_par_seconde = max_par_seconde
+        self.nb_evenements = 0
+        self.nb_ecartes = 0
+        self.debut_seconde = 0.0
+        self.nb_dans_seconde = 0
+
+    @property
+    def active(self):
+        return journal.isEnabledFor(self.niveau)
+
+    def __call__(self, message, *args):
+        if not self.active:
+            return
+        self.nb_evenements += 1
+        if self.nb_evenements % self.echantillon:
+            self.nb_ecartes += 1
+            return
+        maintenant = time.monotonic()
+        if maintenant - self.debut_seconde >= 1:
+            self.debut_seconde = maintenant
+            self.nb_dans_seconde = 0
+        if self.nb_dans_seconde >= self.max_par_seconde:
+            self.nb_ecartes += 1
+            return
+        self.nb_dans_seconde += 1
+        if self.nb_ecartes:
+            message += " (et %d événement(s) semblable(s) non journalisé(s))"
+            args += (self.nb_ecartes,)
+            self.nb_ecartes = 0
+        journal.log(self.niveau, message, *args)
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import Counter
+from itertools import islice
+
+# Module partagé entre le master et les workers.
+# Mesures d'un job : durée de chaque phase, compteurs (mots mappés, clés
+# réduites...) et trafic échangé avec chaque autre machine. Les workers
+# renvoient leurs mesures au master avec "SAVE OK", et le master les
+# enregistre avec les siennes dans resultats_amdahl.json.
+
+# Nombre d'éléments produits à la fois par chronometrer_iterable
+TAILLE_TRANCHE_MESURE = 10000
+
+
+class Chronometre:
+    """
+    Durées des phases d'un job, en secondes. Une phase peut être mesurée en
+    plusieurs fois (demarrer/arreter ou ajouter) : les durées s'additionnent.
+    ajouter peut être appelée depuis plusieurs threads (threads d'envoi du master).
+    """
+
+    def __init__(self):
+        self.durees = {}
+        self.debuts = {}
+        self.verrou = threading.Lock()
+
+    def demarrer(self, phase):
+        """
+        Démarre la mesure d'une phase, sauf si elle est déjà en cours.
+        """
+        self.debuts.setdefault(phase, time.perf_counter())
+
+    def arreter(self, phase):
+        """
+        Arrête la mesure d'une phase en cours (sans effet sinon).
+        """
+        debut = self.debuts.pop(phase, None)
+        if debut is not None:
+            self.ajouter(phase, time.perf_counter() - debut)
+
+    def ajouter(self, phase, duree):
+        with self.verrou:
+            self.durees[phase] = self.durees.get(phase, 0.0) + duree
+
+    def vers_dict(self):
+        return {phase: round(duree, 6) for phase, duree in self.durees.items()}
+
+
+class Trafic:
+    """
+    Trames et octets (en-têtes compris, après compression) envoyés et reçus
+    sur les connexions avec une autre machine.
+    """
+
+    def __init__(self):
+        self.trames_envoyees = 0
+        self.octets_envoyes = 0
+        self.trames_recues = 0
+        self.octets_recus = 0
+
+    def envoi(self, taille_trame):
+        self.trames_envoyees += 1
+        self.octets_envoyes += taille_trame
+
+    def reception(self, taille_trame):
+        self.trames_recues += 1
+        self.octets_recus += taille_trame
+
+    def vers_dict(self):
+        return dict(vars(self))
+
+
+class MesuresJob:
+    """
+    Toutes les mesures d'une machine pour un job : durées des phases
+    (chronometre), compteurs et trafic avec chaque autre machine.
+    """
+
+    def __init__(self):
+        self.chronometre = Chronometre()
+        self.compteurs = Counter()
+        # {nom de l'autre machine: Trafic}
+        self.trafic = {}
+
+    def trafic_avec(self, machine):
+        """
+        Returns:
+            Trafic: Les compteurs du trafic avec cette machine (créés au premier appel).
+        """
+        if machine not in self.trafic:
+            self.trafic[machine] = Trafic()
+        return self.trafic[machine]
+
+    def vers_dict(self):
+        return {
+            "phases": self.chronometre.vers_dict(),
+            "compteurs": dict(self.compteurs),
+            "trafic": {machine: trafic.vers_dict() for machine, trafic in self.trafic.items()}
+        }
+
+
+def chronometrer_iterable(elements, chronometre, phase, taille_tranche=TAILLE_TRANCHE_MESURE):
+    """
+    Rend les éléments d'un itérable paresseux (une fusion en flux, par exemple)
+    en comptant dans phase le seul temps passé à les produire, et non celui
+    passé par l'appelant à les consommer. Les éléments sont produits par
+    tranches, pour ne mesurer le temps qu'une fois par tranche.
+
+    Args:
+        elements (iterable): Les éléments à produire.
+        chronometre (Chronometre): Le chronomètre mis à jour.
+        phase (str): Le nom de la phase mesurée.
+        taille_tranche (int): Le nombre d'éléments produits à la fois.
+
+    Yields:
+        Les éléments, dans l'ordre.
+    """
+    elements = iter(elements)
+    while True:
+        debut = time.perf_counter()
+        tranche = list(islice(elements, taille_tranche))
+        chronometre.ajouter(phase, time.perf_counter() - debut)
+        if not tranche:
+            return
+        yield from tranche
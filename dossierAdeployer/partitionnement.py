@@ -0,0 +1,249 @@
+import bisect
+import zlib
+from collections import Counter
+
+# Module partagé entre le master et les workers.
+# Un partitionneur associe à chaque mot l'indice du worker (réducteur) chargé
+# de le compter pendant la phase SHUFFLE. Le master choisit le partitionneur
+# et l'envoie aux workers avec le message MACHINES sous forme de dictionnaire
+# JSON (voir vers_dict / creer_partitionneur).
+
+# Plan de partitionnement : un mot est "chaud" s'il représente au moins cette
+# part des mots de l'échantillon
+SEUIL_MOT_CHAUD = 0.01
+# Nombre maximal de mots affectés explicitement par le plan (les autres
+# sont répartis par hachage)
+NB_MAX_AFFECTATIONS = 10000
+
+
+###################################################
+# PARTITIONNEURS
+###################################################
+
+class PartitionneurHachage:
+    """
+    Partitionneur par hachage stable : crc32 du mot encodé en UTF-8, modulo
+    le nombre de réducteurs. Contrairement à hash(), le résultat ne dépend pas
+    de la graine aléatoire du processus Python, donc tous les workers
+    envoient un même mot au même réducteur.
+    """
+    nom = "hash"
+
+    def __init__(self, nb_reducteurs):
+        self.nb_reducteurs = nb_reducteurs
+
+    def partition(self, mot):
+        """
+        Args:
+            mot (str): Le mot à router.
+
+        Returns:
+            int: L'indice du réducteur dans la liste des machines.
+        """
+        return zlib.crc32(mot.encode('utf-8')) % self.nb_reducteurs
+
+    def mots_repartis(self):
+        """
+        Returns:
+            set: Les mots dont les comptes partiels sont répartis sur plusieurs
+                 réducteurs (aucun : chaque mot a un seul réducteur).
+        """
+        return set()
+
+    def vers_dict(self):
+        return {"type": self.nom}
+
+
+class PartitionneurIntervalles:
+    """
+    Partitionneur par intervalles : les mots sont répartis par ordre
+    lexicographique selon des bornes calculées par le master à partir d'un
+    échantillon du texte (voir calculer_bornes). Le réducteur i reçoit les
+    mots compris entre bornes[i - 1] (inclus) et bornes[i] (exclu).
+    """
+    nom = "range"
+
+    def __init__(self, nb_reducteurs, bornes):
+        if len(bornes) != nb_reducteurs - 1:
+            raise ValueError(f"{nb_reducteurs - 1} bornes attendues, {len(bornes)} reçues")
+        self.nb_reducteurs = nb_reducteurs
+        self.bornes = list(bornes)
+
+    def partition(self, mot):
+        """
+        Args:
+            mot (str): Le mot à router.
+
+        Returns:
+            int: L'indice du réducteur dans la liste des machines.
+        """
+        return bisect.bisect_right(self.bornes, mot)
+
+    def mots_repartis(self):
+        """
+        Returns:
+            set: Les mots dont les comptes partiels sont répartis sur plusieurs
+                 réducteurs (aucun : chaque mot a un seul réducteur).
+        """
+        return set()
+
+    def vers_dict(self):
+        return {"type": self.nom, "bornes": self.bornes}
+
+
+class PartitionneurPlan:
+    """
+    Partitionneur suivant un plan calculé par le master sur un échantillon
+    du texte (voir construire_plan) :
+    - les mots chauds sont répartis sur plusieurs réducteurs : chaque mappeur
+      envoie son compte partiel au réducteur chauds[mot][indice_mappeur % k],
+      et les comptes partiels sont additionnés à l'agrégation finale ;
+    - les autres mots de l'échantillon sont affectés au réducteur le moins
+      chargé selon leur poids estimé ;
+    - les mots absents du plan sont répartis par hachage stable.
+    """
+    nom = "plan"
+
+    def __init__(self, nb_reducteurs, chauds, affectations, indice_mappeur=0):
+        self.nb_reducteurs = nb_reducteurs
+        self.chauds = chauds
+        self.affectations = affectations
+        self.indice_mappeur = indice_mappeur
+        self.repli = PartitionneurHachage(nb_reducteurs)
+
+    def partition(self, mot):
+        """
+        Args:
+            mot (str): Le mot à router.
+
+        Returns:
+            int: L'indice du réducteur dans la liste des machines.
+        """
+        reducteurs = self.chauds.get(mot)
+        if reducteurs:
+            return reducteurs[self.indice_mappeur % len(reducteurs)]
+        indice = self.affectations.get(mot)
+        if indice is not None:
+            return indice
+        return self.repli.partition(mot)
+
+    def mots_repartis(self):
+        """
+        Returns:
+            set: Les mots chauds répartis sur plusieurs réducteurs, dont les
+                 comptes partiels doivent être additionnés à l'agrégation finale.
+        """
+        return {mot for mot, reducteurs in self.chauds.items() if len(set(reducteurs)) > 1}
+
+    def vers_dict(self):
+        return {"type": self.nom, "chauds": self.chauds, "affectations": self.affectations}
+
+
+PARTITIONNEURS = {
+    PartitionneurHachage.nom: PartitionneurHachage,
+    PartitionneurIntervalles.nom: PartitionneurIntervalles,
+    PartitionneurPlan.nom: PartitionneurPlan,
+}
+
+
+###################################################
+# CONSTRUCTION DES PARTITIONNEURS
+###################################################
+
+def calculer_bornes(echantillon, nb_reducteurs):
+    """
+    Calcule les bornes d'un PartitionneurIntervalles à partir des quantiles
+    d'un échantillon de mots, pour que chaque réducteur reçoive à peu près
+    le même nombre d'occurrences.
+
+    Args:
+        echantillon (list): Liste de mots représentative du texte.
+        nb_reducteurs (int): Le nombre de workers réducteurs.
+
+    Returns:
+        list: Liste triée de nb_reducteurs - 1 bornes.
+    """
+    mots_tries = sorted(echantillon)
+    if not mots_tries:
+        return [""] * (nb_reducteurs - 1)
+    return [mots_tries[(i * len(mots_tries)) // nb_reducteurs] for i in range(1, nb_reducteurs)]
+
+
+def estimer_poids(frequence, nb_mots_estime, nb_mappeurs):
+    """
+    Estime le nombre de couples (mot, nombre) qu'un réducteur recevra pour un mot :
+    grâce au COMBINE, chaque mappeur envoie au plus un couple par mot, soit un
+    couple par split contenant le mot.
+
+    Args:
+        frequence (float): Part du mot dans l'échantillon.
+        nb_mots_estime (int): Nombre total de mots estimé dans le texte.
+        nb_mappeurs (int): Le nombre de workers mappeurs.
+
+    Returns:
+        float: Le nombre estimé de couples reçus pour ce mot.
+    """
+    mots_par_split = nb_mots_estime / nb_mappeurs
+    return nb_mappeurs * (1 - (1 - frequence) ** mots_par_split)
+
+
+def construire_plan(echantillon, nb_reducteurs, nb_mots_estime):
+    """
+    Construit un PartitionneurPlan à partir d'un échantillon de mots :
+    détection des mots chauds (part >= SEUIL_MOT_CHAUD), répartition de chacun
+    sur tous les réducteurs, puis affectation gloutonne des autres mots (du plus
+    lourd au plus léger) au réducteur le moins chargé.
+
+    Args:
+        echantillon (list): Liste de mots représentative du texte.
+        nb_reducteurs (int): Le nombre de workers réducteurs (et mappeurs).
+        nb_mots_estime (int): Nombre total de mots estimé dans le texte.
+
+    Returns:
+        PartitionneurPlan: Le plan de partitionnement.
+    """
+    frequences = Counter(echantillon)
+    taille_echantillon = max(len(echantillon), 1)
+    nb_mots_estime = max(nb_mots_estime, taille_echantillon)
+    charges = [0.0] * nb_reducteurs
+    chauds = {}
+    affectations = {}
+
+    for mot, nombre in frequences.most_common(NB_MAX_AFFECTATIONS):
+        frequence = nombre / taille_echantillon
+        poids = estimer_poids(frequence, nb_mots_estime, nb_reducteurs)
+        if frequence >= SEUIL_MOT_CHAUD and nb_reducteurs > 1:
+            # Les réducteurs les moins chargés en premier
+            reducteurs = sorted(range(nb_reducteurs), key=lambda i: charges[i])
+            chauds[mot] = reducteurs
+            for i in reducteurs:
+                charges[i] += poids / nb_reducteurs
+        else:
+            indice = min(range(nb_reducteurs), key=lambda i: charges[i])
+            affectations[mot] = indice
+            charges[indice] += poids
+
+    return PartitionneurPlan(nb_reducteurs, chauds, affectations)
+
+
+def creer_partitionneur(description, nb_reducteurs, indice_mappeur=0):
+    """
+    Reconstruit un partitionneur à partir de sa description JSON
+    (telle que produite par vers_dict et envoyée dans le message MACHINES).
+
+    Args:
+        description (dict): Description du partitionneur, ex. {"type": "hash"}.
+        nb_reducteurs (int): Le nombre de workers réducteurs.
+        indice_mappeur (int): Position du worker courant dans la liste des machines
+                              (utilisée par le plan pour répartir les mots chauds).
+
+    Returns:
+        Le partitionneur correspondant.
+    """
+    type_partitionneur = description.get("type", PartitionneurHachage.nom)
+    if type_partitionneur not in PARTITIONNEURS:
+        raise ValueError(f"Partitionneur inconnu : {type_partitionneur}")
+    parametres = {cle: valeur for cle, valeur in description.items() if cle != "type"}
+    if type_partitionneur == PartitionneurPlan.nom:
+        parametres["indice_mappeur"] = indice_mappeur
+    return PARTITIONNEURS[type_partitionneur](nb_reducteurs, **parametres)
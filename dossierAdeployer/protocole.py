@@ -0,0 +1,376 @@
+import lzma
+import struct
+import zlib
+from collections import deque
+from itertools import islice
+
+# Module partagé entre le master et les workers.
+# Protocole binaire : chaque trame est un en-tête de 5 octets (code d'opération
+# sur 1 octet, taille de la charge utile sur 4 octets, ordre réseau) suivi de
+# la charge utile (texte UTF-8 ou JSON selon l'opération, éventuellement vide).
+# Les deux bits de poids fort du code d'opération indiquent le codec avec
+# lequel la charge utile est compressée (0 : charge non compressée).
+
+# Codes d'opération
+CONNEXION_OK = 1
+MACHINES = 2
+RECEPTION_MACHINES_OK = 3
+SPLIT = 4
+SPLIT_FICHIER = 5
+FIN_SPLIT = 6
+RECEPTION_SPLIT_OK = 7
+GO_MAP_SHUFFLE = 8
+CONNEXION_WORKERS_OK = 9
+CONNEXION_WORKERS_FAILED = 10
+START_MAP_SHUFFLE = 11
+END_MAP_SHUFFLE = 12
+SAVE = 13
+SAVE_OK = 14
+END = 15
+LOT_SHUFFLE = 16
+FIN_SHUFFLE = 17
+SPLIT_BRUT = 18
+LOT_RESULTATS = 19
+DEBUT_JOB = 20
+REPRISE = 21
+REENVOI_PARTITION = 22
+ECHEC_SPLIT = 23
+MACHINE_INCONNUE = 24
+
+NOMS_OPERATIONS = {
+    CONNEXION_OK: "CONNEXION OK",
+    MACHINES: "MACHINES",
+    RECEPTION_MACHINES_OK: "RECEPTION MACHINES OK",
+    SPLIT: "SPLIT",
+    SPLIT_FICHIER: "SPLIT FICHIER",
+    FIN_SPLIT: "FIN SPLIT",
+    RECEPTION_SPLIT_OK: "RECEPTION SPLIT OK",
+    GO_MAP_SHUFFLE: "GO MAP SHUFFLE",
+    CONNEXION_WORKERS_OK: "CONNEXION WORKERS OK",
+    CONNEXION_WORKERS_FAILED: "CONNEXION WORKERS FAILED",
+    START_MAP_SHUFFLE: "START MAP SHUFFLE",
+    END_MAP_SHUFFLE: "END MAP SHUFFLE",
+    SAVE: "SAVE",
+    SAVE_OK: "SAVE OK",
+    END: "END",
+    LOT_SHUFFLE: "LOT SHUFFLE",
+    FIN_SHUFFLE: "FIN SHUFFLE",
+    SPLIT_BRUT: "SPLIT BRUT",
+    LOT_RESULTATS: "LOT RESULTATS",
+    DEBUT_JOB: "DEBUT JOB",
+    REPRISE: "REPRISE",
+    REENVOI_PARTITION: "REENVOI PARTITION",
+    ECHEC_SPLIT: "ECHEC SPLIT",
+    MACHINE_INCONNUE: "MACHINE INCONNUE",
+}
+
+# Compression des charges utiles, négociée au moment de la connexion :
+# nom du codec -> (identifiant dans le code d'opération, niveau par défaut)
+COMPRESSION_AUCUNE = "aucune"
+CODECS = {
+    "zlib": (1, 1),
+    "lzma": (2, 0),
+}
+DECALAGE_CODEC = 6
+MASQUE_OPERATION = (1 << DECALAGE_CODEC) - 1
+# Seules les charges volumineuses sont compressées : le texte du SPLIT, les lots du
+# shuffle et les lots de résultats renvoyés au master
+OPERATIONS_COMPRESSIBLES = {SPLIT, SPLIT_BRUT, LOT_SHUFFLE, LOT_RESULTATS}
+TAILLE_MIN_COMPRESSION = 512  # en octets
+
+ENTETE = struct.Struct('!BI')
+TAILLE_ENTETE = ENTETE.size
+
+# Taille initiale d'un tampon de réception (agrandi si une trame ne tient pas)
+TAILLE_INITIALE_RECEPTION = 64 * 1024  # en octets
+# Nombre maximal de tampons passés à un appel de sendmsg (limite IOV_MAX)
+NB_MAX_TAMPONS_ENVOI = 64
+
+# Nombre de caractères de la charge utile repris dans la description d'une trame
+TAILLE_MAX_DESCRIPTION = 200
+
+
+def analyser_adresse(adresse, port_defaut):
+    """
+    Args:
+        adresse (str): Une adresse de worker "hote" ou "hote:port" (ligne de machines.txt).
+        port_defaut (int): Le port utilisé si l'adresse n'en précise pas.
+
+    Returns:
+        tuple: (hote, port).
+    """
+    hote, separateur, port = adresse.strip().rpartition(':')
+    if separateur and port.isdigit():
+        return hote, int(port)
+    return adresse.strip(), port_defaut
+
+
+def formater_adresse(hote, port):
+    """
+    Returns:
+        str: L'adresse "hote:port", qui sert d'identité au worker qui écoute sur ce port.
+    """
+    return f"{hote}:{port}"
+
+
+def normaliser_adresse(adresse, port_defaut):
+    """
+    Forme unique de l'adresse d'un worker, comparée par le master (machines.txt)
+    et par le worker (--nom) : sans blancs, nom d'hôte en minuscules, port explicite.
+
+    Args:
+        adresse (str): Une adresse de worker "hote" ou "hote:port".
+        port_defaut (int): Le port utilisé si l'adresse n'en précise pas.
+
+    Returns:
+        str: L'adresse "hote:port".
+    """
+    hote, port = analyser_adresse(adresse, port_defaut)
+    return formater_adresse(hote.lower(), port)
+
+
+def decrire_trame(operation, texte=''):
+    """
+    Args:
+        operation (int): Le code d'opération de la trame.
+        texte (str): La charge utile décodée.
+
+    Returns:
+        str: Une description lisible de la trame, pour le journal (charge utile
+             tronquée à TAILLE_MAX_DESCRIPTION caractères).
+    """
+    nom = NOMS_OPERATIONS.get(operation, f"OPERATION {operation}")
+    if len(texte) > TAILLE_MAX_DESCRIPTION:
+        return f"{nom} : {texte[:TAILLE_MAX_DESCRIPTION]}... ({len(texte)} caractères)"
+    return f"{nom} : {texte}" if texte else nom
+
+
+def decompresser(operation, charge):
+    """
+    Décompresse la charge utile d'une trame reçue si son code d'opération
+    l'indique. Ne dépend pas du niveau de compression de l'émetteur.
+
+    Args:
+        operation (int): Le code d'opération reçu, avec l'identifiant du codec.
+        charge (bytes ou memoryview): La charge utile reçue.
+
+    Returns:
+        tuple: (code d'opération sans l'identifiant du codec, charge utile décompressée).
+    """
+    identifiant = operation >> DECALAGE_CODEC
+    if not identifiant:
+        return operation, charge
+    operation &= MASQUE_OPERATION
+    if identifiant == CODECS["zlib"][0]:
+        return operation, zlib.decompress(charge)
+    if identifiant == CODECS["lzma"][0]:
+        return operation, lzma.decompress(charge)
+    raise ValueError(f"Codec de compression inconnu : {identifiant}")
+
+
+class Compresseur:
+    """
+    Compression des charges utiles envoyées sur une connexion, selon la
+    description négociée ({"type": "zlib", "niveau": 1} par exemple). Compte
+    les octets des charges compressibles avant et après compression.
+    Une charge n'est envoyée compressée que si elle y gagne.
+    """
+
+    def __init__(self, description=None):
+        self.octets_avant = 0
+        self.octets_apres = 0
+        self.configurer(description or {"type": COMPRESSION_AUCUNE})
+
+    def configurer(self, description):
+        """
+        Args:
+            description (dict): Description de la compression, ex. {"type": "zlib", "niveau": 1}.
+        """
+        self.type = description.get("type", COMPRESSION_AUCUNE)
+        if self.type != COMPRESSION_AUCUNE and self.type not in CODECS:
+            raise ValueError(f"Compression inconnue : {self.type}")
+        niveau = description.get("niveau")
+        if niveau is None and self.type in CODECS:
+            niveau = CODECS[self.type][1]
+        self.niveau = niveau
+
+    def vers_dict(self):
+        if self.type == COMPRESSION_AUCUNE:
+            return {"type": self.type}
+        return {"type": self.type, "niveau": self.niveau}
+
+    def compresser(self, operation, charge):
+        """
+        Args:
+            operation (int): Le code d'opération de la trame.
+            charge (bytes): La charge utile.
+
+        Returns:
+            tuple: (code d'opération, avec l'identifiant du codec si la charge
+                   est compressée, charge utile à envoyer).
+        """
+        if operation not in OPERATIONS_COMPRESSIBLES:
+            return operation, charge
+        self.octets_avant += len(charge)
+        if self.type != COMPRESSION_AUCUNE and len(charge) >= TAILLE_MIN_COMPRESSION:
+            if self.type == "zlib":
+                compressee = zlib.compress(charge, self.niveau)
+            else:
+                compressee = lzma.compress(charge, preset=self.niveau)
+            if len(compressee) < len(charge):
+                operation |= CODECS[self.type][0] << DECALAGE_CODEC
+                charge = compressee
+        self.octets_apres += len(charge)
+        return operation, charge
+
+
+def retirer_envoyes(tampons, envoyes):
+    """
+    Retire d'une file de tampons les envoyes premiers octets (envoi partiel de
+    sendmsg). Un tampon envoyé en partie est remplacé par une vue sur sa fin,
+    sans copie.
+
+    Args:
+        tampons (deque): Les tampons restant à envoyer, mise à jour.
+        envoyes (int): Le nombre d'octets envoyés.
+    """
+    while envoyes:
+        premier = tampons[0]
+        if envoyes >= len(premier):
+            tampons.popleft()
+            envoyes -= len(premier)
+        else:
+            tampons[0] = memoryview(premier)[envoyes:]
+            envoyes = 0
+
+
+def envoyer_trame(socket_connexion, operation, charge=b''):
+    """
+    Envoie une trame sur un socket bloquant. L'en-tête et la charge utile sont
+    passés séparément à sendmsg (envoi dispersé) : la charge n'est pas recopiée
+    derrière l'en-tête.
+
+    Args:
+        socket_connexion (socket.socket): Le socket utilisé pour l'envoi.
+        operation (int): Le code d'opération.
+        charge (bytes): La charge utile.
+    """
+    tampons = deque([ENTETE.pack(operation, len(charge))])
+    if charge:
+        tampons.append(charge)
+    while tampons:
+        retirer_envoyes(tampons, socket_connexion.sendmsg(tampons))
+
+
+class FileEnvoi:
+    """
+    File de trames à envoyer sur un socket non bloquant. Les en-têtes et les
+    charges utiles restent des tampons distincts, envoyés par lots de
+    NB_MAX_TAMPONS_ENVOI avec sendmsg (envoi dispersé, sans concaténation).
+    """
+
+    def __init__(self):
+        self.tampons = deque()
+        self.taille = 0
+
+    def __len__(self):
+        return self.taille
+
+    def ajouter(self, operation, charge=b''):
+        """
+        Args:
+            operation (int): Le code d'opération.
+            charge (bytes): La charge utile.
+        """
+        self.tampons.append(ENTETE.pack(operation, len(charge)))
+        if charge:
+            self.tampons.append(charge)
+        self.taille += TAILLE_ENTETE + len(charge)
+
+    def envoyer(self, socket_connexion):
+        """
+        Envoie tout ce que le socket accepte sans bloquer.
+
+        Args:
+            socket_connexion (socket.socket): Le socket (non bloquant) utilisé pour l'envoi.
+
+        Raises:
+            BlockingIOError: Si le socket n'accepte plus rien.
+        """
+        while self.tampons:
+            lot = list(islice(self.tampons, NB_MAX_TAMPONS_ENVOI))
+            envoyes = socket_connexion.sendmsg(lot)
+            self.taille -= envoyes
+            retirer_envoyes(self.tampons, envoyes)
+            if envoyes < sum(len(tampon) for tampon in lot):
+                break
+
+    def vider(self):
+        self.tampons.clear()
+        self.taille = 0
+
+
+class TamponReception:
+    """
+    Tampon de réception réutilisé d'une lecture à l'autre : recv_into écrit
+    directement dans un bytearray, et les trames complètes sont rendues sous
+    forme de vues (memoryview) sur ce tampon, sans copie. Une vue n'est valable
+    que jusqu'à l'appel suivant à recevoir.
+    """
+
+    def __init__(self, taille=TAILLE_INITIALE_RECEPTION):
+        self.tampon = bytearray(taille)
+        self.vue = memoryview(self.tampon)
+        self.debut = 0
+        self.fin = 0
+        self.taille_requise = TAILLE_ENTETE
+
+    def recevoir(self, socket_connexion):
+        """
+        Lit les octets disponibles sur le socket à la suite des octets déjà reçus.
+        Les octets non consommés sont d'abord ramenés au début du tampon, qui est
+        remplacé par un plus grand si la trame en cours ne tient pas.
+
+        Args:
+            socket_connexion (socket.socket): Le socket utilisé pour la réception.
+
+        Returns:
+            int: Le nombre d'octets lus (0 si la connexion est fermée).
+        """
+        restant = self.fin - self.debut
+        if self.debut and len(self.tampon) - self.debut < self.taille_requise:
+            self.vue[:restant] = self.vue[self.debut:self.fin]
+            self.debut, self.fin = 0, restant
+        if len(self.tampon) < self.taille_requise:
+            # Nouveau tampon : l'ancien peut encore être référencé par une vue
+            tampon = bytearray(max(self.taille_requise, 2 * len(self.tampon)))
+            tampon[:restant] = self.vue[self.debut:self.fin]
+            self.tampon = tampon
+            self.vue = memoryview(tampon)
+            self.debut, self.fin = 0, restant
+        nb_octets = socket_connexion.recv_into(self.vue[self.fin:])
+        self.fin += nb_octets
+        return nb_octets
+
+    def trames(self):
+        """
+        Extrait les trames complètes reçues. Une trame partiellement reçue reste
+        dans le tampon jusqu'à la lecture suivante.
+
+        Yields:
+            tuple: (code d'opération, memoryview de la charge utile).
+        """
+        while True:
+            disponible = self.fin - self.debut
+            if disponible < TAILLE_ENTETE:
+                self.taille_requise = TAILLE_ENTETE
+                break
+            operation, taille = ENTETE.unpack_from(self.tampon, self.debut)
+            if disponible < TAILLE_ENTETE + taille:
+                self.taille_requise = TAILLE_ENTETE + taille
+                break
+            debut_charge = self.debut + TAILLE_ENTETE
+            self.debut = debut_charge + taille
+            yield operation, self.vue[debut_charge:self.debut]
+        if self.debut == self.fin:
+            self.debut = self.fin = 0
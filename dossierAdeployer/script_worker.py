@@ -1,19 +1,46 @@
+import argparse
+import errno
+import heapq
+import logging
 import socket
-import threading
+import selectors
 import os
 import time
-import struct
 import json
+from collections import Counter, defaultdict, deque
+
+import protocole
+from comptage import ComptageParallele, lire_plage
+from format_resultats import cle_frequence, ecrire_table
+from journalisation import NIVEAU_DEFAUT, NIVEAUX, TraceEchantillonnee, configurer_journal, journal
+from mesures import MesuresJob, Trafic
+from partitionnement import creer_partitionneur
+from tokenisation import nettoyer_message
 
 # CONSTANTES GLOBALES
 PORT_PRINCIPAL = 3463
 PORT_SECONDAIRE = PORT_PRINCIPAL + 1
 MAX_TENTATIVES = 10
 
-# NOM DE LA MACHINE (WORKER)
-NOM_MACHINE = socket.gethostname()
+# Seuils de vidage des tampons d'envoi du shuffle (un lot = une trame TCP)
+TAILLE_MAX_LOT = 64 * 1024  # en octets
+DELAI_MAX_LOT = 0.05  # en secondes
+
+# Traces (niveau debug) des mots traités localement : un mot sur ECHANTILLON_TRACE_MOTS
+ECHANTILLON_TRACE_MOTS = 1000
+
+# Boucle d'événements
+# Contrôle de flux : le shuffle est suspendu tant que le tampon d'envoi vers un
+# worker dépasse cette taille
+TAILLE_MAX_TAMPON_ENVOI = 4 * TAILLE_MAX_LOT  # en octets
+NB_COUPLES_PAR_TRANCHE = 10000  # couples traités par tour de boucle pendant le shuffle
+
+# IDENTITE DU WORKER : son adresse "hote:port" telle qu'elle figure dans machines.txt
+# (remplacée au lancement par celle donnée en ligne de commande)
+NOM_MACHINE = protocole.normaliser_adresse(socket.gethostname(), PORT_PRINCIPAL)
 
 # Dictionnaire global pour stocker les occurrences de mots
+# (comptes réduits de la partition de ce worker, voir gerer_evenements)
 occurrences_mots = {}
 
 
@@ -21,119 +48,213 @@ occurrences_mots = {}
 # FONCTIONS D'ENVOI/RECEPTION DE MESSAGES
 ###################################################
 
-def envoyer_message(socket_connexion, message, silencieux=False):
+class Connexion:
     """
-    Envoie un message via un socket TCP.
-    
-    Args:
-        socket_connexion (socket.socket): Le socket utilisé pour l'envoi.
-        message (str): Le message à envoyer au format texte.
-        silencieux (bool): Si True, aucune information n'est affichée sur la console.
-                          Sinon, un message de confirmation est affiché.
+    Connexion TCP non bloquante gérée par la boucle d'événements (voir
+    gerer_evenements), qui échange des trames du protocole binaire (voir
+    protocole.py) : les trames à envoyer s'accumulent dans une file d'envoi
+    vidée dès que le socket est prêt en écriture, les octets reçus dans un
+    tampon de réception réutilisé dont on extrait les trames complètes.
+    Les charges utiles sont compressées selon la compression négociée avec le
+    master (voir protocole.Compresseur) et décompressées à la réception.
+    Le rôle indique l'autre extrémité : "master", "entrant" (shuffle reçu d'un
+    autre worker) ou "sortant" (shuffle envoyé à un autre worker). Une
+    connexion entrante accumule les lots reçus dans les comptes de chaque flux
+    {(tâche, partition): Counter}, pour le job annoncé par le dernier "DEBUT JOB"
+    reçu (id_job), et retient les "FIN SHUFFLE" reçues (fins), même si ce job
+    n'a pas encore commencé pour ce worker (mode pipeline).
+    Les trames envoyées et reçues sont comptées dans trafic (voir mesures.py).
+    Une connexion sortante est établie sans bloquer (voir Maillage.connecter) :
+    tant que connexion_en_cours est vrai, ses trames attendent dans la file d'envoi.
+    Après une erreur d'envoi, la connexion est en échec (en_echec) : les trames
+    suivantes sont perdues, et le worker ne peut plus terminer son shuffle.
     """
-    try:
-        message_bytes = message.encode('utf-8')
-        taille_message = struct.pack('!I', len(message_bytes))
-        socket_connexion.sendall(taille_message + message_bytes)
-        if not silencieux:
-            print(f"'{NOM_MACHINE}' : Message envoyé : {message}")
-    except Exception as e:
-        if not silencieux:
-            print(f"'{NOM_MACHINE}' : Erreur lors de l'envoi du message : {e}")
 
+    def __init__(self, socket_connexion, nom, role):
+        socket_connexion.setblocking(False)
+        self.socket = socket_connexion
+        self.nom = nom
+        self.role = role
+        self.tampon_reception = protocole.TamponReception()
+        self.file_envoi = protocole.FileEnvoi()
+        self.compresseur = protocole.Compresseur()
+        self.flux = {}
+        self.id_job = None
+        self.fins = []
+        self.trafic = Trafic()
+        self.connexion_en_cours = False
+        self.en_echec = False
 
-def recevoir_message(socket_connexion, silencieux=False):
-    """
-    Reçoit un message via un socket TCP.
-    
-    Args:
-        socket_connexion (socket.socket): Le socket utilisé pour la réception.
-        silencieux (bool): Si True, aucune information n'est affichée.
-                           Sinon, le message reçu est affiché.
+    def envoyer(self, operation, texte='', silencieux=False):
+        """
+        Ajoute une trame à la file d'envoi et en envoie tout ce que le socket
+        accepte sans bloquer ; le reste part quand le socket redevient prêt.
+        
+        Args:
+            operation (int): Le code d'opération (protocole.RECEPTION_SPLIT_OK...).
+            texte (str): La charge utile, éventuellement vide.
+            silencieux (bool): Si True, la trame n'est pas journalisée (au niveau debug).
+        """
+        operation_envoyee, charge = self.compresseur.compresser(operation, texte.encode('utf-8'))
+        self.file_envoi.ajouter(operation_envoyee, charge)
+        self.trafic.envoi(protocole.TAILLE_ENTETE + len(charge))
+        if not silencieux and journal.isEnabledFor(logging.DEBUG):
+            journal.debug("Message envoyé à %s : %s", self.nom, protocole.decrire_trame(operation, texte))
+        self.vider()
 
-    Returns:
-        str ou None: Le message reçu en texte. Retourne None si la connexion est fermée.
-    """
-    try:
-        taille_message_bytes = b''
-        while len(taille_message_bytes) < 4:
-            packet = socket_connexion.recv(4 - len(taille_message_bytes))
-            if not packet:
-                return None
-            taille_message_bytes += packet
+    def vider(self):
+        """
+        Envoie sans bloquer le début de la file d'envoi. Une erreur d'envoi met la
+        connexion en échec : la file d'envoi est abandonnée.
+        
+        Returns:
+            bool: True si la file d'envoi est vide.
+        """
+        if self.connexion_en_cours:
+            return not self.file_envoi
+        if self.en_echec:
+            self.file_envoi.vider()
+            return True
+        try:
+            self.file_envoi.envoyer(self.socket)
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError as e:
+            journal.error(f"Erreur lors de l'envoi à {self.nom} : {e}. Trames non envoyées abandonnées.")
+            self.en_echec = True
+            self.file_envoi.vider()
+        return not self.file_envoi
 
-        taille_message = struct.unpack('!I', taille_message_bytes)[0]
+    def recevoir(self, silencieux=False):
+        """
+        Lit les octets disponibles sur le socket et extrait les trames complètes.
+        Une trame partiellement reçue reste dans le tampon jusqu'à la lecture suivante.
+        
+        Args:
+            silencieux (bool): Si True, les trames reçues ne sont pas journalisées.
+                               Sinon, chacune l'est au niveau debug.
 
-        message_bytes = b''
-        while len(message_bytes) < taille_message:
-            packet = socket_connexion.recv(taille_message - len(message_bytes))
-            if not packet:
+        Returns:
+            list ou None: Les triplets (code d'opération, texte, taille de la trame reçue) reçus
+                          (éventuellement aucun). Retourne None si la connexion est fermée.
+        """
+        try:
+            if not self.tampon_reception.recevoir(self.socket):
                 return None
-            message_bytes += packet
+        except (BlockingIOError, InterruptedError):
+            return []
+        except OSError as e:
+            journal.error(f"Erreur lors de la réception depuis {self.nom} : {e}")
+            return None
 
-        message = message_bytes.decode('utf-8')
-        if not silencieux:
-            print(f"'{NOM_MACHINE}' : Message reçu : {message}")
-        return message
+        messages = []
+        tracer = not silencieux and journal.isEnabledFor(logging.DEBUG)
+        for operation, charge in self.tampon_reception.trames():
+            taille_trame = protocole.TAILLE_ENTETE + len(charge)
+            operation, charge = protocole.decompresser(operation, charge)
+            texte = str(charge, 'utf-8')
+            if tracer:
+                journal.debug("Message reçu de %s : %s", self.nom, protocole.decrire_trame(operation, texte))
+            messages.append((operation, texte, taille_trame))
+        return messages
 
-    except Exception as e:
-        if not silencieux:
-            print(f"'{NOM_MACHINE}' : Erreur lors de la réception du message : {e}")
-        return None
+    def mettre_a_jour_selecteur(self, selecteur):
+        """
+        Inscrit le socket auprès du sélecteur pour les événements utiles : lecture
+        (sauf pour une connexion sortante, sur laquelle rien n'est reçu) et
+        écriture tant que la file d'envoi n'est pas vide ou que la connexion
+        n'est pas encore établie.
+        
+        Args:
+            selecteur (selectors.BaseSelector): Le sélecteur de la boucle d'événements.
+        """
+        evenements = 0 if self.role == "sortant" else selectors.EVENT_READ
+        if self.file_envoi or self.connexion_en_cours:
+            evenements |= selectors.EVENT_WRITE
+        try:
+            cle = selecteur.get_key(self.socket)
+        except KeyError:
+            cle = None
+        if cle is None:
+            if evenements:
+                selecteur.register(self.socket, evenements, self)
+        elif not evenements:
+            selecteur.unregister(self.socket)
+        elif cle.events != evenements:
+            selecteur.modify(self.socket, evenements, self)
+
+    def fermer(self, selecteur):
+        """
+        Désinscrit le socket du sélecteur et le ferme.
+        
+        Args:
+            selecteur (selectors.BaseSelector): Le sélecteur de la boucle d'événements.
+        """
+        try:
+            selecteur.unregister(self.socket)
+        except KeyError:
+            pass
+        self.socket.close()
 
 
 ###################################################
 # FONCTIONS POUR LA CONNEXION AU MASTER
 ###################################################
 
-def fermer_connexion_master(socket_master):
+def fermer_connexion_master(connexion_master, selecteur):
     """
     Ferme la connexion avec le master.
     
     Args:
-        socket_master (socket.socket): Le socket correspondant à la connexion avec le master.
+        connexion_master (Connexion): La connexion avec le master.
+        selecteur (selectors.BaseSelector): Le sélecteur de la boucle d'événements.
     """
     try:
-        socket_master.close()
-        print(f"'{NOM_MACHINE}' : Connexion avec le master fermée.")
+        connexion_master.fermer(selecteur)
+        journal.info("Connexion avec le master fermée.")
     except Exception as e:
-        print(f"'{NOM_MACHINE}' : Erreur lors de la fermeture de la connexion avec le master : {e}")
+        journal.error(f"Erreur lors de la fermeture de la connexion avec le master : {e}")
 
 
-def connexion_au_master():
+def connexion_au_master(port):
     """
     Prépare et met en écoute un socket pour établir la connexion avec le master 
-    sur le port principal (PORT_PRINCIPAL).
+    sur le port principal.
     Gère également les cas où le port est déjà utilisé (tentatives multiples).
     
+    Args:
+        port (int): Le port principal du worker (port par défaut).
+    
     Returns:
         socket.socket: Le socket lié et mis en écoute pour la connexion du master.
     """
     socket_master = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # Relance immédiate possible même si des connexions du lancement précédent sont en TIME_WAIT
+    socket_master.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     for tentative in range(MAX_TENTATIVES):
         try:
-            socket_master.bind(('0.0.0.0', PORT_PRINCIPAL))
-            print(f"'{NOM_MACHINE}' : Le socket est lié au port {PORT_PRINCIPAL} après {tentative + 1} tentative(s).")
+            socket_master.bind(('0.0.0.0', port))
+            journal.info(f"Le socket est lié au port {port} après {tentative + 1} tentative(s).")
             break
         except OSError:
             if tentative < MAX_TENTATIVES - 1:
-                print(f"'{NOM_MACHINE}' : Le port {PORT_PRINCIPAL} est déjà utilisé. "
-                      f"Tentative de libération du port ({tentative + 1}/{MAX_TENTATIVES})...")
-                pid = os.popen(f'lsof -t -i:{PORT_PRINCIPAL}').read().strip()
-                print(f"'{NOM_MACHINE}' : PID du processus utilisant le port {PORT_PRINCIPAL} : {pid}")
+                journal.warning(f"Le port {port} est déjà utilisé. "
+                                f"Tentative de libération du port ({tentative + 1}/{MAX_TENTATIVES})...")
+                pid = os.popen(f'lsof -t -i:{port}').read().strip()
+                journal.info(f"PID du processus utilisant le port {port} : {pid}")
                 if pid:
                     os.system(f'kill -9 {pid}')
-                    print(f"'{NOM_MACHINE}' : Tentative de tuer le processus {pid}.")
+                    journal.warning(f"Tentative de tuer le processus {pid}.")
                 else:
-                    print(f"'{NOM_MACHINE}' : Aucun processus n'utilise le port {PORT_PRINCIPAL}.")
+                    journal.info(f"Aucun processus n'utilise le port {port}.")
                 time.sleep(5)
             else:
-                raise Exception(f"'{NOM_MACHINE}' : Impossible de lier le socket au port {PORT_PRINCIPAL} "
+                raise Exception(f"'{NOM_MACHINE}' : Impossible de lier le socket au port {port} "
                                 f"après {MAX_TENTATIVES} tentatives.")
 
     socket_master.listen(5)
-    print(f"'{NOM_MACHINE}' : PHASE CONNEXION 1 : Le worker écoute sur le port {PORT_PRINCIPAL} "
-          "pour les connexions du master.")
+    journal.info(f"PHASE CONNEXION 1 : Le worker écoute sur le port {port} "
+                 "pour les connexions du master.")
     return socket_master
 
 
@@ -141,280 +262,1035 @@ def connexion_au_master():
 # FONCTIONS POUR LA CONNEXION AUX AUTRES WORKERS
 ##########################################################
 
-def connexion_aux_workers():
+def connexion_aux_workers(port):
     """
     Prépare et met en écoute un socket pour se connecter aux autres workers 
-    sur le port secondaire (PORT_SECONDAIRE).
+    sur le port secondaire.
     Gère les tentatives multiples si le port est occupé.
     
+    Args:
+        port (int): Le port secondaire du worker (port par défaut).
+    
     Returns:
         socket.socket: Le socket lié et mis en écoute pour les connexions des autres workers.
     """
     socket_workers = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    socket_workers.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     for tentative in range(MAX_TENTATIVES):
         try:
-            socket_workers.bind(('0.0.0.0', PORT_SECONDAIRE))
-            print(f"'{NOM_MACHINE}' : Le socket est lié au port {PORT_SECONDAIRE} "
-                  f"après {tentative + 1} tentative(s).")
+            socket_workers.bind(('0.0.0.0', port))
+            journal.info(f"Le socket est lié au port {port} "
+                         f"après {tentative + 1} tentative(s).")
             break
         except OSError:
             if tentative < MAX_TENTATIVES - 1:
-                print(f"'{NOM_MACHINE}' : Le port {PORT_SECONDAIRE} est déjà utilisé. "
-                      f"Tentative de libération du port ({tentative + 1}/{MAX_TENTATIVES})...")
-                pid = os.popen(f'lsof -t -i:{PORT_SECONDAIRE}').read().strip()
-                print(f"'{NOM_MACHINE}' : PID du processus utilisant le port {PORT_SECONDAIRE} : {pid}")
+                journal.warning(f"Le port {port} est déjà utilisé. "
+                                f"Tentative de libération du port ({tentative + 1}/{MAX_TENTATIVES})...")
+                pid = os.popen(f'lsof -t -i:{port}').read().strip()
+                journal.info(f"PID du processus utilisant le port {port} : {pid}")
                 if pid:
                     os.system(f'kill -9 {pid}')
-                    print(f"'{NOM_MACHINE}' : Tentative de tuer le processus {pid}.")
+                    journal.warning(f"Tentative de tuer le processus {pid}.")
                 else:
-                    print(f"'{NOM_MACHINE}' : Aucun processus n'utilise le port {PORT_SECONDAIRE}.")
+                    journal.info(f"Aucun processus n'utilise le port {port}.")
                 time.sleep(5)
             else:
-                raise Exception(f"'{NOM_MACHINE}' : Impossible de lier le socket au port {PORT_SECONDAIRE} "
+                raise Exception(f"'{NOM_MACHINE}' : Impossible de lier le socket au port {port} "
                                 f"après {MAX_TENTATIVES} tentatives.")
 
-    socket_workers.listen(5)
-    print(f"'{NOM_MACHINE}' : PHASE CONNEXION 2 : Le worker écoute sur le port {PORT_SECONDAIRE} "
-          "pour les connexions des autres workers.")
+    # Tous les autres workers peuvent se connecter en même temps au début d'un job
+    socket_workers.listen(socket.SOMAXCONN)
+    journal.info(f"PHASE CONNEXION 2 : Le worker écoute sur le port {port} "
+                 "pour les connexions des autres workers.")
     return socket_workers
 
 
-def recevoir_msg_workers(socket_worker_connexion, worker_address):
+def fermer_connexions_workers(connexions_workers, selecteur):
     """
-    Gère la communication entrante d'un autre worker.
-    Lit les messages reçus en boucle et met à jour les occurrences de mots.
+    Ferme toutes les connexions établies avec les autres workers.
     
     Args:
-        socket_worker_connexion (socket.socket): Le socket de connexion avec l'autre worker.
-        worker_address (tuple): L'adresse (host, port) du worker distant.
+        connexions_workers (dict): Dictionnaire {adresse_worker: Connexion}.
+        selecteur (selectors.BaseSelector): Le sélecteur de la boucle d'événements.
     """
-    while True:
+    for addr, connexion in connexions_workers.items():
         try:
-            message = recevoir_message(socket_worker_connexion, silencieux=True)
-            if message is None:
-                # Connexion fermée par le worker distant
-                break
-            print(f"'{NOM_MACHINE}' : Message reçu de {worker_address} : {message}")
-            compter_occurrences(message)
-        except ConnectionError:
-            break
+            connexion.fermer(selecteur)
+            journal.info(f"Connexion fermée avec le worker {addr}")
         except Exception as e:
-            print(f"'{NOM_MACHINE}' : Erreur lors de la communication avec {worker_address} : {e}")
-            break
+            journal.error(f"Erreur lors de la fermeture de la connexion avec {addr} : {e}")
 
 
-def accepter_connexions_workers(socket_workers, connexions_workers):
+##########################################################
+# FONCTIONS POUR LA COMMUNICATION AVEC LES AUTRES WORKERS
+##########################################################
+
+def combiner_mots(comptes_locaux, list_mots):
     """
-    Accepte en boucle les connexions entrantes des autres workers 
-    et démarre un thread dédié à chacun.
+    Phase COMBINE : pré-agrège localement les mots du split avant le shuffle,
+    afin de n'envoyer qu'un couple (mot, nombre) par mot distinct.
+    Le split pouvant arriver en plusieurs morceaux, chaque morceau est
+    ajouté aux comptes déjà accumulés dès sa réception.
     
     Args:
-        socket_workers (socket.socket): Le socket en écoute sur PORT_SECONDAIRE.
-        connexions_workers (dict): Dictionnaire où seront stockées les connexions 
-                                   {adresse_worker: socket}.
+        comptes_locaux (Counter): Comptes accumulés du split {mot: nombre}, mis à jour.
+        list_mots (list): Liste de mots d'un morceau du split reçu du master.
     """
-    while True:
-        try:
-            socket_worker_connexion, worker_address = socket_workers.accept()
-            print(f"'{NOM_MACHINE}' : Connexion acceptée d'un worker : {worker_address}")
-            connexions_workers[worker_address] = socket_worker_connexion
-            thread_comm = threading.Thread(target=recevoir_msg_workers,
-                                           args=(socket_worker_connexion, worker_address))
-            thread_comm.start()
-        except Exception as e:
-            print(f"'{NOM_MACHINE}' : Erreur lors de l'acceptation d'une connexion worker : {e}")
-            break
+    comptes_locaux.update(list_mots)
 
 
-def fermer_connexions_workers(connexions_workers):
+def resoudre_chemin(chemin):
     """
-    Ferme toutes les connexions établies avec les autres workers.
+    Retrouve le fichier d'entrée désigné par le master : le chemin reçu s'il
+    est accessible (stockage partagé), sinon une copie locale du même nom
+    dans le répertoire courant.
     
     Args:
-        connexions_workers (dict): Dictionnaire {adresse_worker: socket}.
-    """
-    for addr, sock in connexions_workers.items():
-        try:
-            sock.close()
-            print(f"'{NOM_MACHINE}' : Connexion fermée avec le worker {addr}")
-        except Exception as e:
-            print(f"'{NOM_MACHINE}' : Erreur lors de la fermeture de la connexion avec {addr} : {e}")
+        chemin (str): Le chemin du fichier sur le master.
 
+    Returns:
+        str: Le chemin à ouvrir sur ce worker.
+    """
+    if os.path.exists(chemin):
+        return chemin
+    return os.path.join(os.getcwd(), os.path.basename(chemin))
 
-##########################################################
-# FONCTIONS POUR LA COMMUNICATION AVEC LES AUTRES WORKERS
-##########################################################
 
-def compter_occurrences(message):
+def fusionner_comptes(comptes, message):
     """
-    Met à jour le dictionnaire global occurrences_mots avec les occurrences
-    des mots trouvés dans le message.
+    Additionne aux comptes d'un flux entrant les comptes reçus dans le message.
     
     Args:
-        message (str): Le message contenant des mots séparés par des espaces.
+        comptes (Counter): Comptes propres au flux {mot: nombre}, mis à jour.
+        message (str): Le message contenant des couples "mot nombre" séparés par des espaces.
     """
-    global occurrences_mots
-    mots = message.split()
-    for mot in mots:
-        occurrences_mots[mot] = occurrences_mots.get(mot, 0) + 1
+    elements = message.split()
+    for mot, compte in zip(elements[0::2], elements[1::2]):
+        comptes[mot] += int(compte)
 
 
-def connexion_aux_autres_workers(machines_reçues):
+def connexion_ouverte(connexion):
     """
-    Etablit des connexions vers les autres workers (pour la phase MAP/SHUFFLE).
-    
     Args:
-        machines_reçues (list): Liste des noms/addresses des machines workers.
+        connexion (Connexion): Une connexion non bloquante.
 
     Returns:
-        dict: Dictionnaire {nom_machine_worker: socket} pour chaque worker connecté.
+        bool: False si l'autre extrémité a fermé la connexion.
     """
-    connexions_workers = {}
-    for machine in machines_reçues:
-        if machine != NOM_MACHINE:
+    try:
+        return connexion.socket.recv(1, socket.MSG_PEEK) != b''
+    except (BlockingIOError, InterruptedError):
+        return True
+    except OSError:
+        return False
+
+
+class Maillage:
+    """
+    Connexions du worker avec les autres workers : le socket en écoute sur le
+    port secondaire, les connexions entrantes (lots du shuffle reçus) et
+    sortantes (lots du shuffle envoyés), et le sélecteur de la boucle
+    d'événements qui les surveille.
+    Un worker persistant (--persistant) garde son maillage d'un job à l'autre :
+    les connexions avec les autres workers restent ouvertes et sont réutilisées
+    par les jobs suivants.
+    """
+
+    def __init__(self, socket_workers):
+        self.socket_workers = socket_workers
+        self.selecteur = selectors.DefaultSelector()
+        self.selecteur.register(socket_workers, selectors.EVENT_READ, None)
+        # {adresse_worker: Connexion}
+        self.entrantes = {}
+        # {nom_machine_worker: Connexion}
+        self.sortantes = {}
+
+    def connexions(self):
+        return list(self.entrantes.values()) + list(self.sortantes.values())
+
+    def connecter(self, machines_reçues, ports_workers):
+        """
+        Lance les connexions vers les autres workers du job (pour la phase MAP/SHUFFLE),
+        en réutilisant celles qui sont restées ouvertes depuis un job précédent.
+        Les connexions sont lancées sans bloquer : la boucle d'événements continue
+        d'accepter celles des autres workers, qui se connectent tous en même temps.
+        Une connexion encore en cours (connexion_en_cours) est terminée par
+        terminer_connexion quand son socket devient prêt en écriture.
+
+        Args:
+            machines_reçues (list): Liste des adresses "hote:port" des workers.
+            ports_workers (list): Ports d'écoute des workers entre eux, dans l'ordre de machines_reçues.
+
+        Returns:
+            dict: Dictionnaire {nom_machine_worker: Connexion} pour chaque worker du job connecté
+                  ou en cours de connexion.
+        """
+        connexions_job = {}
+        for machine, port_workers in zip(machines_reçues, ports_workers):
+            if machine == NOM_MACHINE:
+                continue
+            connexion = self.sortantes.get(machine)
+            if connexion is not None:
+                if (not connexion.connexion_en_cours and not connexion.en_echec and connexion_ouverte(connexion)
+                        and connexion.socket.getpeername()[1] == port_workers):
+                    journal.info(f"Connexion réutilisée avec le worker {machine}")
+                    connexions_job[machine] = connexion
+                    continue
+                # Worker redémarré ou arrêté depuis le job précédent (ou job abandonné pendant la connexion)
+                connexion.fermer(self.selecteur)
+                del self.sortantes[machine]
             try:
                 sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.connect((machine, PORT_SECONDAIRE))
-                connexions_workers[machine] = sock
-                print(f"'{NOM_MACHINE}' : Connexion établie avec le worker {machine}")
+                sock.setblocking(False)
+                erreur = sock.connect_ex((protocole.analyser_adresse(machine, PORT_PRINCIPAL)[0], port_workers))
+                if erreur not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                    sock.close()
+                    raise OSError(erreur, os.strerror(erreur))
+                connexion = Connexion(sock, machine, "sortant")
+                connexion.connexion_en_cours = erreur != 0
+                self.sortantes[machine] = connexions_job[machine] = connexion
+                if not connexion.connexion_en_cours:
+                    journal.info(f"Connexion établie avec le worker {machine}")
             except Exception as e:
-                print(f"'{NOM_MACHINE}' : Erreur lors de la connexion au worker {machine}: {e}")
-    return connexions_workers
+                journal.error(f"Erreur lors de la connexion au worker {machine}: {e}")
+        return connexions_job
+
+    def terminer_connexion(self, connexion):
+        """
+        Termine une connexion sortante lancée par connecter, dont le socket est
+        prêt en écriture. Une connexion en échec est fermée et oubliée.
 
+        Args:
+            connexion (Connexion): La connexion sortante en cours.
 
-def gerer_communication_entre_workers(connexions_workers, list_mots, machines_reçues):
+        Returns:
+            bool: True si la connexion est établie.
+        """
+        connexion.connexion_en_cours = False
+        erreur = connexion.socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if erreur:
+            journal.error(f"Erreur lors de la connexion au worker {connexion.nom}: {os.strerror(erreur)}")
+            connexion.fermer(self.selecteur)
+            if self.sortantes.get(connexion.nom) is connexion:
+                del self.sortantes[connexion.nom]
+            return False
+        journal.info(f"Connexion établie avec le worker {connexion.nom}")
+        return True
+
+    def fermer(self):
+        """
+        Ferme toutes les connexions avec les autres workers et le socket d'écoute.
+        """
+        fermer_connexions_workers(self.sortantes, self.selecteur)
+        fermer_connexions_workers(self.entrantes, self.selecteur)
+        self.selecteur.unregister(self.socket_workers)
+        self.socket_workers.close()
+        self.selecteur.close()
+
+
+def produire_shuffle(connexions_workers, comptes, tache, destinations, partitionneur, enregistrer_flux,
+                     partitions=None, abandonnees=()):
     """
-    Distribue les mots entre les workers. Le mot est soit traité localement,
-    soit envoyé au worker désigné par la logique (longueur du mot % nb de machines).
+    Distribue les comptes pré-agrégés d'une tâche map (le split d'un worker,
+    désignée par l'indice de ce worker) entre les réducteurs. Chaque couple
+    (mot, nombre) appartient à la partition donnée par le partitionneur choisi
+    par le master, réduite soit localement, soit par le worker désigné dans
+    destinations.
+    Les couples d'une même partition sont accumulés dans un tampon et envoyés
+    par lots (une seule trame pour plusieurs couples, précédés de la tâche et
+    de la partition) dès que le tampon dépasse TAILLE_MAX_LOT octets ou que
+    DELAI_MAX_LOT secondes se sont écoulées depuis le dernier envoi de cette
+    partition. Une trame FIN SHUFFLE signale ensuite à chaque worker la fin du
+    flux de la tâche pour ses partitions, et les comptes des partitions
+    réduites localement sont remis à enregistrer_flux.
+    Avec partitions, seuls les couples de ces partitions sont distribués (renvoi
+    d'une partition reprise par un autre worker, voir REENVOI PARTITION).
+    
+    Générateur piloté par la boucle d'événements : il rend la main tous les
+    NB_COUPLES_PAR_TRANCHE couples (en produisant False), et tant que le tampon
+    d'envoi vers un worker dépasse TAILLE_MAX_TAMPON_ENVOI (en produisant True,
+    la boucle attend alors que les sockets se vident). Les lots reçus des autres
+    workers continuent ainsi d'être lus pendant le shuffle. Un worker abandonné,
+    dont la partition a été reprise par un autre, n'est plus attendu : ses lots
+    partent sans suspendre le shuffle.
+    Les destinations sont lues au premier tour du générateur : un shuffle mis en
+    file d'attente suit les partitions reprises avant son démarrage.
     
     Args:
-        connexions_workers (dict): Connexions aux autres workers {nom_machine_worker: socket}.
-        list_mots (list): Liste de mots à distribuer.
-        machines_reçues (list): Liste des machines workers, incluant NOM_MACHINE.
+        connexions_workers (dict): Connexions aux autres workers {nom_machine_worker: Connexion}.
+        comptes (dict): Comptes pré-agrégés de la tâche {mot: nombre}.
+        tache (int): L'indice du worker dont le split a produit ces comptes.
+        destinations (list): Le worker réducteur de chaque partition (NOM_MACHINE pour ce worker).
+        partitionneur: Partitionneur (voir partitionnement.py) de la tâche, donnant la
+                       partition de chaque mot.
+        enregistrer_flux (callable): Appelée avec (tâche, partition, comptes) pour
+                                     chaque partition réduite localement.
+        partitions (iterable): Les seules partitions à distribuer, ou None pour toutes.
+        abandonnees (set): Les workers abandonnés, mis à jour pendant le shuffle.
+
+    Yields:
+        bool: True si le shuffle attend qu'un tampon d'envoi se vide.
     """
-    def envoyer_mots():
-        for mot in list_mots:
-            machine_number = len(mot) % len(machines_reçues)
-            machine_cible = machines_reçues[machine_number]
-
-            if machine_cible == NOM_MACHINE:
-                # Traiter localement
-                compter_occurrences(mot)
-                print(f"'{NOM_MACHINE}' : Mot '{mot}' traité localement")
-            else:
-                envoyer_message(connexions_workers[machine_cible], mot, silencieux=True)
-                print(f"'{NOM_MACHINE}' : Mot '{mot}' envoyé à la machine {machine_cible}")
+    destinations = list(destinations)
+    if partitions is None:
+        partitions = range(len(destinations))
+    locales = {partition: Counter() for partition in partitions if destinations[partition] == NOM_MACHINE}
+    distantes = {partition: destinations[partition] for partition in partitions
+                 if destinations[partition] != NOM_MACHINE}
+    tampons = {partition: [] for partition in distantes}
+    tailles_tampons = {partition: 0 for partition in distantes}
+    derniers_envois = {partition: time.perf_counter() for partition in distantes}
+    trace_lots = TraceEchantillonnee()
+    trace_mots = TraceEchantillonnee(echantillon=ECHANTILLON_TRACE_MOTS)
+    tracer_mots = trace_mots.active
+
+    def vider_tampon(partition):
+        if not tampons[partition]:
+            return
+        lot = f"{tache} {partition} " + ' '.join(tampons[partition])
+        connexions_workers[distantes[partition]].envoyer(protocole.LOT_SHUFFLE, lot, silencieux=True)
+        trace_lots("Lot de %d couples (mot, nombre) de la partition %d envoyé à la machine %s",
+                   len(tampons[partition]), partition, distantes[partition])
+        tampons[partition] = []
+        tailles_tampons[partition] = 0
+        derniers_envois[partition] = time.perf_counter()
+
+    for i, (mot, compte) in enumerate(comptes.items(), 1):
+        partition = partitionneur.partition(mot)
+
+        if partition in locales:
+            # Traiter localement
+            locales[partition][mot] += compte
+            if tracer_mots:
+                trace_mots("Mot '%s' (%d occurrence(s)) traité localement", mot, compte)
+        elif partition in tampons:
+            enregistrement = f"{mot} {compte}"
+            tampons[partition].append(enregistrement)
+            tailles_tampons[partition] += len(enregistrement.encode('utf-8')) + 1
+            if (tailles_tampons[partition] >= TAILLE_MAX_LOT
+                    or time.perf_counter() - derniers_envois[partition] >= DELAI_MAX_LOT):
+                vider_tampon(partition)
+                machine_cible = distantes[partition]
+                while (len(connexions_workers[machine_cible].file_envoi) > TAILLE_MAX_TAMPON_ENVOI
+                       and machine_cible not in abandonnees):
+                    yield True
 
-    thread_envoi = threading.Thread(target=envoyer_mots)
-    thread_envoi.start()
-    thread_envoi.join()
+        if i % NB_COUPLES_PAR_TRANCHE == 0:
+            yield False
 
+    # Envoi des lots restants, puis de la fin du flux à chaque worker
+    for partition in tampons:
+        vider_tampon(partition)
+    for machine_cible in sorted(set(distantes.values())):
+        fin = {"tache": tache, "partitions": [p for p, machine in distantes.items() if machine == machine_cible]}
+        connexions_workers[machine_cible].envoyer(protocole.FIN_SHUFFLE, json.dumps(fin), silencieux=True)
+    for partition, comptes_partition in locales.items():
+        enregistrer_flux(tache, partition, comptes_partition)
 
-def sauvegarder_occurrences():
+
+def trier_resultats(occurrences, mots_repartis, top=None):
     """
-    Sauvegarde le dictionnaire occurrences_mots dans un fichier JSON.
-    Le fichier est nommé "{NOM_MACHINE}_results.json" et placé dans le répertoire courant.
+    Trie les comptes réduits d'une partition par nombre décroissant (puis par ordre
+    alphabétique), pour que le master n'ait qu'à fusionner des suites déjà triées.
+    Avec top, seuls les top premiers mots sont gardés, par un tas borné, sans
+    trier tout le vocabulaire : un mot du top global qui n'a qu'un réducteur
+    est forcément dans le top de ce réducteur.
+    Les mots répartis sur plusieurs réducteurs, dont seul le master connaît le
+    total, sont toujours tous envoyés, à la fin et sans ordre particulier.
+    
+    Args:
+        occurrences (dict): Les comptes réduits de la partition {mot: nombre}.
+        mots_repartis (set): Les mots dont les comptes partiels sont répartis sur plusieurs réducteurs.
+        top (int): Le nombre de mots les plus fréquents demandés par le master, ou None pour tous.
+
+    Returns:
+        list: Les couples (mot, nombre) à envoyer, dans l'ordre.
+    """
+    couples = [(mot, compte) for mot, compte in occurrences.items() if mot not in mots_repartis]
+    if top:
+        couples = heapq.nsmallest(top, couples, key=cle_frequence)
+    else:
+        couples.sort(key=cle_frequence)
+    couples.extend((mot, occurrences[mot]) for mot in mots_repartis if mot in occurrences)
+    return couples
+
+
+def produire_resultats(connexion_master, occurrences, partition, octets_shuffle, mots_repartis, top=None,
+                       mesures=None):
+    """
+    Renvoie au master, sur la connexion de contrôle, les comptes réduits d'une
+    partition triés par trier_resultats, par lots compacts de couples
+    "mot nombre" d'au plus TAILLE_MAX_LOT octets, puis "SAVE OK" avec la
+    partition, le nombre de mots réduits, les octets échangés et les mesures du
+    job. Le master range les lots au fur et à mesure de leur arrivée : il n'a
+    plus besoin de lire de fichier sur un stockage partagé.
+    
+    Générateur piloté par la boucle d'événements, comme produire_shuffle : il
+    rend la main tous les NB_COUPLES_PAR_TRANCHE couples (en produisant False),
+    et tant que le tampon d'envoi vers le master dépasse TAILLE_MAX_TAMPON_ENVOI
+    (en produisant True).
+    
+    Args:
+        connexion_master (Connexion): La connexion avec le master.
+        occurrences (dict): Les comptes réduits de la partition {mot: nombre}.
+        partition (int): L'indice de la partition (celle de ce worker, ou une partition reprise).
+        octets_shuffle (dict): Octets du shuffle envoyés avant et après compression.
+        mots_repartis (set): Les mots dont les comptes partiels sont répartis sur plusieurs réducteurs.
+        top (int): Le nombre de mots les plus fréquents demandés par le master, ou None pour tous.
+        mesures (MesuresJob): Les mesures du job, complétées par la durée de l'envoi des résultats.
+
+    Yields:
+        bool: True si l'envoi attend que le tampon d'envoi se vide.
+    """
+    mesures = mesures or MesuresJob()
+    debut = time.perf_counter()
+    # Octets de ces seuls résultats (plusieurs partitions peuvent être renvoyées sur la même connexion)
+    octets_avant = connexion_master.compresseur.octets_avant
+    octets_apres = connexion_master.compresseur.octets_apres
+    couples = trier_resultats(occurrences, mots_repartis, top)
+    lot = []
+    taille_lot = 0
+    nb_lots = 0
+    for i, (mot, compte) in enumerate(couples, 1):
+        enregistrement = f"{mot} {compte}"
+        lot.append(enregistrement)
+        taille_lot += len(enregistrement.encode('utf-8')) + 1
+        if taille_lot >= TAILLE_MAX_LOT:
+            connexion_master.envoyer(protocole.LOT_RESULTATS, ' '.join(lot), silencieux=True)
+            nb_lots += 1
+            lot = []
+            taille_lot = 0
+            while len(connexion_master.file_envoi) > TAILLE_MAX_TAMPON_ENVOI:
+                yield True
+        if i % NB_COUPLES_PAR_TRANCHE == 0:
+            yield False
+    if lot:
+        connexion_master.envoyer(protocole.LOT_RESULTATS, ' '.join(lot), silencieux=True)
+        nb_lots += 1
+    journal.info(f"{len(couples)} mots de la partition {partition} envoyés au master en {nb_lots} lot(s)")
+
+    octets_resultats = {
+        "avant": connexion_master.compresseur.octets_avant - octets_avant,
+        "apres": connexion_master.compresseur.octets_apres - octets_apres
+    }
+    mesures.compteurs["mots_envoyes_master"] += len(couples)
+    mesures.chronometre.ajouter("envoi_resultats", time.perf_counter() - debut)
+    connexion_master.envoyer(protocole.SAVE_OK, json.dumps({"partition": partition,
+                                                            "nb_mots": len(occurrences),
+                                                            "octets_shuffle": octets_shuffle,
+                                                            "octets_resultats": octets_resultats,
+                                                            "mesures": mesures.vers_dict()}))
+
+
+def sauvegarder_occurrences(format_fichier="json"):
+    """
+    Sauvegarde le dictionnaire occurrences_mots dans un fichier JSON ou dans une
+    table binaire (voir format_resultats.py).
+    Le fichier est nommé "{hote}_{port}_results.json" (ou ".bin") d'après NOM_MACHINE et placé
+    dans le répertoire courant (plusieurs workers d'une même machine peuvent le partager).
+    
+    Args:
+        format_fichier (str): "json" ou "binaire".
     
     Returns:
         str ou None: Le chemin complet du fichier sauvegardé ou None en cas d'erreur.
     """
-    fichier = os.path.join(os.getcwd(), f"{NOM_MACHINE}_results.json")
+    extension = "bin" if format_fichier == "binaire" else "json"
+    fichier = os.path.join(os.getcwd(), f"{NOM_MACHINE.replace(':', '_')}_results.{extension}")
     try:
-        with open(fichier, "w", encoding="utf-8") as f:
-            json.dump(occurrences_mots, f, ensure_ascii=False, indent=4)
-        print(f"'{NOM_MACHINE}' : Dictionnaire des occurrences sauvegardé dans {fichier}")
+        if format_fichier == "binaire":
+            ecrire_table(fichier, occurrences_mots.items())
+        else:
+            with open(fichier, "w", encoding="utf-8") as f:
+                json.dump(occurrences_mots, f, ensure_ascii=False, indent=4)
+        journal.info(f"Dictionnaire des occurrences sauvegardé dans {fichier}")
         return fichier
     except Exception as e:
-        print(f"'{NOM_MACHINE}' : Erreur lors de la sauvegarde du dictionnaire : {e}")
+        journal.error(f"Erreur lors de la sauvegarde du dictionnaire : {e}")
         return None
 
 
 #############################################################
-# FONCTION PRINCIPALE POUR LA COMMUNICATION AVEC LE MASTER
+# BOUCLE D'EVENEMENTS DU WORKER
 #############################################################
 
-def gerer_communication_avec_master(socket_master):
+def gerer_evenements(connexion_master, maillage, comptage_parallele=None, sauvegarde_locale=None):
     """
-    Gère la communication avec le master.
+    Boucle d'événements du worker pour un job : un seul thread multiplexe, avec
+    le sélecteur du maillage, la connexion au master, les connexions entrantes des
+    autres workers (lots du shuffle reçus) et les connexions sortantes (lots du
+    shuffle envoyés). Les connexions vers les autres workers sont établies sans
+    bloquer la boucle (voir Maillage.connecter).
     Répond aux messages du master et exécute les étapes du MapReduce :
-    - Réception de la liste des machines
-    - Réception du SPLIT
-    - Phase MAP/SHUFFLE
-    - Phase SAVE
+    - Réception de la liste des machines et de l'identifiant du job
+    - Réception du SPLIT (un ou plusieurs morceaux de texte, nettoyés par le master ou
+      bruts, ou une plage du fichier d'entrée à lire, terminés par "FIN SPLIT")
+    - Phase MAP/SHUFFLE : "DEBUT JOB" puis les lots sont envoyés à chaque autre worker,
+      et "END MAP SHUFFLE" au master quand tous les lots sont partis
+    - Phase SAVE : après la fin du shuffle de chacun des autres workers, les résultats
+      sont renvoyés au master par lots (voir produire_resultats)
     - Envoie "CONNEXION OK", "RECEPTION MACHINES OK", "RECEPTION SPLIT OK", etc.
+    Avec un groupe de processus de comptage, les morceaux du split sont comptés
+    en parallèle pendant que la boucle continue de recevoir les suivants, et
+    "RECEPTION SPLIT OK" attend la fin de tous les comptages.
+    En mode pipeline (demandé par le master avec MACHINES), le worker n'attend
+    plus les commandes de phase du master : il se connecte aux autres workers
+    dès la réception de MACHINES, lance son shuffle dès que son split est
+    compté, puis renvoie ses résultats dès la fin du shuffle de chacun des
+    autres workers. Les lots reçus du job en cours sont réduits dès leur
+    arrivée. Les réponses au master sont les mêmes, dans le même ordre.
+    
+    Le shuffle est fait de flux, un par tâche map (le split d'un worker,
+    désigné par son indice) et par partition : une partition est réduite quand
+    le flux de chaque tâche est complet ("FIN SHUFFLE"). Avec la spéculation
+    (demandée par le master avec MACHINES), la tâche d'un worker en retard ou
+    défaillant peut être exécutée une seconde fois par un autre worker :
+    - "REENVOI PARTITION" : la partition du worker remplacé est désormais réduite
+      par le worker désigné (ce worker, peut-être) ; ce worker lui renvoie les
+      comptes qu'il a déjà distribués pour elle, et n'attend plus le worker
+      remplacé (voir produire_shuffle) ;
+    - "REPRISE" : ce worker compte le split du worker remplacé, qui suit jusqu'à
+      "FIN SPLIT", et le distribue comme le sien.
+    Seul le premier flux complet de chaque (tâche, partition) est retenu : les
+    lots ne sont alors réduits qu'à la fin de leur flux, et les copies suivantes
+    sont ignorées. Les partitions sont renvoyées au master l'une après l'autre.
+    
+    Tout l'état du job est local à cet appel : seul le maillage (connexions avec
+    les autres workers) est conservé par un worker persistant pour le job suivant.
+    La connexion avec le master est fermée à la fin du job.
+    Les durées des phases, les compteurs et le trafic avec chaque machine sont
+    mesurés (voir mesures.py) et renvoyés au master avec "SAVE OK".
     
     Args:
-        socket_master (socket.socket): Le socket de connexion avec le master.
+        connexion_master (Connexion): La connexion avec le master.
+        maillage (Maillage): Les connexions avec les autres workers et le sélecteur.
+        comptage_parallele (ComptageParallele): Le groupe de processus de comptage, ou None
+                                                pour compter dans le processus du worker.
+        sauvegarde_locale (str): Si "json" ou "binaire", les résultats sont aussi sauvegardés dans
+                                 un fichier du répertoire courant (voir sauvegarder_occurrences).
     """
-    connexions_workers = None
-    list_mots = None
+    global occurrences_mots
+    occurrences_mots = {}
+    selecteur = maillage.selecteur
+    mesures = MesuresJob()
+    chronometre = mesures.chronometre
+    mesures.trafic["master"] = connexion_master.trafic
+    if comptage_parallele is not None:
+        comptage_parallele.nouveau_job()
+        selecteur.register(comptage_parallele.socket_reveil, selectors.EVENT_READ, comptage_parallele)
+
+    connexions_workers = {}
+    # Connexions aux autres workers en cours : la réponse au master attend qu'elles aboutissent
+    attente_maillage = False
+    maillage_complet = False
+    id_job = ""
     machines_reçues = None
-    msg_split = None
+    ports_workers = None
+    description_partitionneur = None
+    compression = None
+    top = None
+    pipeline = False
+    speculation = False
+    fusion_directe = False
+    indice_local = None
+    # Réducteur de chaque partition, et workers abandonnés (partition reprise par un autre)
+    destinations = []
+    abandonnees = set()
+    # Comptes de chaque tâche map exécutée {tâche: Counter}, et partitionneur de chacune
+    sorties_map = {}
+    partitionneurs = {}
+    tache_split = None
+    taches_distribuees = []
+    # Comptes des partitions réduites par ce worker {partition: Counter}, et flux complets reçus {(tâche, partition)}
+    reductions = defaultdict(Counter)
+    flux_recus = set()
+    partitions_a_reduire = []
+    trace_lots_recus = TraceEchantillonnee()
+    trace_doublons = TraceEchantillonnee(niveau=logging.INFO)
 
-    while True:
-        msg_recu = recevoir_message(socket_master)
+    attente_fin_split = False
+    # Comptage parallèle en échec : le split n'est jamais confirmé au master
+    echec_split = False
+    # Split compté avant la fin des connexions aux autres workers (mode pipeline)
+    split_differe = False
+    # Ce worker n'est pas dans la liste des machines : les messages du job sont ignorés
+    machine_inconnue = False
+    envois_shuffle = deque()
+    shuffle = None
+    fin_envoi_shuffle = None
+    shuffle_sature = False
+    envois_resultats = deque()
+    envoi_resultats = None
+    resultats_sature = False
+    attente_fin_shuffle = False
+    # Lots du shuffle perdus vers un worker (connexion en échec), signalés une seule fois
+    lots_perdus = False
+    save_demande = False
+    termine = False
 
-        if msg_recu is None:
-            # Le master a fermé la connexion
-            break
+    def partitionneur_de(tache):
+        if tache not in partitionneurs:
+            partitionneurs[tache] = creer_partitionneur(description_partitionneur, len(machines_reçues), tache)
+        return partitionneurs[tache]
 
-        if msg_recu.startswith("MACHINES : "):
-            msg_machine = msg_recu[11:]
-            machines_reçues = json.loads(msg_machine)
-            envoyer_message(socket_master, "RECEPTION MACHINES OK")
+    def compter_morceau(operation, texte):
+        comptes = sorties_map[tache_split]
+        if operation == protocole.SPLIT:
+            if comptage_parallele is not None:
+                comptage_parallele.soumettre_texte(texte.encode('utf-8'))
+            else:
+                combiner_mots(comptes, texte.split())
 
-        if msg_recu.startswith("SPLIT : "):
-            msg_split = msg_recu[8:]
-            envoyer_message(socket_master, "RECEPTION SPLIT OK")
+        elif operation == protocole.SPLIT_BRUT:
+            # Texte brut : nettoyé ici plutôt que par le master
+            if comptage_parallele is not None:
+                comptage_parallele.soumettre_texte(texte.encode('utf-8'), brut=True)
+            else:
+                combiner_mots(comptes, nettoyer_message(texte))
 
-        if msg_recu == "GO MAP SHUFFLE":
-            connexions_workers = connexion_aux_autres_workers(machines_reçues)
-            if connexions_workers:
-                envoyer_message(socket_master, "CONNEXION WORKERS OK")
+        else:
+            descripteur = json.loads(texte)
+            chemin = resoudre_chemin(descripteur["chemin"])
+            if comptage_parallele is not None:
+                comptage_parallele.soumettre_plage(chemin, descripteur["offset"], descripteur["longueur"])
             else:
-                envoyer_message(socket_master, "CONNEXION WORKERS FAILED")
-
-        if msg_recu == "START MAP SHUFFLE":
-            if msg_split:
-                list_mots = msg_split.split()
-                gerer_communication_entre_workers(connexions_workers, list_mots, machines_reçues)
-            envoyer_message(socket_master, "END MAP SHUFFLE")
-
-        if msg_recu == "SAVE":
-            fichier_sauvegarde = sauvegarder_occurrences()
-            if fichier_sauvegarde:
-                envoyer_message(socket_master, f"SAVE OK : {fichier_sauvegarde}")
-
-        if msg_recu == "END":
-            if connexions_workers:
-                fermer_connexions_workers(connexions_workers)
-            fermer_connexion_master(socket_master)
-            break
+                lire_plage(comptes, chemin, descripteur["offset"], descripteur["longueur"])
+
+    def enregistrer_flux(tache, partition, comptes):
+        # Flux complet d'une tâche pour une partition : seule la première copie est retenue
+        if (tache, partition) in flux_recus:
+            trace_doublons("Flux de la tâche %d pour la partition %d reçu en double : ignoré", tache, partition)
+            return
+        flux_recus.add((tache, partition))
+        if comptes:
+            reductions[partition].update(comptes)
+
+    def traiter_fins(connexion):
+        # Flux d'un autre worker terminés pour ce job
+        for tache, partitions in connexion.fins:
+            for partition in partitions:
+                enregistrer_flux(tache, partition, connexion.flux.pop((tache, partition), None))
+        connexion.fins = []
+
+    def connecter_workers():
+        nonlocal connexions_workers, attente_maillage
+        chronometre.demarrer("connexion_workers")
+        connexions_workers = maillage.connecter(machines_reçues, ports_workers)
+        for machine, connexion in connexions_workers.items():
+            # Nouveaux compteurs : les octets du shuffle sont comptés pour ce job seulement
+            connexion.compresseur = protocole.Compresseur(compression)
+            connexion.trafic = mesures.trafic_avec(machine)
+            # Part dès que la connexion est établie
+            connexion.envoyer(protocole.DEBUT_JOB, json.dumps({"job": id_job, "machine": NOM_MACHINE}),
+                              silencieux=True)
+        attente_maillage = True
+        verifier_maillage()
+
+    def verifier_maillage():
+        # Réponse au master une fois chaque connexion établie ou en échec
+        nonlocal attente_maillage, maillage_complet, split_differe
+        if not attente_maillage or any(connexion.connexion_en_cours for connexion in connexions_workers.values()):
+            return
+        attente_maillage = False
+        chronometre.arreter("connexion_workers")
+        # Sans connexion vers un worker, ses lots du shuffle ne pourraient pas partir : le master abandonne le job
+        manquantes = [machine for machine in machines_reçues
+                      if machine != NOM_MACHINE and machine not in connexions_workers]
+        maillage_complet = not manquantes
+        if maillage_complet:
+            connexion_master.envoyer(protocole.CONNEXION_WORKERS_OK)
+        else:
+            journal.error(f"Workers injoignables : {manquantes}")
+            connexion_master.envoyer(protocole.CONNEXION_WORKERS_FAILED)
+        if split_differe:
+            split_differe = False
+            confirmer_split()
+
+    def distribuer(tache, partitions=None, fin=None):
+        # Shuffle des comptes d'une tâche, mis en file derrière ceux déjà en cours
+        envois_shuffle.append((produire_shuffle(connexions_workers, sorties_map[tache], tache, destinations,
+                                                partitionneur_de(tache), enregistrer_flux, partitions,
+                                                abandonnees), fin))
+
+    def fin_shuffle_local():
+        nonlocal attente_fin_shuffle
+        attente_fin_shuffle = True
+
+    def demarrer_shuffle():
+        chronometre.demarrer("shuffle")
+        comptes_locaux = sorties_map[indice_local]
+        mesures.compteurs["mots_mappes"] = sum(comptes_locaux.values())
+        mesures.compteurs["mots_distincts_mappes"] = len(comptes_locaux)
+        taches_distribuees.append(indice_local)
+        distribuer(indice_local, fin=fin_shuffle_local)
+
+    def confirmer_split():
+        connexion_master.envoyer(protocole.RECEPTION_SPLIT_OK)
+        if pipeline and maillage_complet:
+            demarrer_shuffle()
+
+    def terminer_split():
+        nonlocal tache_split, split_differe
+        if tache_split == indice_local:
+            chronometre.arreter("split")
+            if attente_maillage:
+                # Le master attend la réponse de la connexion aux autres workers avant celle du split
+                split_differe = True
+            else:
+                confirmer_split()
+        else:
+            # Split repris : distribué comme celui de ce worker
+            chronometre.arreter("split_reprise")
+            journal.info(f"Split de la tâche {tache_split} compté : "
+                         f"{len(sorties_map[tache_split])} mots distincts")
+            taches_distribuees.append(tache_split)
+            distribuer(tache_split)
+            tache_split = indice_local
+
+    def reprendre_partition(partition, reducteur):
+        # Partition réduite désormais par reducteur : renvoi des comptes déjà distribués
+        ancien_reducteur = destinations[partition]
+        if ancien_reducteur != NOM_MACHINE:
+            abandonnees.add(ancien_reducteur)
+        destinations[partition] = reducteur
+        for tache in taches_distribuees:
+            distribuer(tache, [partition])
+
+    def demander_save():
+        # Attente de la fin du shuffle des autres workers, puis reduce
+        nonlocal save_demande
+        chronometre.demarrer("attente_shuffle_autres")
+        save_demande = True
+
+    def reduire(partition):
+        global occurrences_mots
+        if partition == indice_local:
+            chronometre.arreter("attente_shuffle_autres")
+            chronometre.demarrer("reduce")
+            occurrences_mots = dict(reductions.pop(partition, {}))
+            chronometre.arreter("reduce")
+            occurrences = occurrences_mots
+            mesures.compteurs["cles_reduites"] = len(occurrences_mots)
+            if sauvegarde_locale:
+                chronometre.demarrer("sauvegarde_locale")
+                sauvegarder_occurrences(sauvegarde_locale)
+                chronometre.arreter("sauvegarde_locale")
+            octets_shuffle = {
+                "avant": sum(c.compresseur.octets_avant for c in connexions_workers.values()),
+                "apres": sum(c.compresseur.octets_apres for c in connexions_workers.values())
+            }
+        else:
+            occurrences = reductions.pop(partition, {})
+            journal.info(f"Partition reprise {partition} réduite : {len(occurrences)} mots")
+            # Les octets du shuffle de ce worker sont comptés avec sa propre partition
+            octets_shuffle = {"avant": 0, "apres": 0}
+        envois_resultats.append(produire_resultats(connexion_master, occurrences, partition, octets_shuffle,
+                                                   partitionneur_de(indice_local).mots_repartis(), top, mesures))
+
+    def traiter_message_master(operation, texte):
+        nonlocal id_job, machines_reçues, ports_workers, description_partitionneur, compression, top, \
+            pipeline, speculation, fusion_directe, indice_local, destinations, tache_split, attente_fin_split, \
+            termine, machine_inconnue
+
+        if machine_inconnue and operation != protocole.END:
+            return
+
+        if operation == protocole.MACHINES:
+            chronometre.demarrer("machines")
+            configuration = json.loads(texte)
+            id_job = configuration.get("job", "")
+            journal.info(f"Début du job {id_job}")
+            machines_reçues = [protocole.normaliser_adresse(machine, PORT_PRINCIPAL)
+                               for machine in configuration["machines"]]
+            if NOM_MACHINE not in machines_reçues:
+                # Par exemple "localhost" d'un côté et "127.0.0.1" de l'autre : le master abandonne le job
+                journal.error(f"{NOM_MACHINE} ne se trouve pas dans la liste des machines {machines_reçues} : "
+                              "--nom doit reprendre l'adresse de ce worker dans machines.txt")
+                chronometre.arreter("machines")
+                connexion_master.envoyer(protocole.MACHINE_INCONNUE, NOM_MACHINE)
+                machine_inconnue = True
+                return
+            ports_workers = configuration.get("ports_workers",
+                                              [protocole.analyser_adresse(machine, PORT_PRINCIPAL)[1] + 1
+                                               for machine in machines_reçues])
+            description_partitionneur = configuration["partitionneur"]
+            indice_local = tache_split = machines_reçues.index(NOM_MACHINE)
+            destinations = list(machines_reçues)
+            sorties_map[indice_local] = Counter()
+            partitions_a_reduire.append(indice_local)
+            compression = configuration.get("compression", {"type": protocole.COMPRESSION_AUCUNE})
+            connexion_master.compresseur.configurer(compression)
+            top = configuration.get("top")
+            pipeline = configuration.get("pipeline", False)
+            speculation = configuration.get("speculation", False)
+            # Sans spéculation, chaque flux n'a qu'une copie : ses lots sont réduits dès leur arrivée
+            fusion_directe = pipeline and not speculation
+            chronometre.arreter("machines")
+            connexion_master.envoyer(protocole.RECEPTION_MACHINES_OK)
+            # Fins de shuffle reçues d'autres workers avant le début de ce job (mode pipeline)
+            for connexion in maillage.entrantes.values():
+                if connexion.id_job == id_job:
+                    traiter_fins(connexion)
+            if pipeline:
+                connecter_workers()
+
+        elif operation in (protocole.SPLIT, protocole.SPLIT_BRUT, protocole.SPLIT_FICHIER):
+            # "split" : de la réception du premier morceau à "RECEPTION SPLIT OK" ;
+            # "map" : temps passé à compter (ou à confier) les morceaux
+            chronometre.demarrer("split" if tache_split == indice_local else "split_reprise")
+            chronometre.demarrer("map")
+            compter_morceau(operation, texte)
+            chronometre.arreter("map")
+
+        elif operation == protocole.FIN_SPLIT:
+            if echec_split:
+                pass
+            elif comptage_parallele is not None and comptage_parallele.nb_taches_en_cours:
+                attente_fin_split = True
+            else:
+                terminer_split()
+
+        elif operation == protocole.GO_MAP_SHUFFLE:
+            connecter_workers()
+
+        elif operation == protocole.START_MAP_SHUFFLE:
+            demarrer_shuffle()
+
+        elif operation == protocole.SAVE:
+            demander_save()
+
+        elif operation == protocole.REPRISE:
+            # Le split qui suit, jusqu'à "FIN SPLIT", est celui de la tâche reprise
+            tache_split = json.loads(texte)["tache"]
+            sorties_map[tache_split] = Counter()
+            journal.info(f"Reprise du split de {machines_reçues[tache_split]}")
+
+        elif operation == protocole.REENVOI_PARTITION:
+            reenvoi = json.loads(texte)
+            partition, reducteur = reenvoi["partition"], reenvoi["reducteur"]
+            if reducteur == NOM_MACHINE:
+                journal.info(f"Reprise de la partition de {machines_reçues[partition]}")
+                partitions_a_reduire.append(partition)
+            else:
+                journal.info(f"Partition de {machines_reçues[partition]} reprise par {reducteur} : "
+                             "renvoi des comptes déjà distribués")
+            reprendre_partition(partition, reducteur)
+
+        elif operation == protocole.END:
+            termine = True
+
+    while not termine:
+        if shuffle is None and envois_shuffle:
+            shuffle, fin_envoi_shuffle = envois_shuffle.popleft()
+        if envoi_resultats is None and envois_resultats:
+            envoi_resultats = envois_resultats.popleft()
+        connexion_master.mettre_a_jour_selecteur(selecteur)
+        for connexion in maillage.connexions():
+            connexion.mettre_a_jour_selecteur(selecteur)
+
+        # Pendant le shuffle et l'envoi des résultats, la boucle ne fait que
+        # consulter les sockets (sauf si elle attend qu'un tampon d'envoi se vide)
+        en_production = ((shuffle is not None and not shuffle_sature)
+                         or (envoi_resultats is not None and not resultats_sature))
+        attente = 0 if en_production else None
+        for cle, evenements in selecteur.select(timeout=attente):
+            if cle.data is None:
+                socket_worker_connexion, worker_address = maillage.socket_workers.accept()
+                journal.info(f"Connexion acceptée d'un worker : {worker_address}")
+                maillage.entrantes[worker_address] = Connexion(socket_worker_connexion, worker_address, "entrant")
+                continue
+
+            if cle.data is comptage_parallele:
+                chronometre.demarrer("map")
+                try:
+                    taches_terminees = comptage_parallele.recuperer(sorties_map[tache_split])
+                except Exception as e:
+                    # Part perdue : le master abandonne le job (ou reprend la tâche de ce worker)
+                    journal.error(f"Echec du comptage d'une part du split : {e}")
+                    if not echec_split:
+                        connexion_master.envoyer(protocole.ECHEC_SPLIT, str(e))
+                    echec_split = True
+                    continue
+                finally:
+                    chronometre.arreter("map")
+                if taches_terminees and attente_fin_split and not echec_split:
+                    attente_fin_split = False
+                    terminer_split()
+                continue
+
+            connexion = cle.data
+            if connexion.connexion_en_cours:
+                if maillage.terminer_connexion(connexion):
+                    connexion.vider()
+                else:
+                    connexions_workers.pop(connexion.nom, None)
+                verifier_maillage()
+                continue
+            if evenements & selectors.EVENT_WRITE:
+                connexion.vider()
+            if not evenements & selectors.EVENT_READ:
+                continue
+
+            messages = connexion.recevoir(silencieux=connexion.role == "entrant")
+            if messages is None:
+                if connexion.role == "master":
+                    # Le master a fermé la connexion
+                    termine = True
+                    break
+                # Connexion fermée par le worker distant : ses flux ne sont retenus
+                # que s'ils ont été terminés par "FIN SHUFFLE" (voir traiter_fins)
+                connexion.fermer(selecteur)
+                del maillage.entrantes[connexion.nom]
+                continue
+
+            for operation, texte, taille_trame in messages:
+                if connexion.role == "master":
+                    traiter_message_master(operation, texte)
+                elif operation == protocole.DEBUT_JOB:
+                    # Les lots qui suivent appartiennent à ce job : ceux d'un job
+                    # abandonné, reçus avant, sont oubliés
+                    debut_job = json.loads(texte)
+                    connexion.id_job = debut_job["job"]
+                    connexion.flux = {}
+                    connexion.fins = []
+                    connexion.trafic = mesures.trafic_avec(debut_job["machine"])
+                elif operation == protocole.LOT_SHUFFLE:
+                    trace_lots_recus("Lot de %d caractères reçu de %s", len(texte), connexion.nom)
+                    tache, partition, lot = texte.split(' ', 2)
+                    flux = (int(tache), int(partition))
+                    if connexion.id_job != id_job:
+                        # Lot reçu avant le début de son job (mode pipeline) : gardé avec son flux
+                        fusionner_comptes(connexion.flux.setdefault(flux, Counter()), lot)
+                    elif flux in flux_recus:
+                        # Copie d'un flux déjà reçu en entier (tâche reprise)
+                        pass
+                    elif fusion_directe:
+                        fusionner_comptes(reductions[flux[1]], lot)
+                    else:
+                        fusionner_comptes(connexion.flux.setdefault(flux, Counter()), lot)
+                elif operation == protocole.FIN_SHUFFLE:
+                    fin = json.loads(texte)
+                    connexion.fins.append((fin["tache"], fin["partitions"]))
+                    if connexion.id_job == id_job:
+                        traiter_fins(connexion)
+                connexion.trafic.reception(taille_trame)
+
+        if shuffle is not None:
+            debut_tranche = time.perf_counter()
+            try:
+                shuffle_sature = next(shuffle)
+                chronometre.ajouter("shuffle_production", time.perf_counter() - debut_tranche)
+            except StopIteration:
+                shuffle = None
+                shuffle_sature = False
+                if fin_envoi_shuffle is not None:
+                    fin_envoi_shuffle()
+
+        # Lots perdus vers un worker encore attendu : le shuffle ne peut pas être déclaré terminé.
+        # Avec la spéculation, le master finit par reprendre la partition de ce worker (qui
+        # n'est alors plus attendu) ou par déclarer celui-ci défaillant ; sinon, il abandonne le job.
+        perdues = [machine for machine, connexion in connexions_workers.items()
+                   if connexion.en_echec and machine not in abandonnees]
+        if perdues and not lots_perdus:
+            journal.error(f"Lots du shuffle perdus vers : {perdues}")
+            if not speculation:
+                connexion_master.envoyer(protocole.CONNEXION_WORKERS_FAILED)
+            lots_perdus = True
+
+        # Le worker remplacé n'est plus attendu : ses lots partiront s'il se réveille
+        if attente_fin_shuffle and not perdues and all(not connexion.file_envoi
+                                                       for machine, connexion in connexions_workers.items()
+                                                       if machine not in abandonnees):
+            chronometre.arreter("shuffle")
+            connexion_master.envoyer(protocole.END_MAP_SHUFFLE)
+            attente_fin_shuffle = False
+            if pipeline:
+                demander_save()
+
+        # Une partition est réduite quand le flux de chaque tâche est complet
+        for partition in list(partitions_a_reduire):
+            if partition == indice_local and not save_demande:
+                continue
+            if all((tache, partition) in flux_recus for tache in range(len(machines_reçues))):
+                partitions_a_reduire.remove(partition)
+                if partition == indice_local:
+                    save_demande = False
+                reduire(partition)
+
+        if envoi_resultats is not None:
+            try:
+                resultats_sature = next(envoi_resultats)
+            except StopIteration:
+                envoi_resultats = None
+                resultats_sature = False
+
+    fermer_connexion_master(connexion_master, selecteur)
+    if comptage_parallele is not None:
+        selecteur.unregister(comptage_parallele.socket_reveil)
+    journal.info(f"Fin du job {id_job}")
 
 
 ###################################################
 # SCRIPT PRINCIPAL
 ###################################################
 
-# Connexion au master
-socket_master = connexion_au_master()
-socket_master_connexion, master_address = socket_master.accept()
-print(f"'{NOM_MACHINE}' : Connexion acceptée du master : {master_address}")
+parser = argparse.ArgumentParser(description="Worker du MapReduce de comptage de mots.")
+parser.add_argument("--nom", default=socket.gethostname(),
+                    help="Nom ou adresse de cette machine, tel qu'écrit dans machines.txt "
+                         "(défaut : nom d'hôte).")
+parser.add_argument("--port", type=int, default=PORT_PRINCIPAL,
+                    help=f"Port sur lequel le worker attend le master (défaut : {PORT_PRINCIPAL}).")
+parser.add_argument("--port-workers", type=int, default=None,
+                    help="Port sur lequel le worker attend les autres workers (défaut : --port + 1).")
+parser.add_argument("--sauvegarde-locale", nargs="?", const="json", choices=["json", "binaire"], default=None,
+                    help="Sauvegarde aussi les résultats du worker dans un fichier local, JSON (défaut) ou "
+                         "table binaire (ils sont dans tous les cas renvoyés au master).")
+parser.add_argument("--processus", type=int, default=1,
+                    help="Nombre de processus comptant le split en parallèle sur cette machine "
+                         "(défaut : 1, comptage dans le processus du worker).")
+parser.add_argument("--niveau-journal", choices=list(NIVEAUX), default=NIVEAU_DEFAUT,
+                    help=f"Niveau des messages affichés (défaut : {NIVEAU_DEFAUT}) ; debug trace chaque trame "
+                         "et un échantillon des lots et des mots du shuffle.")
+parser.add_argument("--persistant", action="store_true",
+                    help="Après la fin d'un job, attend le master du job suivant au lieu de s'arrêter, "
+                         "en gardant ouvertes les connexions avec les autres workers.")
+args = parser.parse_args()
+port_workers = args.port_workers if args.port_workers is not None else args.port + 1
 
-# Connexion aux autres workers
-socket_workers = connexion_aux_workers()
-connexions_workers = {}
-thread_accept = threading.Thread(target=accepter_connexions_workers,
-                                 args=(socket_workers, connexions_workers))
-thread_accept.start()
+# Identité du worker : son adresse "hote:port" dans machines.txt
+NOM_MACHINE = protocole.normaliser_adresse(args.nom, args.port)
 
-# Une fois prêt, envoi de "CONNEXION OK" au master
-envoyer_message(socket_master_connexion, "CONNEXION OK")
+# Groupe de processus de comptage, créé avant toute connexion
+comptage_parallele = ComptageParallele(args.processus) if args.processus > 1 else None
 
-# Gérer la communication avec le master
-gerer_communication_avec_master(socket_master_connexion)
+# Journal (après la création des processus de comptage, car il utilise un thread d'écriture)
+configurer_journal(f"'{NOM_MACHINE}' : ", args.niveau_journal)
 
-# Attendre la fin de l'acceptation des connexions des autres workers
-thread_accept.join()
+# Ecoute du master et des autres workers
+socket_master = connexion_au_master(args.port)
+maillage = Maillage(connexion_aux_workers(port_workers))
+
+try:
+    while True:
+        socket_master_connexion, master_address = socket_master.accept()
+        journal.info(f"Connexion acceptée du master : {master_address}")
+
+        # Une fois prêt, envoi de "CONNEXION OK" au master
+        connexion_master = Connexion(socket_master_connexion, "master", "master")
+        # (avec les codecs de compression gérés, pour la négociation, et le port d'écoute des autres workers)
+        connexion_master.envoyer(protocole.CONNEXION_OK, json.dumps({"compressions": sorted(protocole.CODECS),
+                                                                     "port_workers": port_workers}))
+
+        # Boucle d'événements du job : master et autres workers
+        gerer_evenements(connexion_master, maillage, comptage_parallele, args.sauvegarde_locale)
+
+        if not args.persistant:
+            break
+        journal.info(f"En attente du job suivant sur le port {args.port}.")
+finally:
+    maillage.fermer()
+    socket_master.close()
+    if comptage_parallele is not None:
+        comptage_parallele.fermer()
 
-print(f"'{NOM_MACHINE}' : END OF THE SCRIPT")
+journal.info("END OF THE SCRIPT")
@@ -0,0 +1,69 @@
+import re
+
+# Module partagé entre le master et les workers.
+# Nettoyage du texte et découpage en mots, identique quel que soit l'endroit
+# où il est exécuté (master ou worker).
+# Chaque étape est un seul passage sur tout le texte, fait en C (lower,
+# replace, re.sub, split) : aucune boucle Python par mot.
+
+# Blancs ASCII sur lesquels on peut couper un texte encodé en UTF-8 sans
+# couper ni un mot ni un caractère
+BLANCS = (b' ', b'\n', b'\t', b'\r')
+BLANCS_TEXTE = tuple(blanc.decode('ascii') for blanc in BLANCS)
+
+# Taille des blocs de texte nettoyés à la fois par iterer_mots
+TAILLE_BLOC_TOKENISATION = 1024 * 1024  # en caractères
+
+# Caractères supprimés : tout sauf lettres, chiffres, apostrophe, blancs, accents
+MOTIF_CARACTERES_INTERDITS = re.compile(r"[^a-z0-9'\sàâäéèêëïîôöùûüç]")
+
+# Contractions françaises (l', j', c', d', m', t', s', n', qu') en début de mot
+# et suivies d'au moins un caractère : un espace est inséré après l'apostrophe.
+# Le motif commence par l'apostrophe pour que la recherche saute directement
+# d'une apostrophe à la suivante ; le début de mot est vérifié en arrière.
+MOTIF_CONTRACTION = re.compile(r"'(?=\S)(?:(?<=(?<!\S)[ljcdmtsn]')|(?<=(?<!\S)qu'))")
+
+
+def nettoyer_message(big_msg):
+    """
+    Nettoie le message et le découpe en mots individuels.
+    Gère la normalisation du texte, la suppression de certains caractères
+    et la séparation des contractions françaises.
+
+    Args:
+        big_msg (str): Le texte à traiter.
+
+    Returns:
+        list: Liste des mots nettoyés.
+    """
+    big_msg_clean = big_msg.lower().replace('’', "'")
+    big_msg_clean = MOTIF_CARACTERES_INTERDITS.sub('', big_msg_clean)
+    return MOTIF_CONTRACTION.sub("' ", big_msg_clean).split()
+
+
+def iterer_mots(texte, taille_bloc=TAILLE_BLOC_TOKENISATION):
+    """
+    Version en flux de nettoyer_message : le texte est nettoyé par blocs
+    d'environ taille_bloc caractères coupés sur un blanc, ce qui borne la
+    mémoire des copies intermédiaires. Produit les mêmes mots, dans le même ordre.
+
+    Args:
+        texte (str): Le texte à traiter.
+        taille_bloc (int): La taille approximative d'un bloc, en caractères.
+
+    Yields:
+        str: Les mots nettoyés successifs.
+    """
+    debut = 0
+    while debut < len(texte):
+        fin = debut + taille_bloc
+        if fin < len(texte):
+            coupure = max(texte.rfind(blanc, debut, fin) for blanc in BLANCS_TEXTE)
+            if coupure >= debut:
+                fin = coupure + 1
+            else:
+                # Mot plus long qu'un bloc : on le prolonge jusqu'au blanc suivant
+                suivants = [i for i in (texte.find(blanc, fin) for blanc in BLANCS_TEXTE) if i >= 0]
+                fin = min(suivants) + 1 if suivants else len(texte)
+        yield from nettoyer_message(texte[debut:fin])
+        debut = fin
@@ -0,0 +1,601 @@
+import argparse
+import json
+import math
+import os
+import random
+import shlex
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import accumulate
+
+# Modules partagés avec les workers
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "dossierAdeployer"))
+from format_resultats import TableMots
+
+# Banc d'essai local de la loi d'Amdahl : génère un corpus synthétique, lance
+# sur cette machine le master séquentiel (référence) puis le master et N workers
+# pour chaque valeur de N demandée, répète chaque mesure, et calcule médiane,
+# 95e centile, speed-up, efficacité et fraction séquentielle (loi d'Amdahl
+# ajustée aux mesures). Peut comparer les médianes à une référence enregistrée
+# et échouer en cas de régression.
+# Chaque exécution a lieu dans un dossier de travail à part : le
+# resultats_amdahl.json du projet n'est pas modifié.
+
+DOSSIER_PROJET = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_MASTER = os.path.join(DOSSIER_PROJET, "script_master.py")
+SCRIPT_MASTER_SEQUENTIEL = os.path.join(DOSSIER_PROJET, "script_master_sequentiel.py")
+SCRIPT_WORKER = os.path.join(DOSSIER_PROJET, "dossierAdeployer", "script_worker.py")
+
+# Fichiers lus et écrits par les masters dans leur répertoire courant
+FICHIER_MACHINES = "machines.txt"
+FICHIER_MESSAGE = "input_message.txt"
+FICHIER_RESULTATS = "final_aggregated_results.json"
+FICHIER_RESULTATS_BINAIRE = "final_aggregated_results.bin"
+FICHIER_RESULTATS_AMDAHL = "resultats_amdahl.json"
+
+FICHIER_SORTIE = "resultats_benchmark.json"
+FICHIER_GRAPHIQUE = "loi_amdahl.png"
+
+# Lancement et arrêt des workers
+DELAI_DEMARRAGE_WORKER = 30  # en secondes
+DELAI_ARRET_WORKER = 10  # en secondes
+DELAI_MAX_EXECUTION = 600  # en secondes, par exécution d'un master
+
+# Corpus synthétique : les mots les plus fréquents du français, puis des mots
+# formés de syllabes, avec des contractions, de la ponctuation et des majuscules
+# pour exercer tout le nettoyage du texte
+MOTS_FREQUENTS = ["de", "la", "le", "et", "les", "des", "en", "un", "du", "une", "que", "est", "pour",
+                  "qui", "dans", "a", "par", "plus", "pas", "au", "sur", "ne", "se", "ce", "il", "sont",
+                  "avec", "son", "elle", "à", "ou", "mais", "été", "où", "très", "même", "après"]
+CONSONNES = ["b", "c", "d", "f", "g", "j", "l", "m", "n", "p", "qu", "r", "s", "t", "v", "ch", "gn", "tr", "pr"]
+VOYELLES = ["a", "e", "i", "o", "u", "é", "è", "ê", "à", "ou", "ai", "au", "eu", "on", "an", "in", "oi"]
+FINALES = ["", "", "", "s", "t", "r", "x", "nt", "ment", "tion", "ée", "ç"]
+CONTRACTIONS = ["l'", "d'", "qu'", "n'", "s'", "l’", "d’"]
+PONCTUATION = [",", ",", ".", ".", ";", ":", "!", "?"]
+NB_MOTS_PAR_TRANCHE = 20000
+NB_MOTS_PAR_LIGNE = 12
+
+
+###################################################
+# CORPUS SYNTHETIQUE
+###################################################
+
+def lire_taille(texte):
+    """
+    Args:
+        texte (str): Une taille en octets, éventuellement suivie de K, M ou G ("20M").
+
+    Returns:
+        int: La taille en octets.
+    """
+    multiplicateurs = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    texte = texte.strip().upper()
+    if texte and texte[-1] in multiplicateurs:
+        return int(float(texte[:-1]) * multiplicateurs[texte[-1]])
+    return int(texte)
+
+
+def generer_vocabulaire(taille_vocabulaire, generateur):
+    """
+    Returns:
+        list: taille_vocabulaire mots distincts, du plus fréquent au plus rare
+              (les mots fréquents du français d'abord).
+    """
+    vocabulaire = list(MOTS_FREQUENTS[:taille_vocabulaire])
+    deja_vus = set(vocabulaire)
+    while len(vocabulaire) < taille_vocabulaire:
+        nb_syllabes = generateur.choice((1, 2, 2, 3, 3, 4))
+        mot = ''.join(generateur.choice(CONSONNES) + generateur.choice(VOYELLES) for _ in range(nb_syllabes))
+        mot += generateur.choice(FINALES)
+        if mot not in deja_vus:
+            deja_vus.add(mot)
+            vocabulaire.append(mot)
+    return vocabulaire
+
+
+def generer_corpus(chemin_fichier, taille_octets, exposant_zipf, taille_vocabulaire, graine):
+    """
+    Ecrit un texte synthétique d'aspect français dont les fréquences de mots
+    suivent une loi de Zipf : le mot de rang r apparaît avec une probabilité
+    proportionnelle à 1 / r ** exposant_zipf. Le texte est le même pour les
+    mêmes paramètres (générateur initialisé par graine).
+
+    Args:
+        chemin_fichier (str): Le fichier à écrire.
+        taille_octets (int): La taille approximative du fichier.
+        exposant_zipf (float): L'exposant de la loi de Zipf (plus il est grand, plus
+                               les mots fréquents dominent).
+        taille_vocabulaire (int): Le nombre de mots distincts possibles.
+        graine (int): La graine du générateur aléatoire.
+
+    Returns:
+        int: La taille du fichier écrit, en octets.
+    """
+    generateur = random.Random(graine)
+    vocabulaire = generer_vocabulaire(taille_vocabulaire, generateur)
+    poids_cumules = list(accumulate(1 / rang ** exposant_zipf for rang in range(1, taille_vocabulaire + 1)))
+    taille_ecrite = 0
+    debut_phrase = True
+    with open(chemin_fichier, "w", encoding="utf-8") as f:
+        while taille_ecrite < taille_octets:
+            mots = generateur.choices(vocabulaire, cum_weights=poids_cumules, k=NB_MOTS_PAR_TRANCHE)
+            morceaux = []
+            for i, mot in enumerate(mots):
+                if mot[0] in "aeiouéèêào" and generateur.random() < 0.15:
+                    mot = generateur.choice(CONTRACTIONS) + mot
+                if debut_phrase:
+                    mot = mot.capitalize()
+                    debut_phrase = False
+                if generateur.random() < 0.08:
+                    ponctuation = generateur.choice(PONCTUATION)
+                    mot += ponctuation
+                    debut_phrase = ponctuation in ".!?"
+                morceaux.append(mot)
+                morceaux.append("\n" if (i + 1) % NB_MOTS_PAR_LIGNE == 0 else " ")
+            tranche = ''.join(morceaux)
+            f.write(tranche)
+            taille_ecrite += len(tranche.encode('utf-8'))
+    return taille_ecrite
+
+
+###################################################
+# LANCEMENT DES WORKERS ET DES MASTERS
+###################################################
+
+def port_en_ecoute(port):
+    """
+    Args:
+        port (int): Un port TCP local.
+
+    Returns:
+        bool ou None: True si un socket écoute sur ce port, None si on ne peut pas le savoir
+                      (pas de /proc/net/tcp, hors Linux).
+    """
+    trouve = None
+    for chemin in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(chemin, "r") as f:
+                lignes = f.read().splitlines()[1:]
+        except OSError:
+            continue
+        trouve = trouve or False
+        for ligne in lignes:
+            champs = ligne.split()
+            # Etat 0A : LISTEN
+            if champs[3] == "0A" and int(champs[1].rsplit(':', 1)[1], 16) == port:
+                return True
+    return trouve
+
+
+def lancer_workers(dossier, nb_workers, port_base, options_worker):
+    """
+    Lance nb_workers workers sur cette machine, sur les ports port_base + 2 * i
+    (le port suivant servant aux connexions entre workers), écrit machines.txt
+    et attend que chaque worker écoute sur ses deux ports.
+
+    Args:
+        dossier (str): Le dossier de travail (répertoire courant des workers).
+        nb_workers (int): Le nombre de workers.
+        port_base (int): Le port du premier worker.
+        options_worker (list): Options supplémentaires de script_worker.py.
+
+    Returns:
+        list: Les processus des workers.
+    """
+    processus = []
+    adresses = []
+    for i in range(nb_workers):
+        port = port_base + 2 * i
+        adresses.append(f"localhost:{port}")
+        with open(os.path.join(dossier, f"worker_{port}.log"), "w") as journal:
+            processus.append(subprocess.Popen(
+                [sys.executable, SCRIPT_WORKER, "--nom", "localhost", "--port", str(port)] + options_worker,
+                cwd=dossier, stdout=journal, stderr=subprocess.STDOUT, start_new_session=True))
+    with open(os.path.join(dossier, FICHIER_MACHINES), "w") as f:
+        f.write('\n'.join(adresses) + '\n')
+
+    echeance = time.perf_counter() + DELAI_DEMARRAGE_WORKER
+    for i, worker in enumerate(processus):
+        port = port_base + 2 * i
+        while True:
+            if worker.poll() is not None:
+                arreter_workers(processus)
+                raise RuntimeError(f"Le worker du port {port} s'est arrêté au démarrage "
+                                   f"(voir {os.path.join(dossier, f'worker_{port}.log')})")
+            pret = port_en_ecoute(port + 1)
+            if pret is None:
+                # Impossible de le vérifier : on laisse au worker le temps de démarrer
+                time.sleep(2)
+                break
+            if pret:
+                break
+            if time.perf_counter() > echeance:
+                arreter_workers(processus)
+                raise RuntimeError(f"Le worker du port {port} n'écoute pas après {DELAI_DEMARRAGE_WORKER} s")
+            time.sleep(0.05)
+    return processus
+
+
+def arreter_workers(processus, attendre_fin=False):
+    """
+    Arrête les workers : ils s'arrêtent d'eux-mêmes à la fin d'un job (attendre_fin),
+    sinon (workers persistants) ils reçoivent SIGINT, comme un Ctrl-C. Un worker
+    encore actif après DELAI_ARRET_WORKER secondes est tué avec ses processus de comptage.
+
+    Args:
+        processus (list): Les processus des workers.
+        attendre_fin (bool): Si True, les workers ont reçu END et doivent s'arrêter seuls.
+    """
+    if not attendre_fin:
+        for worker in processus:
+            if worker.poll() is None:
+                worker.send_signal(signal.SIGINT)
+    for worker in processus:
+        try:
+            worker.wait(timeout=DELAI_ARRET_WORKER)
+        except subprocess.TimeoutExpired:
+            os.killpg(worker.pid, signal.SIGKILL)
+            worker.wait()
+
+
+def executer_master(dossier, commande, cle_resultat):
+    """
+    Exécute un master dans le dossier de travail et lit la mesure qu'il a
+    enregistrée dans resultats_amdahl.json (le fichier est ensuite supprimé
+    pour que chaque mesure soit lue seule). Les fichiers de résultats de
+    l'exécution précédente sont supprimés avant : un master qui n'écrit rien
+    ne peut pas être vérifié avec les résultats d'un autre.
+
+    Args:
+        dossier (str): Le dossier de travail.
+        commande (list): La commande du master.
+        cle_resultat (str): La clé de la mesure dans resultats_amdahl.json.
+
+    Returns:
+        dict: La mesure du master (elapsed_time, mesures...).
+    """
+    for fichier in (FICHIER_RESULTATS, FICHIER_RESULTATS_BINAIRE):
+        if os.path.exists(os.path.join(dossier, fichier)):
+            os.remove(os.path.join(dossier, fichier))
+    with open(os.path.join(dossier, "master.log"), "w") as journal:
+        retour = subprocess.run(commande, cwd=dossier, stdout=journal, stderr=subprocess.STDOUT,
+                                timeout=DELAI_MAX_EXECUTION)
+    chemin_amdahl = os.path.join(dossier, FICHIER_RESULTATS_AMDAHL)
+    if retour.returncode != 0 or not os.path.exists(chemin_amdahl):
+        raise RuntimeError(f"Echec du master (code {retour.returncode}, voir {os.path.join(dossier, 'master.log')})")
+    with open(chemin_amdahl, "r", encoding="utf-8") as f:
+        mesure = json.load(f)[cle_resultat]
+    os.remove(chemin_amdahl)
+    return mesure
+
+
+def lire_format(options_master):
+    """
+    Args:
+        options_master (list): Les options passées à script_master.py.
+
+    Returns:
+        str: Le format du fichier de résultats demandé au master, "json" ou "binaire".
+    """
+    lecteur = argparse.ArgumentParser(add_help=False)
+    lecteur.add_argument("--format", default="json")
+    return lecteur.parse_known_args(options_master)[0].format
+
+
+def verifier_resultats(dossier, reference, format_fichier="json"):
+    """
+    Vérifie que le fichier de résultats du dernier master est identique à
+    celui du master séquentiel.
+
+    Args:
+        dossier (str): Le dossier de travail.
+        reference (dict): Les comptes du master séquentiel {mot: nombre}.
+        format_fichier (str): Le format demandé au master, "json" ou "binaire"
+                              (table lue par format_resultats.TableMots).
+    """
+    if format_fichier == "binaire":
+        with TableMots(os.path.join(dossier, FICHIER_RESULTATS_BINAIRE)) as table:
+            resultats = dict(table.items())
+    else:
+        with open(os.path.join(dossier, FICHIER_RESULTATS), "r", encoding="utf-8") as f:
+            resultats = json.load(f)
+    if resultats != reference:
+        raise RuntimeError(f"Résultats différents de la référence séquentielle ({len(resultats)} mots "
+                           f"contre {len(reference)}, voir {os.path.join(dossier, 'master.log')})")
+
+
+###################################################
+# STATISTIQUES
+###################################################
+
+def centile(valeurs, rang):
+    """
+    Args:
+        valeurs (list): Les mesures.
+        rang (float): Le centile demandé, entre 0 et 100.
+
+    Returns:
+        float: La plus petite mesure supérieure ou égale à rang % des mesures (méthode du rang le plus proche).
+    """
+    valeurs = sorted(valeurs)
+    return valeurs[max(0, math.ceil(rang / 100 * len(valeurs)) - 1)]
+
+
+def ajuster_amdahl(medianes):
+    """
+    Ajuste aux mesures le modèle d'Amdahl T(n) = a + b / n (a : partie
+    séquentielle, b : partie parallélisable sur n workers) par moindres carrés.
+
+    Args:
+        medianes (dict): Les temps médians {nombre de workers: secondes}.
+
+    Returns:
+        tuple: (a, b, fraction séquentielle a / (a + b)), ou None s'il y a moins de deux points.
+    """
+    if len(medianes) < 2:
+        return None
+    xs = [1 / n for n in medianes]
+    ys = list(medianes.values())
+    moyenne_x = sum(xs) / len(xs)
+    moyenne_y = sum(ys) / len(ys)
+    variance_x = sum((x - moyenne_x) ** 2 for x in xs)
+    b = sum((x - moyenne_x) * (y - moyenne_y) for x, y in zip(xs, ys)) / variance_x
+    a = moyenne_y - b * moyenne_x
+    # Un temps qui augmente avec n donne b < 0 : rien n'est parallélisable
+    a, b = (max(a, 0.0), max(b, 0.0)) if b > 0 else (moyenne_y, 0.0)
+    return a, b, a / (a + b) if a + b else 1.0
+
+
+def resumer_point(mesures):
+    """
+    Returns:
+        dict: Médiane et 95e centile des temps mesurés, et médiane de chaque phase
+              du master et de la phase la plus longue des workers (voir mesures.py).
+    """
+    temps = [mesure["elapsed_time"] for mesure in mesures]
+    resume = {"mediane": statistics.median(temps), "p95": centile(temps, 95), "temps": temps}
+    phases_master = {}
+    phases_workers = {}
+    for mesure in mesures:
+        detail = mesure.get("mesures") or {}
+        for phase, duree in detail.get("master", {}).get("phases", {}).items():
+            phases_master.setdefault(phase, []).append(duree)
+        for phase, stats in detail.get("resume_workers", {}).get("phases", {}).items():
+            phases_workers.setdefault(phase, []).append(stats["max"])
+    if phases_master:
+        resume["phases_master"] = {phase: statistics.median(d) for phase, d in phases_master.items()}
+    if phases_workers:
+        resume["phases_workers_max"] = {phase: statistics.median(d) for phase, d in phases_workers.items()}
+    return resume
+
+
+###################################################
+# GRAPHIQUE ET REFERENCE
+###################################################
+
+def tracer_graphique(chemin_fichier, points, temps_sequentiel, ajustement):
+    """
+    Trace le speed-up mesuré en fonction du nombre de workers, le speed-up
+    idéal et la courbe d'Amdahl ajustée. matplotlib est facultatif : sans lui,
+    le graphique n'est pas généré.
+
+    Args:
+        chemin_fichier (str): L'image à écrire.
+        points (dict): Les résumés {nombre de workers: résumé}.
+        temps_sequentiel (float): Le temps médian du master séquentiel.
+        ajustement (tuple): (a, b, fraction séquentielle), ou None.
+    """
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("[Benchmark] matplotlib n'est pas installé : graphique non généré.")
+        return
+    nombres = sorted(points)
+    figure, axe = plt.subplots(figsize=(7, 5))
+    axe.plot(nombres, [temps_sequentiel / points[n]["mediane"] for n in nombres], "o-", label="Speed-up mesuré")
+    axe.plot(nombres, nombres, "--", color="grey", label="Speed-up idéal")
+    if ajustement is not None:
+        a, b, fraction = ajustement
+        abscisses = [1 + i * (nombres[-1] - 1) / 100 for i in range(101)]
+        axe.plot(abscisses, [temps_sequentiel / (a + b / n) for n in abscisses],
+                 label=f"Amdahl ajusté (fraction séquentielle {fraction:.2f})")
+    axe.set_xlabel("Nombre de workers")
+    axe.set_ylabel("Speed-up (par rapport au master séquentiel)")
+    axe.set_title("Loi d'Amdahl")
+    axe.legend()
+    axe.grid(True)
+    figure.savefig(chemin_fichier, dpi=100, bbox_inches="tight")
+    plt.close(figure)
+    print(f"[Benchmark] Graphique enregistré dans {os.path.abspath(chemin_fichier)}")
+
+
+def comparer_a_la_reference(rapport, chemin_reference, tolerance):
+    """
+    Compare les temps médians à ceux d'une référence enregistrée (même format
+    que le rapport).
+
+    Args:
+        rapport (dict): Le rapport du banc d'essai.
+        chemin_reference (str): Le fichier de référence.
+        tolerance (float): L'augmentation relative admise (0.2 : 20 %).
+
+    Returns:
+        list: Les messages décrivant chaque régression (vide s'il n'y en a pas).
+    """
+    with open(chemin_reference, "r", encoding="utf-8") as f:
+        reference = json.load(f)
+    if reference.get("corpus") != rapport["corpus"]:
+        print("[Benchmark] Attention : la référence a été mesurée sur un autre corpus.")
+    regressions = []
+    comparaisons = [("séquentiel", reference.get("sequentiel"), rapport["sequentiel"])]
+    comparaisons += [(f"{n} worker(s)", reference.get("points", {}).get(n), point)
+                     for n, point in rapport["points"].items()]
+    for nom, point_reference, point in comparaisons:
+        if point_reference is None:
+            continue
+        limite = point_reference["mediane"] * (1 + tolerance)
+        if point["mediane"] > limite:
+            regressions.append(f"{nom} : {point['mediane']:.3f} s contre {point_reference['mediane']:.3f} s "
+                               f"en référence (limite {limite:.3f} s)")
+    return regressions
+
+
+###################################################
+# SCRIPT PRINCIPAL
+###################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banc d'essai local de la loi d'Amdahl (master et workers "
+                                                 "sur cette machine, corpus synthétique).")
+    parser.add_argument("--taille", default="20M",
+                        help="Taille du corpus généré, avec suffixe K, M ou G (défaut : 20M).")
+    parser.add_argument("--zipf", type=float, default=1.1,
+                        help="Exposant de la loi de Zipf des fréquences de mots (défaut : 1.1).")
+    parser.add_argument("--vocabulaire", type=int, default=100000,
+                        help="Nombre de mots distincts du corpus (défaut : 100000).")
+    parser.add_argument("--graine", type=int, default=0,
+                        help="Graine du générateur : même graine, même corpus (défaut : 0).")
+    parser.add_argument("--corpus", default=None,
+                        help="Fichier texte à utiliser au lieu d'un corpus généré.")
+    parser.add_argument("--workers", default="1,2,4",
+                        help="Nombres de workers à mesurer, séparés par des virgules (défaut : 1,2,4).")
+    parser.add_argument("--repetitions", type=int, default=5,
+                        help="Nombre de mesures par point (défaut : 5).")
+    parser.add_argument("--echauffement", type=int, default=1,
+                        help="Nombre d'exécutions non mesurées avant chaque point (défaut : 1).")
+    parser.add_argument("--port-base", type=int, default=5000,
+                        help="Port du premier worker ; les suivants sont espacés de 2 (défaut : 5000).")
+    parser.add_argument("--persistant", action="store_true",
+                        help="Lance les workers une fois par point (--persistant des workers) au lieu "
+                             "d'une fois par exécution.")
+    # La valeur commence par "--" : elle doit suivre un "=" (sinon argparse la prend pour une option)
+    parser.add_argument("--options-master", default="",
+                        help="Options passées à script_master.py, après un \"=\", "
+                             "ex. --options-master=\"--split brut --compression zlib\".")
+    parser.add_argument("--options-worker", default="",
+                        help="Options passées à script_worker.py, après un \"=\", "
+                             "ex. --options-worker=\"--processus 2\".")
+    parser.add_argument("--sortie", default=FICHIER_SORTIE,
+                        help=f"Rapport JSON écrit à la fin (défaut : {FICHIER_SORTIE}).")
+    parser.add_argument("--graphique", default=os.path.join(DOSSIER_PROJET, FICHIER_GRAPHIQUE),
+                        help=f"Image du speed-up et de la loi d'Amdahl ajustée (défaut : {FICHIER_GRAPHIQUE} "
+                             "du projet ; nécessite matplotlib).")
+    parser.add_argument("--reference", default=None,
+                        help="Rapport de référence : échec si une médiane le dépasse de plus de --tolerance.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Augmentation relative admise par rapport à la référence (défaut : 0.2).")
+    parser.add_argument("--enregistrer-reference", default=None,
+                        help="Enregistre aussi le rapport dans ce fichier, comme future référence.")
+    parser.add_argument("--dossier", default=None,
+                        help="Dossier de travail, conservé à la fin (défaut : dossier temporaire supprimé "
+                             "si tout s'est bien passé).")
+    args = parser.parse_args()
+    nombres_workers = sorted({int(n) for n in args.workers.split(",") if n.strip()})
+    if not nombres_workers or nombres_workers[0] < 1:
+        parser.error("--workers doit contenir des nombres supérieurs ou égaux à 1")
+    if args.repetitions < 1:
+        parser.error("--repetitions doit être supérieur ou égal à 1")
+    options_master = shlex.split(args.options_master)
+    format_fichier = lire_format(options_master)
+    options_worker = shlex.split(args.options_worker) + (["--persistant"] if args.persistant else [])
+
+    dossier = args.dossier or tempfile.mkdtemp(prefix="benchmark_mapreduce_")
+    os.makedirs(dossier, exist_ok=True)
+    print(f"[Benchmark] Dossier de travail : {dossier}")
+
+    # Corpus
+    chemin_corpus = os.path.join(dossier, FICHIER_MESSAGE)
+    if args.corpus:
+        shutil.copyfile(args.corpus, chemin_corpus)
+        corpus = {"fichier": os.path.abspath(args.corpus), "taille": os.path.getsize(chemin_corpus)}
+    else:
+        debut = time.perf_counter()
+        taille = generer_corpus(chemin_corpus, lire_taille(args.taille), args.zipf, args.vocabulaire, args.graine)
+        corpus = {"taille": lire_taille(args.taille), "zipf": args.zipf, "vocabulaire": args.vocabulaire,
+                  "graine": args.graine}
+        print(f"[Benchmark] Corpus de {taille} octets généré en {time.perf_counter() - debut:.1f} s")
+
+    # Référence : master séquentiel (clé "1" de resultats_amdahl.json)
+    commande_sequentielle = [sys.executable, SCRIPT_MASTER_SEQUENTIEL]
+    for _ in range(args.echauffement):
+        executer_master(dossier, commande_sequentielle, "1")
+    mesures_sequentielles = [executer_master(dossier, commande_sequentielle, "1") for _ in range(args.repetitions)]
+    with open(os.path.join(dossier, FICHIER_RESULTATS), "r", encoding="utf-8") as f:
+        resultats_reference = json.load(f)
+    sequentiel = resumer_point(mesures_sequentielles)
+    print(f"[Benchmark] Master séquentiel : médiane {sequentiel['mediane']:.3f} s, p95 {sequentiel['p95']:.3f} s")
+
+    # Master et N workers (clé N + 1 : les workers et le master)
+    points = {}
+    commande_master = [sys.executable, SCRIPT_MASTER] + options_master
+    for nb_workers in nombres_workers:
+        mesures = []
+        workers = lancer_workers(dossier, nb_workers, args.port_base, options_worker) if args.persistant else None
+        try:
+            for i in range(args.echauffement + args.repetitions):
+                if not args.persistant:
+                    workers = lancer_workers(dossier, nb_workers, args.port_base, options_worker)
+                mesure = executer_master(dossier, commande_master, str(nb_workers + 1))
+                verifier_resultats(dossier, resultats_reference, format_fichier)
+                if not args.persistant:
+                    arreter_workers(workers, attendre_fin=True)
+                    workers = None
+                if i >= args.echauffement:
+                    mesures.append(mesure)
+        finally:
+            if workers is not None:
+                arreter_workers(workers)
+        points[nb_workers] = resumer_point(mesures)
+        print(f"[Benchmark] {nb_workers} worker(s) : médiane {points[nb_workers]['mediane']:.3f} s, "
+              f"p95 {points[nb_workers]['p95']:.3f} s")
+
+    # Speed-up, efficacité et loi d'Amdahl ajustée
+    for nb_workers, point in points.items():
+        point["speedup"] = sequentiel["mediane"] / point["mediane"]
+        point["efficacite"] = point["speedup"] / nb_workers
+    ajustement = ajuster_amdahl({n: point["mediane"] for n, point in points.items()})
+
+    print("[Benchmark] workers | médiane (s) | p95 (s) | speed-up | efficacité")
+    print(f"[Benchmark] séq.    | {sequentiel['mediane']:11.3f} | {sequentiel['p95']:7.3f} |        - |          -")
+    for nb_workers, point in points.items():
+        print(f"[Benchmark] {nb_workers:7d} | {point['mediane']:11.3f} | {point['p95']:7.3f} | "
+              f"{point['speedup']:8.3f} | {point['efficacite']:10.3f}")
+    if ajustement is not None:
+        print(f"[Benchmark] Loi d'Amdahl ajustée : T(n) = {ajustement[0]:.3f} + {ajustement[1]:.3f} / n, "
+              f"fraction séquentielle {ajustement[2]:.3f}")
+
+    rapport = {
+        "corpus": corpus,
+        "options_master": options_master,
+        "options_worker": options_worker,
+        "repetitions": args.repetitions,
+        "sequentiel": sequentiel,
+        "points": {str(n): point for n, point in points.items()},
+        "amdahl": None if ajustement is None else {"a": ajustement[0], "b": ajustement[1],
+                                                    "fraction_sequentielle": ajustement[2]}
+    }
+    for chemin in filter(None, (args.sortie, args.enregistrer_reference)):
+        with open(chemin, "w", encoding="utf-8") as f:
+            json.dump(rapport, f, ensure_ascii=False, indent=4)
+        print(f"[Benchmark] Rapport enregistré dans {os.path.abspath(chemin)}")
+    if args.graphique:
+        tracer_graphique(args.graphique, points, sequentiel["mediane"], ajustement)
+
+    if not args.dossier:
+        shutil.rmtree(dossier, ignore_errors=True)
+
+    if args.reference:
+        regressions = comparer_a_la_reference(rapport, args.reference, args.tolerance)
+        if regressions:
+            print("[Benchmark] Régression par rapport à la référence :")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print("[Benchmark] Aucune régression par rapport à la référence.")
@@ -1,22 +1,54 @@
+import argparse
+import heapq
+import logging
 import socket
 import json
+import sys
 import threading
-import struct
-import re
 import os
+import queue
+import selectors
 import time
+import uuid
+from collections import Counter, deque
+from itertools import islice
+
+# Les modules partagés avec les workers se trouvent dans le dossier déployé
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "dossierAdeployer"))
+import protocole
+from format_resultats import cle_frequence, ecrire_json_en_flux, ecrire_table
+from journalisation import NIVEAU_DEFAUT, NIVEAUX, TraceEchantillonnee, configurer_journal, journal
+from mesures import MesuresJob, chronometrer_iterable
+from partitionnement import PARTITIONNEURS, PartitionneurPlan, calculer_bornes, construire_plan, creer_partitionneur
+from tokenisation import BLANCS, nettoyer_message
 
 # CONSTANTES GLOBALES
 PORT_PRINCIPAL = 3463
 FICHIER_MACHINES = "machines.txt"
 FICHIER_MESSAGE = "input_message.txt"
 FICHIER_RESULTATS = "final_aggregated_results.json"
+FICHIER_RESULTATS_BINAIRE = "final_aggregated_results.bin"
 FICHIER_RESULTATS_AMDAHL = "resultats_amdahl.json"
 
+# Echantillonnage du texte (plan de partitionnement, bornes du partitionneur par intervalles)
+NB_BLOCS_ECHANTILLON = 16
+TAILLE_BLOC_ECHANTILLON = 4096  # en octets
 
-# Lecture du message à envoyer depuis un fichier texte
-with open(FICHIER_MESSAGE, "r", encoding="utf-8") as f:
-    GRAND_MESSAGE = f.read()
+# Lecture en flux du fichier d'entrée : taille maximale d'un morceau envoyé à un worker
+TAILLE_MAX_MORCEAU = 4 * 1024 * 1024  # en octets
+
+# Boucle de contrôle du master
+TAILLE_FILE_ENVOI = 2  # messages en attente d'envoi par worker
+DELAI_MAX_PHASE = 600  # en secondes
+DELAI_SURVEILLANCE = 0.2  # en secondes, entre deux recherches de workers en retard
+
+# Spéculation : un worker est en retard quand il atteint une étape SEUIL_RETARD fois
+# plus tard que le worker médian, et au moins DELAI_MIN_RETARD secondes après lui
+SEUIL_RETARD = 2.0
+DELAI_MIN_RETARD = 1.0  # en secondes
+
+# Traces (niveau debug) des lots de résultats reçus, échantillonnées
+trace_lots_resultats = TraceEchantillonnee()
 
 
 ###################################################
@@ -25,9 +57,8 @@ with open(FICHIER_MESSAGE, "r", encoding="utf-8") as f:
 
 def decouper_message(big_msg, nb_machine):
     """
-    Découpe le message en parties égales (approximativement) entre les workers.
-    Gère la normalisation du texte, la suppression de certains caractères
-    et la séparation des contractions françaises.
+    Découpe le message en parties égales (approximativement) entre les workers,
+    après nettoyage (voir tokenisation.nettoyer_message).
     
     Args:
         big_msg (str): Le message complet à traiter.
@@ -36,24 +67,7 @@ def decouper_message(big_msg, nb_machine):
     Returns:
         list: Liste des segments du message pour chaque worker.
     """
-    big_msg_clean = big_msg.lower()
-    big_msg_clean = big_msg_clean.replace('’', "'")
-
-    # Caractères autorisés : lettres, chiffres, apostrophe, espace, accents
-    big_msg_clean = re.sub(r"[^a-z0-9'\sàâäéèêëïîôöùûüç]", '', big_msg_clean)
-    mots = [w for w in big_msg_clean.split() if w]
-
-    # Contractions
-    pattern_contraction = re.compile(r"^(l|j|c|d|m|t|s|n|qu)'(.+)$", re.IGNORECASE)
-    final_words = []
-    for w in mots:
-        m = pattern_contraction.match(w)
-        if m:
-            final_words.append(m.group(1) + "'")
-            if m.group(2):
-                final_words.append(m.group(2))
-        else:
-            final_words.append(w)
+    final_words = nettoyer_message(big_msg)
 
     longueur = len(final_words)
     nb_mots_par_machine = longueur // nb_machine
@@ -68,92 +82,461 @@ def decouper_message(big_msg, nb_machine):
         cnt += nb_mots_par_machine
 
     for i, part in enumerate(messages_specifiques):
-        print(f"[Master] Partie {i + 1} du message envoyée aux workers : {part}")
+        journal.debug("Partie %d du message envoyée aux workers : %d caractères", i + 1, len(part))
 
     return messages_specifiques
 
 
+def lire_morceaux(chemin_fichier, taille_morceau):
+    """
+    Lit le fichier par morceaux d'environ taille_morceau octets, coupés sur un
+    blanc pour ne jamais couper de mot (ni de caractère UTF-8). Seul un morceau
+    est en mémoire à la fois.
+    
+    Args:
+        chemin_fichier (str): Le fichier texte à lire.
+        taille_morceau (int): La taille de lecture en octets.
+        
+    Yields:
+        str: Les morceaux de texte successifs.
+    """
+    reste = b''
+    with open(chemin_fichier, "rb") as f:
+        while True:
+            bloc = f.read(taille_morceau)
+            if not bloc:
+                break
+            bloc = reste + bloc
+            coupure = max(bloc.rfind(blanc) for blanc in BLANCS)
+            if coupure < 0:
+                # Aucun blanc : le mot continue dans le bloc suivant
+                reste = bloc
+                continue
+            reste = bloc[coupure + 1:]
+            yield bloc[:coupure + 1].decode('utf-8')
+    if reste:
+        yield reste.decode('utf-8')
+
+
+def calculer_plages(chemin_fichier, nb_machine):
+    """
+    Découpe le fichier en plages d'octets de tailles à peu près égales, sans le
+    lire : chaque frontière est avancée jusqu'au blanc suivant pour ne pas
+    couper de mot. Les workers lisent eux-mêmes leur plage.
+    
+    Args:
+        chemin_fichier (str): Le fichier texte à traiter.
+        nb_machine (int): Le nombre de machines workers.
+        
+    Returns:
+        list: Liste de couples (offset, longueur) en octets, un par worker.
+    """
+    taille_fichier = os.path.getsize(chemin_fichier)
+    frontieres = [0]
+    with open(chemin_fichier, "rb") as f:
+        for i in range(1, nb_machine):
+            position = max(frontieres[-1], i * taille_fichier // nb_machine)
+            f.seek(position)
+            while True:
+                bloc = f.read(TAILLE_BLOC_ECHANTILLON)
+                if not bloc:
+                    position = taille_fichier
+                    break
+                indices = [indice for indice in (bloc.find(blanc) for blanc in BLANCS) if indice >= 0]
+                if indices:
+                    position += min(indices) + 1
+                    break
+                position += len(bloc)
+            frontieres.append(position)
+    frontieres.append(taille_fichier)
+    return [(debut, fin - debut) for debut, fin in zip(frontieres, frontieres[1:])]
+
+
+def echantillonner_mots(chemin_fichier):
+    """
+    Prélève un échantillon de mots nettoyés réparti sur tout le fichier :
+    NB_BLOCS_ECHANTILLON blocs de TAILLE_BLOC_ECHANTILLON octets à intervalles
+    réguliers, recadrés sur des blancs pour ne pas couper de mot.
+    
+    Args:
+        chemin_fichier (str): Le fichier texte à traiter.
+        
+    Returns:
+        tuple: (liste des mots de l'échantillon, nombre de mots estimé dans le fichier).
+    """
+    taille_fichier = os.path.getsize(chemin_fichier)
+    if taille_fichier <= NB_BLOCS_ECHANTILLON * TAILLE_BLOC_ECHANTILLON:
+        with open(chemin_fichier, "r", encoding="utf-8") as f:
+            echantillon = nettoyer_message(f.read())
+        return echantillon, len(echantillon)
+
+    pas = taille_fichier // NB_BLOCS_ECHANTILLON
+    echantillon = []
+    with open(chemin_fichier, "rb") as f:
+        for i in range(NB_BLOCS_ECHANTILLON):
+            f.seek(i * pas)
+            bloc = f.read(TAILLE_BLOC_ECHANTILLON).decode('utf-8', errors='ignore').split()
+            # Le premier et le dernier morceau du bloc peuvent être des mots coupés
+            echantillon.extend(nettoyer_message(' '.join(bloc[1:-1])))
+    nb_mots_estime = int(len(echantillon) * taille_fichier / (NB_BLOCS_ECHANTILLON * TAILLE_BLOC_ECHANTILLON))
+    return echantillon, nb_mots_estime
+
+
 ###################################################
 # FONCTIONS POUR ENVOI/RECEPTION DE MESSAGES
 ###################################################
 
-def envoyer_message(socket_client, message, nom_machine_worker):
+def envoyer_message(socket_client, operation, texte, nom_machine_worker, compresseur=None, trafic=None):
     """
-    Envoie un message via le socket fourni.
+    Envoie une trame (voir protocole.py) via le socket fourni.
     
     Args:
         socket_client (socket.socket): Le socket du worker cible.
-        message (str): Le message à envoyer.
+        operation (int): Le code d'opération (protocole.SPLIT, protocole.SAVE...).
+        texte (str): La charge utile, éventuellement vide.
         nom_machine_worker (str): Le nom (ou adresse) du worker.
+        compresseur (protocole.Compresseur): La compression négociée avec ce worker, le cas échéant.
+        trafic (mesures.Trafic): Les compteurs du trafic avec ce worker, le cas échéant.
     """
     try:
-        message_bytes = message.encode('utf-8')
-        taille_message = struct.pack('!I', len(message_bytes))
-        socket_client.sendall(taille_message + message_bytes)
-        print(f"[Master] Message envoyé à {nom_machine_worker} : {message}")
+        charge = texte.encode('utf-8')
+        if compresseur is not None:
+            operation_envoyee, charge = compresseur.compresser(operation, charge)
+        else:
+            operation_envoyee = operation
+        protocole.envoyer_trame(socket_client, operation_envoyee, charge)
+        if trafic is not None:
+            trafic.envoi(protocole.TAILLE_ENTETE + len(charge))
+        if journal.isEnabledFor(logging.DEBUG):
+            journal.debug("Message envoyé à %s : %s", nom_machine_worker, protocole.decrire_trame(operation, texte))
     except Exception as e:
-        print(f"[Master] Erreur lors de l'envoi du message à {nom_machine_worker} : {e}")
+        journal.error(f"Erreur lors de l'envoi du message à {nom_machine_worker} : {e}")
 
 
-def recevoir_message(socket_client, nom_machine_worker):
+def recevoir_messages_disponibles(socket_client, tampon, nom_machine_worker, trafic=None):
     """
-    Reçoit un message via le socket fourni.
+    Lit les octets disponibles sur le socket (appelée quand le sélecteur le signale
+    prêt, donc sans bloquer) et extrait du tampon de réception les trames complètes.
+    Une trame partiellement reçue reste dans le tampon jusqu'à la lecture suivante.
     
     Args:
         socket_client (socket.socket): Le socket du worker source.
+        tampon (protocole.TamponReception): Le tampon de réception propre à ce worker.
         nom_machine_worker (str): Le nom (ou adresse) du worker source.
+        trafic (mesures.Trafic): Les compteurs du trafic avec ce worker, le cas échéant.
         
     Returns:
-        str: Le message reçu.
+        list: Les couples (code d'opération, texte) reçus (éventuellement aucun).
     """
-    try:
-        taille_message_bytes = b''
-        while len(taille_message_bytes) < 4:
-            packet = socket_client.recv(4 - len(taille_message_bytes))
-            if not packet:
-                raise ConnectionError("Connexion fermée par le client")
-            taille_message_bytes += packet
-
-        taille_message = struct.unpack('!I', taille_message_bytes)[0]
-
-        message_bytes = b''
-        while len(message_bytes) < taille_message:
-            packet = socket_client.recv(taille_message - len(message_bytes))
-            if not packet:
-                raise ConnectionError("Connexion fermée par le client")
-            message_bytes += packet
-
-        message = message_bytes.decode('utf-8')
-        print(f"[Master] Message reçu de {nom_machine_worker} : {message}")
-        return message
+    if not tampon.recevoir(socket_client):
+        raise ConnectionError("Connexion fermée par le client")
+
+    messages = []
+    for operation, charge in tampon.trames():
+        if trafic is not None:
+            trafic.reception(protocole.TAILLE_ENTETE + len(charge))
+        operation, charge = protocole.decompresser(operation, charge)
+        texte = str(charge, 'utf-8')
+        if operation == protocole.LOT_RESULTATS:
+            trace_lots_resultats("Lot de résultats reçu de %s (%d octets)", nom_machine_worker, len(charge))
+        elif journal.isEnabledFor(logging.DEBUG):
+            journal.debug("Message reçu de %s : %s", nom_machine_worker, protocole.decrire_trame(operation, texte))
+        messages.append((operation, texte))
+    return messages
+
+
+def ranger_resultats(suite, comptes_repartis, mots_repartis, message):
+    """
+    Range un lot de résultats renvoyé par un worker : les couples s'ajoutent à
+    la suite de ce worker, déjà triée par nombre décroissant (voir
+    fusionner_suites), sauf les comptes partiels des mots répartis sur
+    plusieurs réducteurs, additionnés à part.
+    
+    Args:
+        suite (list): Les couples (mot, nombre) déjà reçus de ce worker, mise à jour.
+        comptes_repartis (Counter): Comptes des mots répartis {mot: nombre}, mis à jour.
+        mots_repartis (set): Les mots dont les comptes partiels sont répartis sur plusieurs réducteurs.
+        message (str): Le lot, des couples "mot nombre" séparés par des espaces.
 
-    except Exception as e:
-        print(f"[Master] Erreur lors de la réception du message de {nom_machine_worker} : {e}")
-        raise
+    Returns:
+        int: Le nombre de couples du lot.
+    """
+    elements = message.split()
+    for mot, compte in zip(elements[0::2], elements[1::2]):
+        if mot in mots_repartis:
+            comptes_repartis[mot] += int(compte)
+        else:
+            suite.append((mot, int(compte)))
+    return len(elements) // 2
+
+
+def boucle_envoi(socket_client, nom_machine_worker, file_envoi, compresseur, mesures):
+    """
+    Envoie dans l'ordre les messages déposés dans la file d'un worker, jusqu'à
+    recevoir None. Un thread par worker : un worker lent ne retarde que ses
+    propres envois, les commandes partent vers tous les workers en parallèle,
+    et les SPLIT sont compressés en parallèle (zlib et lzma libèrent le GIL).
+    
+    Args:
+        socket_client (socket.socket): Le socket du worker cible.
+        nom_machine_worker (str): Le nom (ou adresse) du worker.
+        file_envoi (queue.Queue): La file des couples (code d'opération, texte) à envoyer à ce worker.
+        compresseur (protocole.Compresseur): La compression négociée avec ce worker.
+        mesures (MesuresJob): Les mesures du job : trafic avec ce worker, et temps passé
+                              à compresser et envoyer (phase "envoi_trames", cumulée sur tous les threads).
+    """
+    trafic = mesures.trafic_avec(nom_machine_worker)
+    while True:
+        message = file_envoi.get()
+        if message is None:
+            break
+        operation, texte = message
+        debut = time.perf_counter()
+        envoyer_message(socket_client, operation, texte, nom_machine_worker, compresseur, trafic)
+        mesures.chronometre.ajouter("envoi_trames", time.perf_counter() - debut)
 
 
-def envoyer_message_a_tous(connexions, message):
+def envoyer_message_a_tous(files_envoi, operation, texte=''):
     """
     Envoie un message identique à tous les workers.
     
     Args:
-        connexions (dict): Dictionnaire {nom_machine_worker: socket}.
-        message (str): Le message à envoyer.
+        files_envoi (dict): Dictionnaire {nom_machine_worker: file d'envoi}.
+        operation (int): Le code d'opération.
+        texte (str): La charge utile, éventuellement vide.
     """
-    for machine, socket_client in connexions.items():
-        envoyer_message(socket_client, message, machine)
+    for file_envoi in files_envoi.values():
+        file_envoi.put((operation, texte))
 
 
-def envoyer_messages_specifiques(connexions, messages_specifiques):
+class SuiviSplit:
     """
-    Envoie des messages spécifiques à chaque worker.
+    Suivi de l'envoi du SPLIT par son thread (voir envoyer_split), partagé avec
+    la boucle de contrôle du master en mode pipeline :
+    - remplaces : les workers remplacés (voir lancer_reprise), à qui le reste
+      du SPLIT n'est plus envoyé ;
+    - attentes : pour chaque worker dont la file d'envoi est pleine, l'instant
+      où le thread a commencé à l'attendre, et durees_attentes, la durée des
+      attentes terminées. Le SPLIT étant envoyé à tour de rôle, un worker lent
+      à recevoir son split retient la lecture du fichier pour tous (voir
+      chercher_retardataires).
+    """
+
+    def __init__(self):
+        self.remplaces = set()
+        self.attentes = {}
+        self.durees_attentes = []
+        self.verrou = threading.Lock()
+
+    def commencer_attente(self, machine, debut):
+        with self.verrou:
+            self.attentes[machine] = debut
+
+    def terminer_attente(self, machine):
+        with self.verrou:
+            debut = self.attentes.pop(machine, None)
+            if debut is not None:
+                self.durees_attentes.append(time.perf_counter() - debut)
+
+    def etat(self):
+        """
+        Returns:
+            tuple: (attentes en cours {nom_machine_worker: début}, durées des attentes terminées, triées).
+        """
+        with self.verrou:
+            return dict(self.attentes), sorted(self.durees_attentes)
+
+
+def deposer(file_envoi, message, chronometre, machine=None, suivi=None):
+    """
+    Dépose un message du SPLIT dans la file d'envoi d'un worker, en comptant
+    le temps passé à attendre qu'elle ait de la place (phase "split_attente_files" :
+    les threads d'envoi ou les workers ne suivent pas la lecture du fichier).
     
     Args:
-        connexions (dict): Dictionnaire {nom_machine_worker: socket}.
-        messages_specifiques (list): Liste des messages dans l'ordre des workers.
+        file_envoi (queue.Queue): La file d'envoi du worker.
+        message (tuple): Le couple (code d'opération, texte).
+        chronometre (mesures.Chronometre): Le chronomètre du job.
+        machine (str): Le nom (ou adresse) du worker, pour le suivi.
+        suivi (SuiviSplit): Le suivi du SPLIT, ou None : l'attente y est notée, et le message
+                            est abandonné si le worker est remplacé pendant l'attente.
     """
-    for (machine, socket_client), msg in zip(connexions.items(), messages_specifiques):
-        envoyer_message(socket_client, msg, machine)
+    debut = time.perf_counter()
+    try:
+        file_envoi.put_nowait(message)
+    except queue.Full:
+        if suivi is not None:
+            suivi.commencer_attente(machine, debut)
+        while True:
+            try:
+                file_envoi.put(message, timeout=DELAI_SURVEILLANCE)
+                break
+            except queue.Full:
+                if suivi is not None and machine in suivi.remplaces:
+                    break
+        if suivi is not None:
+            suivi.terminer_attente(machine)
+    chronometre.ajouter("split_attente_files", time.perf_counter() - debut)
+
+
+def produire_split_en_flux(chemin_fichier, nb_workers, indice=None):
+    """
+    Produit le SPLIT en flux : le fichier est lu par morceaux (voir lire_morceaux),
+    chaque morceau est nettoyé puis envoyé aussitôt à un worker, à tour de rôle.
+    La mémoire du master reste bornée par la taille d'un morceau (et par la
+    taille des files d'envoi), et les workers commencent à compter dès le
+    premier morceau reçu.
+    
+    Args:
+        chemin_fichier (str): Le fichier texte à traiter.
+        nb_workers (int): Le nombre de workers.
+        indice (int): Si donné, seuls les morceaux de ce worker sont produits (et nettoyés).
+
+    Yields:
+        tuple: (indice du worker, (code d'opération, texte)).
+    """
+    taille_fichier = os.path.getsize(chemin_fichier)
+    # Au moins un morceau par worker pour les petits fichiers
+    taille_morceau = max(1, min(TAILLE_MAX_MORCEAU, -(-taille_fichier // nb_workers)))
+    for i, morceau in enumerate(lire_morceaux(chemin_fichier, taille_morceau)):
+        if indice is None or i % nb_workers == indice:
+            yield i % nb_workers, (protocole.SPLIT, ' '.join(nettoyer_message(morceau)))
+
+
+def produire_split_brut(chemin_fichier, nb_workers, indice=None):
+    """
+    Produit le SPLIT en flux sans le nettoyer : les morceaux de texte brut
+    (voir lire_morceaux) partent tels quels, et chaque worker les nettoie
+    lui-même avant de compter. Les morceaux étant coupés sur des blancs, aucun
+    mot n'est partagé entre deux morceaux : le résultat est le même qu'avec un
+    nettoyage par le master, qui n'a plus qu'à lire le fichier.
+    
+    Args:
+        chemin_fichier (str): Le fichier texte à traiter.
+        nb_workers (int): Le nombre de workers.
+        indice (int): Si donné, seuls les morceaux de ce worker sont produits.
+
+    Yields:
+        tuple: (indice du worker, (code d'opération, texte)).
+    """
+    taille_fichier = os.path.getsize(chemin_fichier)
+    taille_morceau = max(1, min(TAILLE_MAX_MORCEAU, -(-taille_fichier // nb_workers)))
+    for i, morceau in enumerate(lire_morceaux(chemin_fichier, taille_morceau)):
+        if indice is None or i % nb_workers == indice:
+            yield i % nb_workers, (protocole.SPLIT_BRUT, morceau)
+
+
+def produire_split_par_plages(chemin_fichier, nb_workers, indice=None):
+    """
+    Produit le SPLIT sous forme de descripteurs (chemin, offset, longueur) :
+    le master ne lit pas le fichier, chaque worker lit sa plage lui-même
+    (stockage partagé ou copie locale du fichier).
+    
+    Args:
+        chemin_fichier (str): Le fichier texte à traiter.
+        nb_workers (int): Le nombre de workers.
+        indice (int): Si donné, seule la plage de ce worker est produite.
+
+    Yields:
+        tuple: (indice du worker, (code d'opération, texte)).
+    """
+    plages = calculer_plages(chemin_fichier, nb_workers)
+    chemin_absolu = os.path.abspath(chemin_fichier)
+    for i, (offset, longueur) in enumerate(plages):
+        if indice is None or i == indice:
+            descripteur = {"chemin": chemin_absolu, "offset": offset, "longueur": longueur}
+            yield i, (protocole.SPLIT_FICHIER, json.dumps(descripteur))
+
+
+def produire_split_complet(chemin_fichier, nb_workers, indice=None):
+    """
+    Produit le SPLIT en parts égales du texte nettoyé, lu en entier (voir decouper_message).
+    
+    Args:
+        chemin_fichier (str): Le fichier texte à traiter.
+        nb_workers (int): Le nombre de workers.
+        indice (int): Si donné, seule la part de ce worker est produite.
+
+    Yields:
+        tuple: (indice du worker, (code d'opération, texte)).
+    """
+    with open(chemin_fichier, "r", encoding="utf-8") as f:
+        parties_message = decouper_message(f.read(), nb_workers)
+    for i, part in enumerate(parties_message):
+        if indice is None or i == indice:
+            yield i, (protocole.SPLIT, part)
+
+
+# Production du SPLIT selon le mode choisi (voir gerer_communication_avec_workers)
+PRODUCTEURS_SPLIT = {
+    "flux": produire_split_en_flux,
+    "brut": produire_split_brut,
+    "plages": produire_split_par_plages,
+    "complet": produire_split_complet,
+}
+
+
+def envoyer_split(files_envoi, mode_split, chronometre, suivi=None):
+    """
+    Envoie le SPLIT à tous les workers selon le mode choisi, suivi de "FIN SPLIT".
+    Exécutée dans un thread à part pour que la boucle du master continue de
+    surveiller les workers (et le délai de la phase) pendant la lecture du fichier.
+    Le temps de lecture et de nettoyage du fichier ("split_lecture_nettoyage") est
+    mesuré à part du temps d'attente des files d'envoi pleines ("split_attente_files").
+    
+    Args:
+        files_envoi (dict): Dictionnaire {nom_machine_worker: file d'envoi}.
+        mode_split (str): "flux", "brut", "complet" ou "plages" (voir gerer_communication_avec_workers).
+        chronometre (mesures.Chronometre): Le chronomètre du job.
+        suivi (SuiviSplit): Le suivi du SPLIT (mode pipeline), ou None.
+    """
+    debut = time.perf_counter()
+    machines = list(files_envoi)
+    remplaces = suivi.remplaces if suivi is not None else ()
+    try:
+        for indice, message in PRODUCTEURS_SPLIT[mode_split](FICHIER_MESSAGE, len(machines)):
+            if machines[indice] not in remplaces:
+                deposer(files_envoi[machines[indice]], message, chronometre, machines[indice], suivi)
+        for machine in machines:
+            if machine not in remplaces:
+                deposer(files_envoi[machine], (protocole.FIN_SPLIT, ''), chronometre, machine, suivi)
+    except Exception as e:
+        journal.error(f"Erreur lors de l'envoi du SPLIT : {e}")
+    attente = chronometre.durees.get("split_attente_files", 0.0)
+    chronometre.ajouter("split_lecture_nettoyage", time.perf_counter() - debut - attente)
+
+
+def envoyer_split_reprise(file_envoi, mode_split, nb_workers, rang, tache, split_termine, abandonnee, chronometre):
+    """
+    Envoie à un worker qui reprend la tâche d'un autre (voir lancer_reprise)
+    "REPRISE", puis le split de cet autre worker, suivi de "FIN SPLIT" : le
+    fichier est relu, et seuls les morceaux du worker remplacé sont envoyés.
+    L'envoi attend que le worker ait compté son propre split, pour que les
+    deux ne se mélangent pas. Exécutée dans un thread à part, comme
+    envoyer_split ; sa durée est mesurée dans "split_reprises".
+    
+    Args:
+        file_envoi (queue.Queue): La file d'envoi du worker qui reprend la tâche.
+        mode_split (str): "flux", "brut", "complet" ou "plages".
+        nb_workers (int): Le nombre de workers du SPLIT initial.
+        rang (int): La position du worker remplacé dans le SPLIT initial.
+        tache (int): L'indice de la tâche reprise (celui du worker remplacé dans la liste des machines).
+        split_termine (threading.Event): Signalé quand le worker a répondu "RECEPTION SPLIT OK".
+        abandonnee (callable): Renvoie True si le worker qui reprend la tâche est lui-même défaillant.
+        chronometre (mesures.Chronometre): Le chronomètre du job.
+    """
+    while not split_termine.wait(DELAI_SURVEILLANCE):
+        if abandonnee():
+            return
+    debut = time.perf_counter()
+    try:
+        file_envoi.put((protocole.REPRISE, json.dumps({"tache": tache})))
+        for _, message in PRODUCTEURS_SPLIT[mode_split](FICHIER_MESSAGE, nb_workers, rang):
+            file_envoi.put(message)
+        file_envoi.put((protocole.FIN_SPLIT, ''))
+    except Exception as e:
+        journal.error(f"Erreur lors de l'envoi du SPLIT repris : {e}")
+    chronometre.ajouter("split_reprises", time.perf_counter() - debut)
 
 
 
@@ -166,7 +549,7 @@ def connexion_aux_workers(machines):
     Etablit la connexion avec chaque worker.
     
     Args:
-        machines (list): Liste des adresses des machines workers.
+        machines (list): Liste des adresses "hote:port" des workers.
         
     Returns:
         dict: Dictionnaire {nom_machine_worker: socket}.
@@ -175,11 +558,11 @@ def connexion_aux_workers(machines):
     for machine in machines:
         try:
             socket_client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            socket_client.connect((machine, PORT_PRINCIPAL))
+            socket_client.connect(protocole.analyser_adresse(machine, PORT_PRINCIPAL))
             connexions[machine] = socket_client
-            print(f"[Master] Connexion établie avec le worker {machine}")
+            journal.info(f"Connexion établie avec le worker {machine}")
         except Exception as e:
-            print(f"[Master] Erreur lors de la connexion au worker {machine} : {e}")
+            journal.error(f"Erreur lors de la connexion au worker {machine} : {e}")
     return connexions
 
 
@@ -193,17 +576,199 @@ def fermer_connexions_workers(connexions):
     for machine, socket_client in connexions.items():
         try:
             socket_client.close()
-            print(f"[Master] Connexion fermée avec le worker {machine}")
+            journal.info(f"Connexion fermée avec le worker {machine}")
         except Exception as e:
-            print(f"[Master] Erreur lors de la fermeture de la connexion avec {machine} : {e}")
+            journal.error(f"Erreur lors de la fermeture de la connexion avec {machine} : {e}")
+
+
+
+def demarrer_envoyeurs(connexions, compresseurs, mesures):
+    """
+    Démarre un thread d'envoi par worker (voir boucle_envoi), alimenté par une
+    file bornée à TAILLE_FILE_ENVOI messages.
+    
+    Args:
+        connexions (dict): Dictionnaire {nom_machine_worker: socket}.
+        compresseurs (dict): Dictionnaire {nom_machine_worker: protocole.Compresseur}.
+        mesures (MesuresJob): Les mesures du job.
+        
+    Returns:
+        tuple: (dictionnaire {nom_machine_worker: file d'envoi}, liste des threads d'envoi).
+    """
+    files_envoi = {}
+    threads_envoi = []
+    for machine, socket_client in connexions.items():
+        file_envoi = queue.Queue(maxsize=TAILLE_FILE_ENVOI)
+        thread_envoi = threading.Thread(target=boucle_envoi,
+                                        args=(socket_client, machine, file_envoi, compresseurs[machine], mesures),
+                                        daemon=True)
+        thread_envoi.start()
+        files_envoi[machine] = file_envoi
+        threads_envoi.append(thread_envoi)
+    return files_envoi, threads_envoi
+
+
+def arreter_envoyeurs(files_envoi, threads_envoi, attendre, ignorees=()):
+    """
+    Arrête les threads d'envoi une fois leurs files vidées.
+    
+    Args:
+        files_envoi (dict): Dictionnaire {nom_machine_worker: file d'envoi}.
+        threads_envoi (list): Les threads d'envoi, dans l'ordre de files_envoi.
+        attendre (bool): Si True, attend que tous les messages en file soient envoyés.
+                         Sinon (job abandonné), les files pleines sont ignorées : les
+                         threads s'arrêteront à la fermeture des sockets.
+        ignorees (set): Les workers défaillants ou remplacés, jamais attendus.
+    """
+    for machine, file_envoi in files_envoi.items():
+        if attendre and machine not in ignorees:
+            file_envoi.put(None)
+        else:
+            try:
+                file_envoi.put_nowait(None)
+            except queue.Full:
+                pass
+    if attendre:
+        for machine, thread_envoi in zip(files_envoi, threads_envoi):
+            if machine not in ignorees:
+                thread_envoi.join()
 
 
 
+def negocier_compression(description_demandee, reponses_connexion):
+    """
+    Choisit la compression des échanges : celle demandée si tous les workers
+    l'ont annoncée dans leur "CONNEXION OK", aucune sinon.
+    
+    Args:
+        description_demandee (dict): Compression demandée, ex. {"type": "zlib", "niveau": 1}.
+        reponses_connexion (dict): Charges utiles des "CONNEXION OK" {nom_machine_worker: texte JSON}.
+        
+    Returns:
+        dict: La description de la compression retenue.
+    """
+    if description_demandee["type"] == protocole.COMPRESSION_AUCUNE:
+        return description_demandee
+    for machine, texte in reponses_connexion.items():
+        codecs = json.loads(texte).get("compressions", []) if texte else []
+        if description_demandee["type"] not in codecs:
+            journal.warning(f"Le worker {machine} ne gère pas la compression {description_demandee['type']} : "
+                            "échanges non compressés.")
+            return {"type": protocole.COMPRESSION_AUCUNE}
+    return description_demandee
+
+
+def lire_ports_workers(machines, reponses_connexion):
+    """
+    Récupère le port sur lequel chaque worker attend les connexions des autres
+    workers, annoncé dans son "CONNEXION OK" (par défaut, le port qui suit
+    celui de sa connexion avec le master).
+    
+    Args:
+        machines (list): Liste des adresses "hote:port" des workers.
+        reponses_connexion (dict): Charges utiles des "CONNEXION OK" {nom_machine_worker: texte JSON}.
+        
+    Returns:
+        list: Les ports des workers, dans l'ordre de machines.
+    """
+    ports_workers = []
+    for machine in machines:
+        texte = reponses_connexion.get(machine)
+        port = json.loads(texte).get("port_workers") if texte else None
+        if port is None:
+            port = protocole.analyser_adresse(machine, PORT_PRINCIPAL)[1] + 1
+        ports_workers.append(port)
+    return ports_workers
+
+
+def envoyer_configuration(files_envoi, compresseurs, configuration, reponses_connexion):
+    """
+    Fin de la phase CONNEXION : complète la configuration du job avec les ports
+    entre workers et la compression négociée, et l'envoie à tous les workers
+    avec le message MACHINES.
+    
+    Args:
+        files_envoi (dict): Dictionnaire {nom_machine_worker: file d'envoi}.
+        compresseurs (dict): Dictionnaire {nom_machine_worker: protocole.Compresseur}, configurés.
+        configuration (dict): La configuration du job, mise à jour.
+        reponses_connexion (dict): Charges utiles des "CONNEXION OK" {nom_machine_worker: texte JSON}.
+    """
+    configuration["ports_workers"] = lire_ports_workers(configuration["machines"], reponses_connexion)
+    configuration["compression"] = negocier_compression(configuration["compression"], reponses_connexion)
+    journal.info(f"Compression des échanges : {configuration['compression']}")
+    for compresseur in compresseurs.values():
+        compresseur.configurer(configuration["compression"])
+    envoyer_message_a_tous(files_envoi, protocole.MACHINES, json.dumps(configuration))
+
+
+def enregistrer_resultats(results_data, configuration, compresseurs, suites, comptes_repartis, sauvegardes):
+    """
+    Fin du job : range dans results_data les suites triées des workers, les
+    comptes des mots répartis, la charge de reduce et les mesures de chaque
+    worker, et les octets échangés avant et après compression.
+    
+    Args:
+        results_data (dict): Les résultats du job, mis à jour.
+        configuration (dict): La configuration du job (compression retenue).
+        compresseurs (dict): Dictionnaire {nom_machine_worker: protocole.Compresseur} (octets du SPLIT).
+        suites (dict): Suite triée de chaque worker {nom_machine_worker: liste de couples}.
+        comptes_repartis (Counter): Comptes des mots répartis {mot: nombre}.
+        sauvegardes (dict): Charges utiles décodées des "SAVE OK" {nom_machine_worker: dict}.
+    """
+    results_data['suites'] = suites
+    results_data['comptes_repartis'] = comptes_repartis
+    results_data['charges_reduce'] = {wkr: sauvegarde["nb_mots"] for wkr, sauvegarde in sauvegardes.items()}
+    results_data['mesures_workers'] = {wkr: sauvegarde.get("mesures") for wkr, sauvegarde in sauvegardes.items()}
+    results_data['compression'] = dict(configuration["compression"])
+    results_data['compression']['octets_split'] = {
+        "avant": sum(c.octets_avant for c in compresseurs.values()),
+        "apres": sum(c.octets_apres for c in compresseurs.values())
+    }
+    results_data['compression']['octets_shuffle'] = {
+        "avant": sum(sauvegarde["octets_shuffle"]["avant"] for sauvegarde in sauvegardes.values()),
+        "apres": sum(sauvegarde["octets_shuffle"]["apres"] for sauvegarde in sauvegardes.values())
+    }
+    results_data['compression']['octets_resultats'] = {
+        "avant": sum(sauvegarde["octets_resultats"]["avant"] for sauvegarde in sauvegardes.values()),
+        "apres": sum(sauvegarde["octets_resultats"]["apres"] for sauvegarde in sauvegardes.values())
+    }
+
+
 ###################################################
 # FONCTION PRINCIPALE POUR DIRIGER LES WORKERS
 ###################################################
 
-def gerer_communication_avec_workers(connexions, machines_json, results_data):
+# Phases du job, dans l'ordre : (nom, codes d'opération des réponses attendues de chaque worker)
+PHASES = (
+    ("CONNEXION", {protocole.CONNEXION_OK}),
+    ("MACHINES", {protocole.RECEPTION_MACHINES_OK}),
+    ("SPLIT", {protocole.RECEPTION_SPLIT_OK}),
+    ("CONNEXION WORKERS", {protocole.CONNEXION_WORKERS_OK}),
+    ("MAP SHUFFLE", {protocole.END_MAP_SHUFFLE}),
+    ("SAVE", {protocole.SAVE_OK}),
+)
+
+# Echecs signalés par un worker, qui font abandonner le job
+ECHECS_WORKER = {
+    protocole.CONNEXION_WORKERS_FAILED: "Le worker {} n'a pas pu joindre tous les autres workers",
+    protocole.ECHEC_SPLIT: "Le worker {} n'a pas pu compter tout son split",
+    protocole.MACHINE_INCONNUE: "Le worker {} ne se trouve pas dans la liste des machines sous le nom {} "
+                                "(--nom du worker différent de sa ligne de machines.txt)",
+}
+
+# Mode pipeline : réponses de chaque worker, dans l'ordre où il les envoie
+# (la réponse à MACHINES est suivie de celle de la connexion aux autres workers)
+ETAPES_PIPELINE = (
+    ("CONNEXION", {protocole.CONNEXION_OK}),
+    ("MACHINES", {protocole.RECEPTION_MACHINES_OK}),
+    ("CONNEXION WORKERS", {protocole.CONNEXION_WORKERS_OK}),
+    ("SPLIT", {protocole.RECEPTION_SPLIT_OK}),
+    ("MAP SHUFFLE", {protocole.END_MAP_SHUFFLE}),
+    ("SAVE", {protocole.SAVE_OK}),
+)
+
+
+def gerer_communication_avec_workers(connexions, configuration, mode_split, delai_phase, results_data, mesures):
     """
     Gère toute la communication avec les workers :
     - Connexion initiale
@@ -211,171 +776,768 @@ def gerer_communication_avec_workers(connexions, machines_json, results_data):
     - Envoi du SPLIT
     - Phase MAP SHUFFLE
     - Phase SAVE
-    - Récupération des chemins de sauvegarde
+    - Réception et fusion des résultats des workers
+    
+    La boucle est pilotée par un sélecteur : le master traite les réponses du
+    premier worker prêt, quel qu'il soit, au lieu d'attendre chaque worker à tour
+    de rôle. Les envois passent par un thread par worker (voir demarrer_envoyeurs).
+    Une phase est terminée quand tous les workers ont répondu ; si elle dure plus
+    de delai_phase secondes ou qu'un worker se déconnecte, le job est abandonné.
+    La compression des SPLIT et du shuffle est négociée à la fin de la phase
+    CONNEXION (voir negocier_compression) et envoyée avec le message MACHINES.
     
-    Met à jour results_data avec les chemins de sauvegarde.
+    Pendant la phase SAVE, chaque worker renvoie ses comptes réduits, triés par
+    nombre décroissant, par lots (LOT RESULTATS) sur sa connexion de contrôle,
+    puis "SAVE OK" ; les lots sont rangés dès leur arrivée (voir
+    ranger_resultats), dans l'ordre où les workers sont prêts, pendant que les
+    autres workers continuent d'envoyer.
+    
+    Met à jour results_data avec la suite triée de chaque worker, les comptes
+    des mots répartis, la charge de reduce de chaque worker, les octets
+    échangés avant et après compression et les mesures renvoyées par chaque
+    worker avec "SAVE OK". La durée de chaque phase (du lancement à la dernière
+    réponse), le trafic avec chaque worker et le temps de rangement des lots de
+    résultats ("lecture_resultats") sont ajoutés aux mesures du master.
     
     Args:
         connexions (dict): Dictionnaire {nom_machine_worker: socket} contenant les connexions aux workers.
-        machines_json (str): Chaîne JSON représentant la liste des machines workers.
-        results_data (dict): Dictionnaire pour stocker les chemins de sauvegarde des résultats des workers.
+        configuration (dict): Configuration du job envoyée avec le message MACHINES : identifiant
+                              du job, liste des adresses des workers, partitionneur et compression demandée (les ports
+                              entre workers y sont ajoutés à la fin de la phase CONNEXION).
+        mode_split (str): "flux" (lecture et envoi du fichier par morceaux),
+                          "brut" (comme "flux", mais le nettoyage est fait par les workers),
+                          "complet" (lecture complète puis découpage en parts égales) ou
+                          "plages" (envoi de plages d'octets lues par les workers).
+        delai_phase (float): Durée maximale d'une phase, en secondes.
+        results_data (dict): Dictionnaire pour stocker les résultats des workers
+                             et les statistiques de compression.
+        mesures (MesuresJob): Les mesures du job côté master.
+
+    Returns:
+        bool: True si le job est terminé, False s'il a été abandonné (results_data reste alors vide).
     """
-    workers_connectes = {m: False for m in connexions.keys()}
-    workers_machines_reception = {m: False for m in connexions.keys()}
-    workers_split_reception = {m: False for m in connexions.keys()}
-    workers_connexion_workers_ok = {m: False for m in connexions.keys()}
-    workers_map_shuffle_reception = {m: False for m in connexions.keys()}
-    workers_save_ok = {m: False for m in connexions.keys()}
+    nb_machine = len(connexions)
+    journal.info(f"Nombre de machines connectées : {nb_machine}")
+    if nb_machine == 0:
+        journal.error("Aucun worker connecté. Abandon du job.")
+        return False
+
+    compresseurs = {machine: protocole.Compresseur() for machine in connexions}
+    suites = {machine: [] for machine in connexions}
+    comptes_repartis = Counter()
+    mots_repartis = creer_partitionneur(configuration["partitionneur"], len(configuration["machines"])).mots_repartis()
+    files_envoi, threads_envoi = demarrer_envoyeurs(connexions, compresseurs, mesures)
+    selecteur = selectors.DefaultSelector()
+    for machine, socket_client in connexions.items():
+        selecteur.register(socket_client, selectors.EVENT_READ, (machine, protocole.TamponReception()))
+    chronometre = mesures.chronometre
 
-    workers_save_paths = {}
+    indice_phase = 0
+    reponses = {}
+    debut_phase = time.perf_counter()
+    echeance = debut_phase + delai_phase
+    termine = False
 
-    split_envoye = False
-    machines_envoyees = False
-    map_shuffle_envoye = False
-    start_map_shuffle_envoye = False
-    save_envoye = False
+    try:
+        while not termine:
+            nom_phase, reponses_attendues = PHASES[indice_phase]
+            restant = echeance - time.perf_counter()
+            if restant <= 0:
+                retardataires = [m for m in connexions if m not in reponses]
+                journal.error(f"Délai de la phase {nom_phase} dépassé ({delai_phase} s), "
+                              f"sans réponse de : {retardataires}. Abandon du job.")
+                break
+
+            abandon = False
+            for cle, _ in selecteur.select(timeout=restant):
+                machine, tampon = cle.data
+                try:
+                    messages = recevoir_messages_disponibles(cle.fileobj, tampon, machine,
+                                                             mesures.trafic_avec(machine))
+                except Exception as e:
+                    journal.error(f"Erreur lors de la réception depuis {machine} : {e}. Abandon du job.")
+                    abandon = True
+                    break
+                for operation, texte in messages:
+                    if operation == protocole.LOT_RESULTATS and nom_phase == "SAVE":
+                        debut_rangement = time.perf_counter()
+                        mesures.compteurs["couples_resultats_recus"] += ranger_resultats(
+                            suites[machine], comptes_repartis, mots_repartis, texte)
+                        chronometre.ajouter("lecture_resultats", time.perf_counter() - debut_rangement)
+                    elif operation in ECHECS_WORKER:
+                        journal.error(f"{ECHECS_WORKER[operation].format(machine, texte)}. Abandon du job.")
+                        abandon = True
+                        break
+                    elif operation in reponses_attendues:
+                        reponses[machine] = texte
+                    else:
+                        journal.warning(f"Message inattendu de {machine} pendant la phase {nom_phase} : "
+                                        f"{protocole.decrire_trame(operation, texte)}")
+                if abandon:
+                    break
+            if abandon:
+                break
+
+            if len(reponses) < nb_machine:
+                continue
+            chronometre.ajouter(nom_phase.lower().replace(' ', '_'), time.perf_counter() - debut_phase)
+            journal.info(f"Phase {nom_phase} terminée par tous les workers.")
+
+            # Lancement de la phase suivante
+            #---------------------------------
+            if nom_phase == "CONNEXION":
+                envoyer_configuration(files_envoi, compresseurs, configuration, reponses)
+
+            elif nom_phase == "MACHINES":
+                journal.info(f"Envoi du SPLIT à chaque worker (mode {mode_split}).")
+                threading.Thread(target=envoyer_split, args=(files_envoi, mode_split, chronometre), daemon=True).start()
+
+            elif nom_phase == "SPLIT":
+                envoyer_message_a_tous(files_envoi, protocole.GO_MAP_SHUFFLE)
+
+            elif nom_phase == "CONNEXION WORKERS":
+                envoyer_message_a_tous(files_envoi, protocole.START_MAP_SHUFFLE)
+
+            elif nom_phase == "MAP SHUFFLE":
+                envoyer_message_a_tous(files_envoi, protocole.SAVE)
+
+            elif nom_phase == "SAVE":
+                sauvegardes = {wkr: json.loads(texte) for wkr, texte in reponses.items()}
+                journal.info("Tous les workers ont renvoyé leurs résultats :" + ''.join(
+                    f"\n  - {wkr} : {len(suites[wkr])} mots reçus sur {sauvegarde['nb_mots']} réduits"
+                    for wkr, sauvegarde in sauvegardes.items()))
+                enregistrer_resultats(results_data, configuration, compresseurs, suites, comptes_repartis, sauvegardes)
+                termine = True
+                continue
+
+            indice_phase += 1
+            reponses = {}
+            debut_phase = time.perf_counter()
+            echeance = debut_phase + delai_phase
+    finally:
+        selecteur.close()
+        if termine:
+            envoyer_message_a_tous(files_envoi, protocole.END)
+        # En cas d'abandon, les workers sont arrêtés par la fermeture des connexions
+        arreter_envoyeurs(files_envoi, threads_envoi, attendre=termine)
+    return termine
+
+
+def gerer_communication_en_pipeline(connexions, configuration, mode_split, delai_phase, results_data, mesures,
+                                    seuils_speculation=None):
+    """
+    Variante de gerer_communication_avec_workers sans barrière entre les phases
+    (option --pipeline). Seule la phase CONNEXION attend tous les workers, car
+    MACHINES transmet les ports et la compression annoncés par chacun. Ensuite :
+    - MACHINES puis le SPLIT partent aussitôt, sans attendre de réponse ;
+    - chaque worker se connecte aux autres dès la réception de MACHINES, lance
+      son shuffle dès que son split est compté et renvoie ses résultats dès que
+      les autres workers lui ont envoyé tous leurs lots, sans commande du master ;
+    - le master suit l'avancement de chaque worker séparément (ETAPES_PIPELINE) et
+      termine chaque partition dès son "SAVE OK" : les mesures du worker sont
+      gardées, "END" lui est envoyé et sa connexion n'est plus surveillée, pendant
+      que les autres continuent.
+    Un worker qui ne répond pas à l'étape suivante en moins de delai_phase secondes,
+    ou qui se déconnecte, fait abandonner le job.
+    
+    Avec la spéculation (option --speculation), un worker défaillant (déconnecté,
+    ou muet pendant delai_phase secondes) ou en retard (voir chercher_retardataires)
+    ne fait plus abandonner le job : sa tâche est reprise par un worker sain (voir
+    lancer_reprise), qui réduit sa partition et compte son split, relu par le
+    master. Le worker remplacé n'est plus attendu, mais continue s'il le peut :
+    la première copie terminée de chaque partition ("SAVE OK") est gardée, les
+    suivantes sont ignorées, et les workers ne retiennent que le premier flux
+    complet de chaque tâche. "END" n'est alors envoyé qu'à la fin du job, car un
+    worker qui a terminé sa partition peut encore devoir renvoyer ses comptes.
+    
+    La boucle ne se bloque jamais sur la file d'envoi pleine d'un worker lent :
+    les messages qu'elle envoie ("REENVOI PARTITION", "END") sont différés
+    jusqu'à ce que la file ait de la place (voir envoyer_sans_attendre).
+    
+    La durée d'une étape, ajoutée aux mesures du master, va de l'envoi de
+    MACHINES à la dernière réponse des workers : les étapes se chevauchant,
+    ces durées ne s'additionnent pas.
+    
+    Args:
+        Les mêmes que gerer_communication_avec_workers, et :
+        seuils_speculation (tuple): (seuil_retard, delai_min_retard) de la spéculation (voir
+                                    SEUIL_RETARD et DELAI_MIN_RETARD), ou None sans spéculation.
 
+    Returns:
+        bool: True si le job est terminé, False s'il a été abandonné.
+    """
     nb_machine = len(connexions)
-    print(f"[Master] Nombre de machines connectées : {nb_machine}")
+    journal.info(f"Nombre de machines connectées : {nb_machine}")
+    if nb_machine == 0:
+        journal.error("Aucun worker connecté. Abandon du job.")
+        return False
+
+    speculation = seuils_speculation is not None
+    machines = configuration["machines"]
+    # Indice de la tâche map et de la partition de chaque worker
+    indices = {machine: machines.index(machine) for machine in connexions}
+    compresseurs = {machine: protocole.Compresseur() for machine in connexions}
+    mots_repartis = creer_partitionneur(configuration["partitionneur"], len(configuration["machines"])).mots_repartis()
+    files_envoi, threads_envoi = demarrer_envoyeurs(connexions, compresseurs, mesures)
+    selecteur = selectors.DefaultSelector()
+    for machine, socket_client in connexions.items():
+        selecteur.register(socket_client, selectors.EVENT_READ, (machine, protocole.TamponReception()))
+    chronometre = mesures.chronometre
+
+    # Lots de résultats reçus de chaque worker, attribués à une partition par son "SAVE OK"
+    en_attente = {machine: ([], Counter()) for machine in connexions}
+    # Partitions terminées {indice de partition: ...}
+    suites = {}
+    comptes_repartis = {}
+    sauvegardes = {}
+    executants = {}
+
+    # Indice dans ETAPES_PIPELINE de la prochaine réponse attendue de chaque worker
+    avancement = {machine: 0 for machine in connexions}
+    nb_reponses_etapes = Counter()
+    # Instants (depuis l'envoi de MACHINES) où chaque étape a été atteinte par un worker
+    instants_etapes = {}
+    splits_comptes = {machine: threading.Event() for machine in connexions}
+    reponses_connexion = {}
+    debut = debut_pipeline = time.perf_counter()
+    echeances = {machine: debut + delai_phase for machine in connexions}
+    # Spéculation : workers défaillants ou remplacés, tâches à reprendre {partition: partition à
+    # réduire aussi (sinon, le split seul)} et worker qui reprend chaque partition {partition: hôte}
+    suivi_split = SuiviSplit()
+    remplaces = suivi_split.remplaces
+    defaillants = set()
+    a_reprendre = {}
+    hotes = {}
+    hotes_utilises = set()
+    etape_shuffle = [nom for nom, _ in ETAPES_PIPELINE].index("MAP SHUFFLE")
+    # Messages de la boucle en attente d'une place dans la file d'envoi de chaque worker
+    differes = {machine: deque() for machine in connexions}
+    termine = False
+
+    def envoyer_sans_attendre(machine, operation, texte=''):
+        # La boucle ne se bloque jamais sur une file pleine (SPLIT d'un worker lent) :
+        # le message attend le tour suivant, dans l'ordre des autres messages différés
+        differes[machine].append((operation, texte))
+        vider_differes()
+
+    def vider_differes(attente=0.0):
+        # Renvoie les workers dont la file est restée pleine pendant attente secondes
+        echeance = time.perf_counter() + attente
+        bloques = set()
+        for machine, messages in differes.items():
+            while messages and machine not in defaillants:
+                try:
+                    files_envoi[machine].put(messages[0], timeout=max(0.0, echeance - time.perf_counter()))
+                except queue.Full:
+                    bloques.add(machine)
+                    break
+                messages.popleft()
+        return bloques
+
+    def a_du_travail(machine):
+        # Worker attendu : sa propre tâche n'est ni finie ni reprise, ou il reprend une partition
+        if machine in defaillants:
+            return False
+        return (machine not in remplaces and avancement[machine] < len(ETAPES_PIPELINE)) or machine in hotes.values()
+
+    def valider_partition(machine, partition, sauvegarde):
+        suite, repartis = en_attente[machine]
+        en_attente[machine] = ([], Counter())
+        if hotes.get(partition) == machine:
+            del hotes[partition]
+        if partition in sauvegardes:
+            mesures.compteurs["partitions_en_double"] += 1
+            journal.info(f"Partition de {machines[partition]} renvoyée une seconde fois par {machine} : copie ignorée")
+            return
+        sauvegardes[partition] = sauvegarde
+        suites[partition] = suite
+        comptes_repartis[partition] = repartis
+        executants[partition] = machine
+        if a_reprendre.get(partition):
+            del a_reprendre[partition]
+        reprise = f" (reprise par {machine})" if machine != machines[partition] else ""
+        journal.info(f"Partition de {machines[partition]} terminée{reprise} : {len(suite)} mots reçus "
+                     f"sur {sauvegarde['nb_mots']} réduits")
+
+    def declarer_defaillant(machine, raison):
+        journal.error(f"Worker {machine} défaillant ({raison}).")
+        deja_remplace = machine in remplaces
+        defaillants.add(machine)
+        remplaces.add(machine)
+        try:
+            selecteur.unregister(connexions[machine])
+        except (KeyError, ValueError):
+            pass
+        en_attente[machine] = ([], Counter())
+        # Partitions qu'il reprenait : à confier à un autre worker
+        for partition, hote in list(hotes.items()):
+            if hote == machine:
+                del hotes[partition]
+                if partition not in sauvegardes:
+                    a_reprendre[partition] = True
+        if deja_remplace:
+            return
+        partition = indices[machine]
+        if partition not in sauvegardes:
+            a_reprendre[partition] = True
+        elif len(sauvegardes) < nb_machine:
+            # Tous ses lots ne sont peut-être pas partis : son split est recompté pour les autres partitions
+            a_reprendre.setdefault(partition, False)
+
+    def chercher_retardataires(maintenant):
+        # Retard sur une étape déjà atteinte par le worker médian
+        seuil_retard, delai_min_retard = seuils_speculation
+        rang_median = (nb_machine + 1) // 2
+        ecoule = maintenant - debut_pipeline
+        for machine in connexions:
+            partition = indices[machine]
+            if (machine in remplaces or partition in sauvegardes or partition in a_reprendre
+                    or not 0 < avancement[machine] < len(ETAPES_PIPELINE)):
+                continue
+            nom_etape = ETAPES_PIPELINE[avancement[machine]][0]
+            instants = sorted(instants_etapes.get(nom_etape, []))
+            if len(instants) < rang_median:
+                continue
+            instant_median = instants[rang_median - 1]
+            if ecoule > max(seuil_retard * instant_median, instant_median + delai_min_retard):
+                journal.warning(f"Worker {machine} en retard à l'étape {nom_etape} : {ecoule:.2f} s, contre "
+                                f"{instant_median:.2f} s pour le worker médian.")
+                a_reprendre[partition] = True
+
+        # Worker qui retient le SPLIT de tous : sa file d'envoi reste pleine bien plus longtemps que d'habitude
+        attentes, durees_attentes = suivi_split.etat()
+        attente_mediane = durees_attentes[len(durees_attentes) // 2] if durees_attentes else 0.0
+        for machine, debut_attente in attentes.items():
+            attente = maintenant - debut_attente
+            if (machine not in remplaces and indices[machine] not in a_reprendre
+                    and attente > max(seuil_retard * attente_mediane, delai_min_retard)):
+                journal.warning(f"Worker {machine} en retard au SPLIT : sa file d'envoi est pleine depuis "
+                                f"{attente:.2f} s, contre {attente_mediane:.2f} s d'habitude.")
+                a_reprendre[indices[machine]] = True
+
+    def choisir_hote(partition):
+        # Un worker sain qui ne reprend pas déjà une tâche, de préférence le plus avancé
+        candidats = [machine for machine in connexions
+                     if machine not in remplaces and machine not in hotes_utilises
+                     and indices[machine] != partition and indices[machine] not in a_reprendre]
+        if not candidats:
+            return None
+        return min(candidats, key=lambda machine: (indices[machine] not in sauvegardes,
+                                                   -min(avancement[machine], etape_shuffle + 1)))
+
+    def lancer_reprise(partition, hote, reduire):
+        machine = machines[partition]
+        remplaces.add(machine)
+        hotes_utilises.add(hote)
+        echeances[hote] = time.perf_counter() + delai_phase
+        mesures.compteurs["reprises"] += 1
+        journal.warning(f"Tâche de {machine} reprise par {hote}"
+                        + (" : split et partition" if reduire else " : split seulement"))
+        if reduire:
+            # Avant le split : les autres workers cessent aussitôt d'attendre le worker remplacé
+            hotes[partition] = hote
+            reenvoi = json.dumps({"partition": partition, "reducteur": hote})
+            for autre in connexions:
+                if autre not in remplaces:
+                    envoyer_sans_attendre(autre, protocole.REENVOI_PARTITION, reenvoi)
+        threading.Thread(target=envoyer_split_reprise,
+                         args=(files_envoi[hote], mode_split, nb_machine, list(connexions).index(machine), partition,
+                               splits_comptes[hote], lambda: hote in defaillants, chronometre),
+                         daemon=True).start()
+
+    def lancer_reprises():
+        for partition in sorted(a_reprendre):
+            if partition in hotes:
+                continue
+            hote = choisir_hote(partition)
+            if hote is not None:
+                lancer_reprise(partition, hote, a_reprendre.pop(partition))
 
-    parties_message = decouper_message(GRAND_MESSAGE, nb_machine)
+    try:
+        while len(sauvegardes) < nb_machine:
+            vider_differes()
+            maintenant = time.perf_counter()
+            if defaillants and len(reponses_connexion) < nb_machine:
+                journal.error(f"Worker(s) {sorted(defaillants)} défaillant(s) avant l'envoi de la configuration. "
+                              "Abandon du job.")
+                break
+            if speculation:
+                # Avant de chercher les workers attendus : une tâche reprise leur donne du travail
+                chercher_retardataires(maintenant)
+                lancer_reprises()
+            en_cours = [m for m in connexions if a_du_travail(m)]
+            if not en_cours:
+                journal.error("Aucun worker ne peut plus terminer les partitions restantes "
+                              f"{sorted(machines[p] for p in indices.values() if p not in sauvegardes)}. "
+                              "Abandon du job.")
+                break
+            expires = [m for m in en_cours if echeances[m] <= maintenant]
+            if expires:
+                retardataires = [f"{m} ({ETAPES_PIPELINE[avancement[m]][0]})"
+                                 if avancement[m] < len(ETAPES_PIPELINE) else f"{m} (reprise)" for m in expires]
+                if not speculation:
+                    journal.error(f"Délai de {delai_phase} s dépassé sans réponse de : {retardataires}. "
+                                  "Abandon du job.")
+                    break
+                for machine in expires:
+                    declarer_defaillant(machine, f"sans réponse depuis {delai_phase} s")
+                continue
+            restant = min(echeances[m] for m in en_cours) - maintenant
+            if speculation or any(differes.values()):
+                restant = min(restant, DELAI_SURVEILLANCE)
+
+            abandon = False
+            for cle, _ in selecteur.select(timeout=restant):
+                machine, tampon = cle.data
+                if machine in defaillants:
+                    continue
+                try:
+                    messages = recevoir_messages_disponibles(cle.fileobj, tampon, machine,
+                                                             mesures.trafic_avec(machine))
+                except Exception as e:
+                    if not speculation:
+                        journal.error(f"Erreur lors de la réception depuis {machine} : {e}. Abandon du job.")
+                        abandon = True
+                        break
+                    declarer_defaillant(machine, e)
+                    continue
+                echeances[machine] = time.perf_counter() + delai_phase
+                for operation, texte in messages:
+                    if operation == protocole.ECHEC_SPLIT and speculation:
+                        declarer_defaillant(machine, f"échec du comptage de son split : {texte}")
+                        break
+                    if operation in ECHECS_WORKER:
+                        journal.error(f"{ECHECS_WORKER[operation].format(machine, texte)}. Abandon du job.")
+                        abandon = True
+                        break
+                    if operation == protocole.LOT_RESULTATS:
+                        debut_rangement = time.perf_counter()
+                        suite, repartis = en_attente[machine]
+                        mesures.compteurs["couples_resultats_recus"] += ranger_resultats(
+                            suite, repartis, mots_repartis, texte)
+                        chronometre.ajouter("lecture_resultats", time.perf_counter() - debut_rangement)
+                        continue
+                    if operation == protocole.SAVE_OK:
+                        sauvegarde = json.loads(texte)
+                        partition = sauvegarde.get("partition", indices[machine])
+                        valider_partition(machine, partition, sauvegarde)
+                        if partition != indices[machine]:
+                            # Partition reprise : pas une étape de ce worker
+                            continue
+                    if avancement[machine] >= len(ETAPES_PIPELINE):
+                        journal.warning(f"Message inattendu de {machine} : {protocole.decrire_trame(operation, texte)}")
+                        continue
+                    nom_etape, reponses_attendues = ETAPES_PIPELINE[avancement[machine]]
+                    if operation not in reponses_attendues:
+                        journal.warning(f"Message inattendu de {machine} à l'étape {nom_etape} : "
+                                        f"{protocole.decrire_trame(operation, texte)}")
+                        continue
+
+                    avancement[machine] += 1
+                    nb_reponses_etapes[nom_etape] += 1
+                    instants_etapes.setdefault(nom_etape, []).append(time.perf_counter() - debut_pipeline)
+                    if nb_reponses_etapes[nom_etape] == nb_machine:
+                        chronometre.ajouter(nom_etape.lower().replace(' ', '_'),
+                                            time.perf_counter() - debut_pipeline)
+                        journal.info(f"Etape {nom_etape} terminée par tous les workers.")
+
+                    if nom_etape == "CONNEXION":
+                        reponses_connexion[machine] = texte
+                        if len(reponses_connexion) == nb_machine:
+                            # Dernière barrière : ensuite, chaque worker avance à son rythme
+                            envoyer_configuration(files_envoi, compresseurs, configuration, reponses_connexion)
+                            debut_pipeline = time.perf_counter()
+                            journal.info(f"Envoi du SPLIT à chaque worker (mode {mode_split}), sans attendre "
+                                         "leurs réponses.")
+                            threading.Thread(target=envoyer_split,
+                                             args=(files_envoi, mode_split, chronometre, suivi_split),
+                                             daemon=True).start()
+
+                    elif nom_etape == "SPLIT":
+                        splits_comptes[machine].set()
+
+                    elif nom_etape == "SAVE" and not speculation:
+                        # Partition terminée : le worker est libéré sans attendre les autres
+                        selecteur.unregister(cle.fileobj)
+                        envoyer_sans_attendre(machine, protocole.END)
+                if abandon:
+                    break
+            if abandon:
+                break
+
+        if len(sauvegardes) == nb_machine:
+            enregistrer_resultats(results_data, configuration, compresseurs,
+                                  {machines[p]: suite for p, suite in suites.items()},
+                                  sum(comptes_repartis.values(), Counter()),
+                                  {machines[p]: sauvegarde for p, sauvegarde in sauvegardes.items()})
+            results_data['reprises'] = {machines[p]: machine for p, machine in executants.items()
+                                        if machine != machines[p]}
+            termine = True
+    finally:
+        selecteur.close()
+        if termine and speculation:
+            for machine in connexions:
+                if machine not in remplaces:
+                    differes[machine].append((protocole.END, ''))
+        # Un worker dont la file reste pleine n'est pas attendu : il est arrêté, comme en cas
+        # d'abandon, par la fermeture des connexions (de même que les workers remplacés)
+        bloques = vider_differes(delai_phase) if termine else set()
+        if bloques:
+            journal.warning(f"File d'envoi toujours pleine pour {sorted(bloques)} : fin du job sans les attendre.")
+        arreter_envoyeurs(files_envoi, threads_envoi, attendre=termine, ignorees=remplaces | bloques)
+    return termine
 
-    while True:
-        for machine, socket_client in connexions.items():
-            try:
-                message = recevoir_message(socket_client, machine)
-
-                # CONNEXIONS
-                #---------------------------------
-                if message == "CONNEXION OK":
-                    workers_connectes[machine] = True
-                    print(f"[Master] Connexions : {workers_connectes}")
-
-                if all(workers_connectes.values()) and not machines_envoyees:
-                    envoyer_message_a_tous(connexions, f"MACHINES : {machines_json}")
-                    machines_envoyees = True
-
-                if message == "RECEPTION MACHINES OK":
-                    workers_machines_reception[machine] = True
-                    print(f"[Master] Réceptions machines : {workers_machines_reception}")
-
-                # SPLIT
-                #---------------------------------
-                if all(workers_machines_reception.values()) and not split_envoye:
-                    print("[Master] Envoi du SPLIT à chaque worker.")
-                    messages_a_envoyer = [f"SPLIT : {part}" for part in parties_message]
-                    envoyer_messages_specifiques(connexions, messages_a_envoyer)
-                    split_envoye = True
-
-                if message == "RECEPTION SPLIT OK":
-                    workers_split_reception[machine] = True
-                    print(f"[Master] Réceptions SPLIT : {workers_split_reception}")
-
-                # MAP SHUFFLE
-                #---------------------------------
-                if all(workers_split_reception.values()) and not map_shuffle_envoye:
-                    envoyer_message_a_tous(connexions, "GO MAP SHUFFLE")
-                    map_shuffle_envoye = True
-
-                if message in ("CONNEXION WORKERS OK", "CONNEXION WORKERS FAILED"):
-                    workers_connexion_workers_ok[machine] = True
-                    print(f"[Master] Connexions entre workers : {workers_connexion_workers_ok}")
-
-                if all(workers_connexion_workers_ok.values()) and not start_map_shuffle_envoye:
-                    envoyer_message_a_tous(connexions, "START MAP SHUFFLE")
-                    start_map_shuffle_envoye = True
-
-                if message == "END MAP SHUFFLE":
-                    workers_map_shuffle_reception[machine] = True
-                    print(f"[Master] Réceptions END MAP SHUFFLE : {workers_map_shuffle_reception}")
-
-                # SAVE
-                #---------------------------------
-                if all(workers_map_shuffle_reception.values()) and not save_envoye:
-                    envoyer_message_a_tous(connexions, "SAVE")
-                    save_envoye = True
-
-                if message.startswith("SAVE OK : "):
-                    chemin_fichier = message[10:].strip()
-                    workers_save_ok[machine] = True
-                    workers_save_paths[machine] = chemin_fichier
-                    print(f"[Master] {machine} a sauvegardé : {chemin_fichier}")
-                    print(f"[Master] Confirmations SAVE : {workers_save_ok}")
-
-                # END
-                #---------------------------------
-                if all(workers_save_ok.values()) and save_envoye:
-                    print("[Master] Tous les workers ont sauvegardé leurs fichiers :")
-                    for wkr, path in workers_save_paths.items():
-                        print(f"  - {wkr} : {path}")
-                    results_data['workers_save_paths'] = workers_save_paths
-
-                    envoyer_message_a_tous(connexions, "END")
-                    return
-
-            except Exception as e:
-                print(f"[Master] Erreur lors de la réception depuis {machine} : {e}")
 
 
 
+###################################################
+# AGREGATION DES RESULTATS
+###################################################
+
+def fusionner_suites(suites, comptes_repartis):
+    """
+    Phase REDUCE : fusion à k voies (par un tas, voir heapq.merge) des suites
+    de couples (mot, nombre) renvoyées par les workers, chacune triée par nombre
+    décroissant puis par ordre alphabétique. Les comptes partiels des mots
+    répartis sur plusieurs réducteurs, additionnés à part, forment une suite de
+    plus. Les couples sont produits un par un, dans l'ordre final, sans
+    construire ni trier le dictionnaire de tout le vocabulaire.
+    
+    Args:
+        suites (dict): Suite triée de chaque worker {nom_machine_worker: liste de couples}.
+        comptes_repartis (Counter): Comptes totaux des mots répartis {mot: nombre}.
+        
+    Yields:
+        tuple: Les couples (mot, nombre), par nombre décroissant.
+    """
+    suite_repartis = sorted(comptes_repartis.items(), key=cle_frequence)
+    yield from heapq.merge(*suites.values(), suite_repartis, key=cle_frequence)
+
+
+###################################################
+# MESURES DU JOB
+###################################################
+
+def resumer_mesures_workers(mesures_workers):
+    """
+    Résume les mesures renvoyées par les workers : pour chaque phase et chaque
+    compteur, le minimum, la moyenne et le maximum sur les workers. Un écart
+    important entre minimum et maximum désigne la phase où un worker en retard
+    fait attendre les autres.
+    
+    Args:
+        mesures_workers (dict): Mesures de chaque worker {nom_machine_worker: dict}
+                                (voir mesures.MesuresJob.vers_dict), éventuellement None.
+        
+    Returns:
+        dict: {"phases": {phase: {"min", "moyenne", "max"}}, "compteurs": {...}}.
+    """
+    resume = {}
+    for categorie in ("phases", "compteurs"):
+        valeurs = {}
+        for mesures_worker in mesures_workers.values():
+            for nom, valeur in (mesures_worker or {}).get(categorie, {}).items():
+                valeurs.setdefault(nom, []).append(valeur)
+        resume[categorie] = {nom: {"min": min(v), "moyenne": sum(v) / len(v), "max": max(v)}
+                             for nom, v in valeurs.items()}
+    return resume
+
+
+def afficher_mesures(mesures_master, resume_workers):
+    """
+    Affiche la durée des phases du master et des workers, et le trafic du
+    master avec chaque worker.
+    
+    Args:
+        mesures_master (MesuresJob): Les mesures du master.
+        resume_workers (dict): Le résumé des mesures des workers (voir resumer_mesures_workers).
+    """
+    journal.info("Durées des phases du master (s) :" + ''.join(
+        f"\n  - {phase} : {duree:.4f}" for phase, duree in mesures_master.chronometre.vers_dict().items()))
+    if resume_workers.get("phases"):
+        journal.info("Durées des phases des workers (s, min / moyenne / max) :" + ''.join(
+            f"\n  - {phase} : {stats['min']:.4f} / {stats['moyenne']:.4f} / {stats['max']:.4f}"
+            for phase, stats in resume_workers["phases"].items()))
+    for compteur, stats in resume_workers.get("compteurs", {}).items():
+        journal.info(f"{compteur} par worker (min / moyenne / max) : "
+                     f"{stats['min']} / {stats['moyenne']:.1f} / {stats['max']}")
+    for machine, trafic in mesures_master.trafic.items():
+        journal.info(f"Trafic avec {machine} : {trafic.trames_envoyees} trames / {trafic.octets_envoyes} octets "
+                     f"envoyés, {trafic.trames_recues} trames / {trafic.octets_recus} octets reçus")
+
 
 ###################################################
 # SCRIPT PRINCIPAL
 ###################################################
 
+parser = argparse.ArgumentParser(description="Master du MapReduce de comptage de mots.")
+parser.add_argument("--partitionneur", choices=sorted(PARTITIONNEURS), default=PartitionneurPlan.nom,
+                    help="Partitionneur utilisé par les workers pendant le SHUFFLE (défaut : plan).")
+parser.add_argument("--split", choices=["flux", "brut", "complet", "plages"], default="flux",
+                    help="Lecture du fichier d'entrée par morceaux envoyés au fil de l'eau (flux, défaut), "
+                         "par morceaux envoyés sans nettoyage, nettoyés par les workers (brut), "
+                         "en entier avant découpage (complet), ou par les workers eux-mêmes à partir "
+                         "de plages d'octets (plages).")
+parser.add_argument("--format", choices=["json", "binaire"], default="json",
+                    help=f"Format du fichier de résultats : JSON ({FICHIER_RESULTATS}, défaut) ou table binaire "
+                         f"triée lisible par mmap ({FICHIER_RESULTATS_BINAIRE}, voir format_resultats.py).")
+parser.add_argument("--top", type=int, default=None,
+                    help="Ne garde que les K mots les plus fréquents dans le fichier de résultats : chaque "
+                         "worker n'envoie que ses K premiers mots, sans trier tout son vocabulaire.")
+parser.add_argument("--delai-phase", type=float, default=DELAI_MAX_PHASE,
+                    help=f"Durée maximale d'une phase en secondes avant abandon du job (défaut : {DELAI_MAX_PHASE}).")
+parser.add_argument("--compression", choices=[protocole.COMPRESSION_AUCUNE] + sorted(protocole.CODECS),
+                    default=protocole.COMPRESSION_AUCUNE,
+                    help="Compression des SPLIT et des lots du shuffle, si tous les workers la gèrent "
+                         "(défaut : aucune).")
+parser.add_argument("--niveau-compression", type=int, default=None,
+                    help="Niveau de compression (zlib : 0 à 9, défaut 1 ; lzma : 0 à 9, défaut 0).")
+parser.add_argument("--pipeline", action="store_true",
+                    help="Enchaîne les phases sans barrière : chaque worker passe au shuffle dès que son split "
+                         "est compté et renvoie ses résultats dès que les autres lui ont envoyé leurs lots, "
+                         "et chaque partition est terminée dès son arrivée.")
+parser.add_argument("--speculation", action="store_true",
+                    help="Reprend sur un autre worker la tâche (split et partition) d'un worker défaillant ou "
+                         "nettement plus lent que les autres, au lieu d'abandonner le job. Implique --pipeline.")
+parser.add_argument("--seuil-retard", type=float, default=SEUIL_RETARD,
+                    help="Avec --speculation, un worker est en retard quand il met plus de ce multiple du temps "
+                         f"du worker médian à atteindre une étape (défaut : {SEUIL_RETARD}).")
+parser.add_argument("--delai-min-retard", type=float, default=DELAI_MIN_RETARD,
+                    help="Avec --speculation, retard minimal en secondes sur le worker médian avant une reprise "
+                         f"(défaut : {DELAI_MIN_RETARD}).")
+parser.add_argument("--job", default=None,
+                    help="Identifiant du job, transmis aux workers (défaut : identifiant aléatoire). "
+                         "Des workers persistants (--persistant) traitent plusieurs jobs successifs.")
+parser.add_argument("--niveau-journal", choices=list(NIVEAUX), default=NIVEAU_DEFAUT,
+                    help=f"Niveau des messages affichés (défaut : {NIVEAU_DEFAUT}) ; debug trace chaque message "
+                         "échangé et un échantillon des lots de résultats.")
+args = parser.parse_args()
+if args.top is not None and args.top < 1:
+    parser.error("--top doit être supérieur ou égal à 1")
+if args.seuil_retard < 1:
+    parser.error("--seuil-retard doit être supérieur ou égal à 1")
+if args.speculation:
+    args.pipeline = True
+configurer_journal("[Master] ", args.niveau_journal)
+
 # Mesure du temps de début pour la communication avec les workers
 start_time = time.perf_counter()
+mesures = MesuresJob()
 
-# Lecture du fichier machines.txt pour obtenir la liste des workers
+# Lecture du fichier machines.txt pour obtenir la liste des workers : une adresse
+# "hote" ou "hote:port" par ligne (plusieurs workers par machine sur des ports différents)
 with open(FICHIER_MACHINES, 'r') as file:
-    liste_machines = [line.strip() for line in file.readlines()]
+    liste_machines = [protocole.normaliser_adresse(line, PORT_PRINCIPAL)
+                      for line in file.readlines() if line.strip()]
+
+# Connexion aux workers avant le choix du partitionneur : les workers injoignables
+# sont retirés de la liste envoyée avec MACHINES, qui fixe le nombre de partitions
+mesures.chronometre.demarrer("connexion_tcp")
+connexions = connexion_aux_workers(liste_machines)
+mesures.chronometre.arreter("connexion_tcp")
+injoignables = [machine for machine in liste_machines if machine not in connexions]
+if injoignables:
+    journal.warning(f"Workers injoignables, retirés du job : {injoignables}")
+    liste_machines = [machine for machine in liste_machines if machine in connexions]
+if not connexions:
+    journal.error("Aucun worker connecté. Abandon du job.")
+    sys.exit(1)
 
 # Nombre de machines
 NOMBRE_MACHINES = len(liste_machines) + 1  # on compte le master
-machines_json = json.dumps(liste_machines)
-connexions = connexion_aux_workers(liste_machines)
+
+# Choix du partitionneur, envoyé aux workers avec la liste des machines
+mesures.chronometre.demarrer("echantillonnage")
+description_partitionneur = {"type": args.partitionneur}
+if args.partitionneur == "range":
+    echantillon, _ = echantillonner_mots(FICHIER_MESSAGE)
+    description_partitionneur["bornes"] = calculer_bornes(echantillon, len(liste_machines))
+    journal.info(f"Partitionneur utilisé : {description_partitionneur}")
+elif args.partitionneur == PartitionneurPlan.nom:
+    echantillon, nb_mots_estime = echantillonner_mots(FICHIER_MESSAGE)
+    plan = construire_plan(echantillon, len(liste_machines), nb_mots_estime)
+    description_partitionneur = plan.vers_dict()
+    journal.info(f"Plan de partitionnement : {len(plan.chauds)} mot(s) chaud(s) {sorted(plan.chauds)}, "
+                 f"{len(plan.affectations)} mot(s) affecté(s), les autres par hachage")
+else:
+    journal.info(f"Partitionneur utilisé : {description_partitionneur}")
+mesures.chronometre.arreter("echantillonnage")
+
+# Compression demandée, négociée avec les workers à la connexion
+description_compression = {"type": args.compression}
+if args.compression != protocole.COMPRESSION_AUCUNE:
+    description_compression["niveau"] = protocole.Compresseur(
+        {"type": args.compression, "niveau": args.niveau_compression}).niveau
+
+# Identifiant du job : les lots du shuffle d'un job précédent abandonné, encore
+# reçus par des workers persistants, sont ignorés
+id_job = args.job or uuid.uuid4().hex[:12]
+journal.info(f"Job {id_job}")
+
+configuration = {"job": id_job, "machines": liste_machines, "partitionneur": description_partitionneur,
+                 "compression": description_compression, "top": args.top, "pipeline": args.pipeline,
+                 "speculation": args.speculation}
 
 results_data = {}
 
 
-# Lancement du thread de communication
-thread_communication = threading.Thread(
-    target=gerer_communication_avec_workers,
-    args=(connexions, machines_json, results_data)
-)
-thread_communication.start()
-thread_communication.join()
+# Communication avec les workers, par phases ou en pipeline
+if args.pipeline:
+    seuils_speculation = (args.seuil_retard, args.delai_min_retard) if args.speculation else None
+    job_termine = gerer_communication_en_pipeline(connexions, configuration, args.split, args.delai_phase,
+                                                  results_data, mesures, seuils_speculation)
+else:
+    job_termine = gerer_communication_avec_workers(connexions, configuration, args.split, args.delai_phase,
+                                                   results_data, mesures)
 
 fermer_connexions_workers(connexions)
 
-workers_save_paths = results_data.get('workers_save_paths', {})
-
-
-# Agrégation des résultats finaux
-final_results = {}
-for wkr, path in workers_save_paths.items():
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            worker_data = json.load(f)
-        for mot, compte in worker_data.items():
-            if mot in final_results:
-                final_results[mot] += compte
-            else:
-                final_results[mot] = compte
-    except Exception as e:
-        print(f"[Master] Erreur lors de la lecture du fichier {path} de {wkr} : {e}")
-
-# Tri par ordre décroissant
-sorted_results = dict(sorted(final_results.items(), key=lambda x: x[1], reverse=True))
-
-
-# Sauvegarde du fichier final agrégé
+# Job abandonné : les résultats et les mesures d'un job précédent sont gardés
+if not job_termine:
+    journal.error(f"Job {id_job} abandonné : {FICHIER_RESULTATS_AMDAHL} et le fichier de résultats "
+                  "ne sont pas modifiés.")
+    sys.exit(1)
+
+compression = results_data.get('compression')
+if compression:
+    journal.info(f"Octets échangés avant / après compression ({compression['type']}) : "
+                 f"SPLIT {compression['octets_split']['avant']} / {compression['octets_split']['apres']}, "
+                 f"SHUFFLE {compression['octets_shuffle']['avant']} / {compression['octets_shuffle']['apres']}, "
+                 f"RESULTATS {compression['octets_resultats']['avant']} / {compression['octets_resultats']['apres']}")
+
+
+charges_reduce = results_data.get('charges_reduce', {})
+
+# Charge de reduce par worker : nombre de mots distincts réduits
+desequilibre_reduce = None
+if charges_reduce:
+    charge_moyenne = sum(charges_reduce.values()) / len(charges_reduce)
+    desequilibre_reduce = max(charges_reduce.values()) / charge_moyenne if charge_moyenne else 1.0
+    journal.info(f"Charges de reduce (mots distincts par worker) : {charges_reduce}")
+    journal.info(f"Déséquilibre de reduce (max / moyenne) : {desequilibre_reduce:.3f}")
+
+# Fusion des suites triées des workers (par nombre décroissant, puis par ordre
+# alphabétique) et sauvegarde du fichier final agrégé au fil de la fusion : le
+# temps de la fusion ("fusion_tri") est mesuré à part de celui de l'écriture
 try:
-    with open(FICHIER_RESULTATS, "w", encoding="utf-8") as f:
-        json.dump(sorted_results, f, ensure_ascii=False, indent=4)
-    print(f"[Master] Fichier de résultats final enregistré dans {os.path.abspath(FICHIER_RESULTATS)}")
+    debut_ecriture = time.perf_counter()
+    resultats_tries = fusionner_suites(results_data.get('suites', {}), results_data.get('comptes_repartis', {}))
+    if args.top:
+        resultats_tries = islice(resultats_tries, args.top)
+    resultats_tries = chronometrer_iterable(resultats_tries, mesures.chronometre, "fusion_tri")
+    if args.format == "binaire":
+        fichier_resultats = FICHIER_RESULTATS_BINAIRE
+        nb_mots_ecrits = ecrire_table(fichier_resultats, resultats_tries)
+    else:
+        fichier_resultats = FICHIER_RESULTATS
+        nb_mots_ecrits = ecrire_json_en_flux(fichier_resultats, resultats_tries)
+    mesures.chronometre.ajouter("ecriture", time.perf_counter() - debut_ecriture
+                                - mesures.chronometre.durees.get("fusion_tri", 0.0))
+    mesures.compteurs["mots_ecrits"] = nb_mots_ecrits
+    journal.info(f"Fichier de résultats final ({nb_mots_ecrits} mots) enregistré dans "
+                 f"{os.path.abspath(fichier_resultats)}")
 except Exception as e:
-    print(f"[Master] Erreur lors de l'écriture du fichier final : {e}")
+    journal.error(f"Erreur lors de l'écriture du fichier final : {e}")
 
 
 # Mesure du temps de fin
@@ -383,7 +1545,11 @@ end_time = time.perf_counter()
 
 # Temps écoulé
 elapsed_time = end_time - start_time
-print(f"[Master] Temps d'exécution du script avec {NOMBRE_MACHINES} machines : {elapsed_time:.4f} secondes")
+journal.info(f"Temps d'exécution du script avec {NOMBRE_MACHINES} machines : {elapsed_time:.4f} secondes")
+mesures.chronometre.ajouter("total", elapsed_time)
+mesures_workers = results_data.get('mesures_workers', {})
+resume_workers = resumer_mesures_workers(mesures_workers)
+afficher_mesures(mesures, resume_workers)
 
 # Sauvegarde des résultats de performance dans resultats_amdahl.json
 try:
@@ -394,13 +1560,27 @@ try:
 
     # Mise à jour des résultats
     resultats_amdahl[str(NOMBRE_MACHINES)] = {
-        "elapsed_time": elapsed_time
+        "elapsed_time": elapsed_time,
+        "job": id_job,
+        "partitionneur": args.partitionneur,
+        "top": args.top,
+        "pipeline": args.pipeline,
+        "speculation": args.speculation,
+        "reprises": results_data.get('reprises', {}),
+        "charges_reduce": charges_reduce,
+        "desequilibre_reduce": desequilibre_reduce,
+        "compression": compression,
+        "mesures": {
+            "master": mesures.vers_dict(),
+            "workers": mesures_workers,
+            "resume_workers": resume_workers
+        }
     }
 
     with open(FICHIER_RESULTATS_AMDAHL, "w", encoding="utf-8") as f:
         json.dump(resultats_amdahl, f, ensure_ascii=False, indent=4)
-    print(f"[Master] Résultats de performance enregistrés dans {os.path.abspath(FICHIER_RESULTATS_AMDAHL)}")
+    journal.info(f"Résultats de performance enregistrés dans {os.path.abspath(FICHIER_RESULTATS_AMDAHL)}")
 except Exception as e:
-    print(f"[Master] Erreur lors de l'écriture du fichier de résultats Amdahl : {e}")
+    journal.error(f"Erreur lors de l'écriture du fichier de résultats Amdahl : {e}")
 
-print("[Master] Fin du script.")
+journal.info("Fin du script.")
@@ -1,7 +1,17 @@
+import argparse
 import json
-import re
+import mmap
+import multiprocessing
 import os
+import sys
 import time
+from collections import Counter
+
+# Le nettoyage du texte et le mode parallèle réutilisent les modules des workers
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "dossierAdeployer"))
+from comptage import compter_plage, decouper_en_parts
+from journalisation import NIVEAU_DEFAUT, NIVEAUX, configurer_journal, journal
+from tokenisation import iterer_mots
 
 # CONSTANTES GLOBALES
 FICHIER_MESSAGE = "input_message.txt"
@@ -9,68 +19,75 @@ FICHIER_RESULTATS = "final_aggregated_results.json"
 FICHIER_RESULTATS_AMDAHL = "resultats_amdahl.json"
 NOMBRE_MACHINES = 1  # Nombre de machines utilisées pour le calcul parallèle (seulement le master, car pas de calculs parallèles)
 
-# Réinitialisation du fichier de résultats Amdahl
-if os.path.exists(FICHIER_RESULTATS_AMDAHL):
+parser = argparse.ArgumentParser(description="Comptage des mots sur une seule machine.")
+parser.add_argument("--processus", type=int, default=1,
+                    help="Nombre de processus locaux qui comptent le texte en parallèle (1 : calcul séquentiel)")
+parser.add_argument("--niveau-journal", choices=list(NIVEAUX), default=NIVEAU_DEFAUT,
+                    help=f"Niveau des messages affichés (défaut : {NIVEAU_DEFAUT}).")
+args = parser.parse_args()
+if args.processus < 1:
+    parser.error("--processus doit être supérieur ou égal à 1")
+configurer_journal("[Master] ", args.niveau_journal)
+
+# Réinitialisation du fichier de résultats Amdahl (le mode parallèle garde les mesures existantes)
+if args.processus == 1 and os.path.exists(FICHIER_RESULTATS_AMDAHL):
     os.remove(FICHIER_RESULTATS_AMDAHL)
-    print(f"[Master] Fichier {FICHIER_RESULTATS_AMDAHL} supprimé pour réinitialisation.")
+    journal.info(f"Fichier {FICHIER_RESULTATS_AMDAHL} supprimé pour réinitialisation.")
 
 # Mesure du temps de début
 start_time = time.perf_counter()
 
-# Lecture du message 
-with open(FICHIER_MESSAGE, "r", encoding="utf-8") as f:
-    grand_message = f.read()
-
 ###################################################
-# FONCTION DE SPLITTING ET NETTOYAGE DU TEXTE
+# COMPTAGE PARALLELE
 ###################################################
 
-def nettoyer_et_decouper_message(big_msg):
+def compter_en_parallele(chemin_fichier, nb_processus):
     """
-    Nettoie le message et le découpe en mots individuels.
-    Gère la normalisation du texte, la suppression de certains caractères
-    et la séparation des contractions françaises.
-    
+    Découpe le fichier en parts alignées sur des blancs, que les processus
+    d'un groupe local lisent, nettoient et comptent chacun de leur côté
+    (compter_plage). Le nettoyage ne fusionne jamais deux mots séparés par
+    un blanc : le résultat est le même que celui du calcul séquentiel.
+
     Args:
-        big_msg (str): Le message complet à traiter.
-        
+        chemin_fichier (str): Le chemin du fichier à traiter.
+        nb_processus (int): Le nombre de processus du groupe.
+
     Returns:
-        list: Liste des mots nettoyés.
+        Counter: Les comptes de tout le fichier {mot: nombre}.
     """
-    big_msg_clean = big_msg.lower()
-    big_msg_clean = big_msg_clean.replace('’', "'")
-
-    # Caractères autorisés : lettres, chiffres, apostrophe, espace, accents
-    big_msg_clean = re.sub(r"[^a-z0-9'\sàâäéèêëïîôöùûüç]", '', big_msg_clean)
-    mots = [w for w in big_msg_clean.split() if w]
-
-    # Contractions
-    pattern_contraction = re.compile(r"^(l|j|c|d|m|t|s|n|qu)'(.+)$", re.IGNORECASE)
-    final_words = []
-    for w in mots:
-        m = pattern_contraction.match(w)
-        if m:
-            final_words.append(m.group(1) + "'")
-            if m.group(2):
-                final_words.append(m.group(2))
-        else:
-            final_words.append(w)
-
-    return final_words
-
-# Nettoyage et découpage du message
-tous_les_mots = nettoyer_et_decouper_message(grand_message)
+    taille = os.path.getsize(chemin_fichier)
+    parts = []
+    if taille:
+        with open(chemin_fichier, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                parts = decouper_en_parts(mm, 0, taille, nb_processus)
+    journal.info(f"Comptage de {len(parts)} parts sur {nb_processus} processus")
+
+    compte_mots = Counter()
+    # Les parts sont fusionnées dans l'ordre du texte, comme en séquentiel
+    with multiprocessing.get_context("fork").Pool(nb_processus) as groupe:
+        for comptes in groupe.starmap(compter_plage, [(chemin_fichier, debut, fin - debut) for debut, fin in parts]):
+            compte_mots.update(comptes)
+    return compte_mots
 
 ###################################################
 # COMPTAGE DES MOTS
 ###################################################
 
-compte_mots = {}
-for mot in tous_les_mots:
-    if mot in compte_mots:
-        compte_mots[mot] += 1
-    else:
-        compte_mots[mot] = 1
+if args.processus > 1:
+    compte_mots = compter_en_parallele(FICHIER_MESSAGE, args.processus)
+else:
+    # Lecture du message
+    with open(FICHIER_MESSAGE, "r", encoding="utf-8") as f:
+        grand_message = f.read()
+
+    # Nettoyage et découpage du message, mot par mot (voir tokenisation.iterer_mots)
+    compte_mots = {}
+    for mot in iterer_mots(grand_message):
+        if mot in compte_mots:
+            compte_mots[mot] += 1
+        else:
+            compte_mots[mot] = 1
 
 # Tri par ordre décroissant
 sorted_results = dict(sorted(compte_mots.items(), key=lambda x: x[1], reverse=True))
@@ -79,30 +96,39 @@ sorted_results = dict(sorted(compte_mots.items(), key=lambda x: x[1], reverse=Tr
 try:
     with open(FICHIER_RESULTATS, "w", encoding="utf-8") as f:
         json.dump(sorted_results, f, ensure_ascii=False, indent=4)
-    print(f"[Master] Fichier de résultats final enregistré dans {os.path.abspath(FICHIER_RESULTATS)}")
+    journal.info(f"Fichier de résultats final enregistré dans {os.path.abspath(FICHIER_RESULTATS)}")
 except Exception as e:
-    print(f"[Master] Erreur lors de l'écriture du fichier final : {e}")
+    journal.error(f"Erreur lors de l'écriture du fichier final : {e}")
 
 # Mesure du temps de fin
 end_time = time.perf_counter()
 
 # Calcul et affichage du temps écoulé
 elapsed_time = end_time - start_time
-print(f"[Master] Temps d'exécution du script : {elapsed_time:.4f} secondes")
+journal.info(f"Temps d'exécution du script : {elapsed_time:.4f} secondes")
 
 # Sauvegarde des résultats de performance dans resultats_amdahl.json
 try:
     resultats_amdahl = {}
-
-    # Mise à jour des résultats
-    resultats_amdahl[str(NOMBRE_MACHINES)] = {
-        "elapsed_time": elapsed_time
-    }
+    if os.path.exists(FICHIER_RESULTATS_AMDAHL):
+        with open(FICHIER_RESULTATS_AMDAHL, "r", encoding="utf-8") as f:
+            resultats_amdahl = json.load(f)
+
+    # Mise à jour des résultats (le mode parallèle a sa propre clé, à côté des mesures du cluster)
+    if args.processus > 1:
+        resultats_amdahl[f"local_{args.processus}_processus"] = {
+            "elapsed_time": elapsed_time,
+            "processus": args.processus
+        }
+    else:
+        resultats_amdahl[str(NOMBRE_MACHINES)] = {
+            "elapsed_time": elapsed_time
+        }
 
     with open(FICHIER_RESULTATS_AMDAHL, "w", encoding="utf-8") as f:
         json.dump(resultats_amdahl, f, ensure_ascii=False, indent=4)
-    print(f"[Master] Résultats de performance enregistrés dans {os.path.abspath(FICHIER_RESULTATS_AMDAHL)}")
+    journal.info(f"Résultats de performance enregistrés dans {os.path.abspath(FICHIER_RESULTATS_AMDAHL)}")
 except Exception as e:
-    print(f"[Master] Erreur lors de l'écriture du fichier de résultats Amdahl : {e}")
+    journal.error(f"Erreur lors de l'écriture du fichier de résultats Amdahl : {e}")
 
-print("[Master] Fin du script.")
+journal.info("Fin du script.")
@@ -0,0 +1,124 @@
+import os
+import random
+import re
+import sys
+import unittest
+
+# Les modules partagés sont dans dossierAdeployer, comme pour les masters
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RACINE, "dossierAdeployer"))
+from comptage import decouper_en_parts
+from tokenisation import iterer_mots, nettoyer_message
+
+
+def decouper_message_reference(big_msg):
+    """
+    Tokenisation d'origine (decouper_message du master et nettoyer_et_decouper_message
+    du master séquentiel), gardée telle quelle comme référence : nettoyer_message et
+    iterer_mots doivent produire exactement les mêmes mots, dans le même ordre.
+
+    Args:
+        big_msg (str): Le texte à traiter.
+
+    Returns:
+        list: Liste des mots nettoyés.
+    """
+    big_msg_clean = big_msg.lower()
+    big_msg_clean = big_msg_clean.replace('’', "'")
+
+    # Caractères autorisés : lettres, chiffres, apostrophe, espace, accents
+    big_msg_clean = re.sub(r"[^a-z0-9'\sàâäéèêëïîôöùûüç]", '', big_msg_clean)
+    mots = [w for w in big_msg_clean.split() if w]
+
+    # Contractions
+    pattern_contraction = re.compile(r"^(l|j|c|d|m|t|s|n|qu)'(.+)$", re.IGNORECASE)
+    final_words = []
+    for w in mots:
+        m = pattern_contraction.match(w)
+        if m:
+            final_words.append(m.group(1) + "'")
+            if m.group(2):
+                final_words.append(m.group(2))
+        else:
+            final_words.append(w)
+
+    return final_words
+
+
+# Cas ciblés : contractions en début de mot, dans un mot et en fin de ligne,
+# apostrophe typographique, blancs Unicode et caractères supprimés
+CAS = [
+    "L'homme qu'il a vu n'est pas là.",
+    "aujourd'hui, presqu'île et entr'ouvert",
+    "Il dit : l'\nqu'\nd'\n",
+    "l' homme, qu' il",
+    "l''homme qu''il ''l'a",
+    "L’été qu’on attendait, c’est l’été.",
+    "j'ai l'été qu'il s'en va",
+    "m' t'　s'",
+    "l'-homme l'«été» qu'(il) d'1789",
+    "Ça, c'EST L'ÉTÉ ! QU'IL VIENNE.",
+    "İstanbul ﬁn ß L'İLE",
+    "   \t\r\n  ",
+    "",
+    "x'y ll'a lqu'a qu'qu'a",
+]
+
+ALPHABET = "lLjJcdmtsnqQuUaéÉèçİﬁ'’ -.,;«»()\n\t  　"
+
+
+class TestTokenisation(unittest.TestCase):
+
+    def assertMemesMots(self, mots, attendus):
+        # Seul le premier écart est affiché : le diff complet de longues listes est très lent
+        if mots != attendus:
+            ecart = next((i for i, (mot, attendu) in enumerate(zip(mots, attendus)) if mot != attendu),
+                         min(len(mots), len(attendus)))
+            self.fail(f"Premier écart au mot {ecart} : {mots[ecart:ecart + 5]} "
+                      f"au lieu de {attendus[ecart:ecart + 5]}")
+
+    def verifier(self, texte):
+        attendus = decouper_message_reference(texte)
+        self.assertMemesMots(nettoyer_message(texte), attendus)
+        self.assertMemesMots(list(iterer_mots(texte)), attendus)
+
+    def test_cas_cibles(self):
+        for texte in CAS:
+            with self.subTest(texte=texte):
+                self.verifier(texte)
+
+    def test_textes_aleatoires(self):
+        generateur = random.Random(0)
+        for _ in range(2000):
+            texte = ''.join(generateur.choice(ALPHABET) for _ in range(generateur.randint(0, 40)))
+            with self.subTest(texte=texte):
+                self.verifier(texte)
+
+    def test_input_message(self):
+        with open(os.path.join(RACINE, "input_message.txt"), "r", encoding="utf-8") as f:
+            texte = f.read()
+        self.verifier(texte)
+
+    def test_blocs_de_iterer_mots(self):
+        # Les blocs sont coupés sur un blanc : aucun mot, ni aucune contraction, n'est coupé
+        texte = " ".join(CAS) * 20
+        attendus = decouper_message_reference(texte)
+        for taille_bloc in (1, 2, 3, 5, 8, 13, 64):
+            with self.subTest(taille_bloc=taille_bloc):
+                self.assertMemesMots(list(iterer_mots(texte, taille_bloc)), attendus)
+
+    def test_parts_du_split(self):
+        # Parts alignées sur des blancs, comme les morceaux du SPLIT et les plages des workers
+        texte = " ".join(CAS) * 20
+        octets = texte.encode("utf-8")
+        attendus = decouper_message_reference(texte)
+        for nb_parts in (1, 2, 3, 7, 50):
+            with self.subTest(nb_parts=nb_parts):
+                mots = []
+                for debut, fin in decouper_en_parts(octets, 0, len(octets), nb_parts):
+                    mots.extend(nettoyer_message(octets[debut:fin].decode("utf-8")))
+                self.assertMemesMots(mots, attendus)
+
+
+if __name__ == "__main__":
+    unittest.main()